@@ -1,13 +1,17 @@
 import os
 import json
-import time
 import logging
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+# سلنیوم فقط وقتی واقعاً مرورگر لازم است import می‌شود (minecraft_manager هم این ماژول را import می‌کند)
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+import block_profile
+import readiness
+import driver_engine
+from session_store import SessionStore, SESSION_FILE
 
 logging.basicConfig(
     level=os.environ.get("LOG_LEVEL", "INFO"),
@@ -37,40 +41,11 @@ RAW_SERVER_URL = os.environ.get("MAGMANODE_SERVER_URL", DEFAULT_SERVER_URL)
 MAGMA_SERVER_URL = normalize_url(RAW_SERVER_URL, DEFAULT_SERVER_URL)
 
 COOKIES_JSON = os.environ.get("MAGMANODE_COOKIES_JSON", "")
+SESSION = SessionStore(SESSION_FILE, COOKIES_JSON)
 
-CHROME_BIN = os.environ.get("CHROME_BIN", "/usr/bin/chromium")
-CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver")
-
-
-def _chrome_options() -> Options:
-    opts = Options()
-    # Headless for Render
-    opts.add_argument("--headless=new")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--disable-extensions")
-    opts.add_argument("--window-size=1366,768")
-    opts.add_experimental_option("excludeSwitches", ["enable-automation"])
-    opts.add_experimental_option("useAutomationExtension", False)
-    if CHROME_BIN and os.path.exists(CHROME_BIN):
-        opts.binary_location = CHROME_BIN
-    opts.add_argument("--disable-blink-features=AutomationControlled")
-    return opts
-
-
-def _start_driver() -> webdriver.Chrome:
-    service = Service(CHROMEDRIVER_PATH)
-    driver = webdriver.Chrome(service=service, options=_chrome_options())
-    # stealth
-    try:
-        driver.execute_cdp_cmd(
-            "Page.addScriptToEvaluateOnNewDocument",
-            {"source": "Object.defineProperty(navigator,'webdriver',{get:() => undefined});"},
-        )
-    except Exception:
-        pass
-    return driver
+
+def _start_driver() -> "webdriver.Chrome":
+    return driver_engine.launch(user_data="auth_checker")
 
 
 def _domain_root(url: str) -> str:
@@ -78,7 +53,23 @@ def _domain_root(url: str) -> str:
     return f"{p.scheme}://{p.hostname}"
 
 
-def _inject_cookies_if_any(driver: webdriver.Chrome, cookies_json: str, base_url: str):
+def _load_session(driver: "webdriver.Chrome", base_url: str) -> int:
+    """همهٔ کوکی‌ها با یک Network.setCookies و بدون ناوبری؛ در صورت خطا روش قدیمی"""
+    cookies = SESSION.load()
+    if not cookies:
+        logger.warning("هیچ کوکی‌ای در متغیر محیطی MAGMANODE_COOKIES_JSON تنظیم نشده است.")
+        return 0
+    try:
+        added = SESSION.apply(driver, base_url, cookies)
+        logger.info(f"✅ {added} کوکی با Network.setCookies بارگذاری شد.")
+        return added
+    except Exception as e:
+        logger.warning(f"⚠️ بارگذاری CDP کوکی‌ها ناموفق بود ({e})؛ add_cookie تک‌تک.")
+        _inject_cookies_if_any(driver, json.dumps(cookies), base_url)
+        return len(cookies)
+
+
+def _inject_cookies_if_any(driver: "webdriver.Chrome", cookies_json: str, base_url: str):
     if not cookies_json:
         logger.warning("هیچ کوکی‌ای در متغیر محیطی MAGMANODE_COOKIES_JSON تنظیم نشده است.")
         return
@@ -93,7 +84,7 @@ def _inject_cookies_if_any(driver: webdriver.Chrome, cookies_json: str, base_url
 
     root = _domain_root(base_url)
     driver.get(root)
-    time.sleep(1)
+    readiness.wait_for('auth_cookie_root', lambda: readiness.document_ready(driver), timeout=5, baseline=1)
 
     added = 0
     for c in cookies:
@@ -120,21 +111,43 @@ def _inject_cookies_if_any(driver: webdriver.Chrome, cookies_json: str, base_url
     logger.info(f"✅ {added} کوکی برای دامنه تزریق شد.")
 
 
-def is_logged_in(driver: webdriver.Chrome, server_url: str) -> bool:
-    driver.get(server_url)  # اگر url نرمال نباشد، قبلش normalize شده
-    time.sleep(3)
+AUTH_START_SELECTORS = ['button[data-action="start"]', 'button.bg-green-600']
+AUTH_STATUS_SELECTORS = ['span[data-server-status]', '.server-status', '.status-indicator']
 
-    current = (driver.current_url or "").lower()
-    if "/login" in current:
-        return False
+# نتیجهٔ بررسی ورود
+AUTH_OK = "authenticated"
+AUTH_LOGIN = "login_redirect"
+AUTH_ERROR = "error"
 
+
+def check_auth(driver: "webdriver.Chrome", server_url: str) -> dict:
+    """با همان درایوری که داده شده صفحهٔ سرور را باز می‌کند؛ state یکی از authenticated/login_redirect/error"""
     try:
-        has_start = len(driver.find_elements(By.CSS_SELECTOR, 'button[data-action="start"], button.bg-green-600')) > 0
-        has_status = len(driver.find_elements(By.CSS_SELECTOR, 'span[data-server-status], .server-status, .status-indicator')) > 0
-        return bool(has_start or has_status)
+        driver.get(server_url)  # اگر url نرمال نباشد، قبلش normalize شده
+        readiness.wait_for("auth_check", lambda: readiness.page_ready(
+            driver, AUTH_STATUS_SELECTORS, AUTH_START_SELECTORS), timeout=10, baseline=3)
+    except Exception as e:
+        return {"state": AUTH_ERROR, "url": None, "detail": str(e)}
+
+    url = driver.current_url or ""
+    if "/login" in url.lower():
+        return {"state": AUTH_LOGIN, "url": url, "detail": None}
+
+    from selenium.webdriver.common.by import By
+
+    try:
+        has_start = len(driver.find_elements(By.CSS_SELECTOR, ", ".join(AUTH_START_SELECTORS))) > 0
+        has_status = len(driver.find_elements(By.CSS_SELECTOR, ", ".join(AUTH_STATUS_SELECTORS))) > 0
     except Exception:
         # اگر به login نرفت، باز هم به‌احتمال زیاد واردیم
-        return "/login" not in (driver.current_url or "").lower()
+        return {"state": AUTH_OK, "url": url, "detail": "markers not checked"}
+    if has_start or has_status:
+        return {"state": AUTH_OK, "url": url, "detail": None}
+    return {"state": AUTH_ERROR, "url": url, "detail": "no server markers on page"}
+
+
+def is_logged_in(driver: "webdriver.Chrome", server_url: str) -> bool:
+    return check_auth(driver, server_url)["state"] == AUTH_OK
 
 
 def main():
@@ -143,18 +156,18 @@ def main():
     driver = None
     try:
         driver = _start_driver()
-        if COOKIES_JSON:
-            _inject_cookies_if_any(driver, COOKIES_JSON, MAGMA_SERVER_URL)
-        else:
+        if not _load_session(driver, MAGMA_SERVER_URL):
             logger.warning("کوکی‌ها تنظیم نشده؛ احتمالاً به صفحهٔ لاگین ری‌دایرکت می‌شویم.")
 
-        ok = is_logged_in(driver, MAGMA_SERVER_URL)
-        if ok:
+        result = check_auth(driver, MAGMA_SERVER_URL)
+        if result["state"] == AUTH_OK:
+            # کوکی‌های چرخیده برای اجرای بعدی (و مدیر) ذخیره می‌شوند
+            SESSION.capture(driver, MAGMA_SERVER_URL, force=True)
             logger.info("✅ ورود معتبر است؛ به صفحهٔ سرور دسترسی داریم.")
             print("YES")
             exit(0)
         else:
-            logger.error("❌ هنوز وارد حساب نیستیم (redirect به login یا نبود عناصر کلیدی).")
+            logger.error(f"❌ هنوز وارد حساب نیستیم ({result['state']}: {result['detail'] or result['url']}).")
             print("NO")
             exit(1)
     except Exception as e:
@@ -164,6 +177,9 @@ def main():
     finally:
         try:
             if driver:
+                block_profile.STATS.record(block_profile.read_perf_messages(driver))
+                info = block_profile.STATS.info()
+                logger.info(f"🚫 {info['blocked']} درخواست مسدود شد (~{info['bytes_saved_estimate'] // 1024} KB، پروفایل {info['profile']})")
                 driver.quit()
         except Exception:
             pass
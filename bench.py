@@ -0,0 +1,612 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# بنچمارک‌های محلی؛ هر زیرفرمان با --baseline در صورت پسرفت با کد 1 خارج می‌شود
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(HERE, "bench_baseline.json")
+SNAPSHOT_DIR = os.path.join(HERE, "snapshots")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    idx = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[idx]
+
+
+def _summary(values) -> dict:
+    return {"runs": len(values), "min": round(min(values), 3), "p50": round(_percentile(values, 50), 3),
+            "p95": round(_percentile(values, 95), 3), "max": round(max(values), 3)}
+
+
+def _check_baseline(name, results: dict, args) -> int:
+    """results: {متریک: مقدار} که کمتر بهتر است؛ مقایسه با baseline با حاشیهٔ tolerance"""
+    path = args.baseline
+    baseline = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        # ادغام، نه جایگزینی: اجرای یک backend (مثلاً browser روی ماشین دارای Chromium) baseline بقیه را پاک نکند
+        baseline[name] = {**baseline.get(name, {}), **results}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline {name} ← {path}")
+        return 0
+    ref = baseline.get(name) or {}
+    # متریکی که baseline ندارد سنجیده نمی‌شود؛ به‌جای قبولی بی‌صدا گفته می‌شود
+    missing = sorted(key for key in results if key not in ref)
+    if missing:
+        print(f"⚠️ {name}: baseline برای {len(missing)} متریک ثبت نشده و پسرفتشان سنجیده نمی‌شود: "
+              f"{', '.join(missing)} (با --update-baseline ثبت کنید)")
+    if len(missing) == len(results):
+        return 0
+    failed = 0
+    for key, value in results.items():
+        if key not in ref or value is None or ref[key] is None:
+            continue
+        slack = args.slack_default if args.slack_ms is None else args.slack_ms
+        limit = ref[key] * (1 + args.tolerance) + slack
+        if value > limit:
+            print(f"❌ پسرفت {name}.{key}: {value} > {limit:.1f} (baseline {ref[key]})")
+            failed += 1
+    if not failed:
+        print(f"✅ {name}: در محدودهٔ baseline")
+    return 1 if failed else 0
+
+
+# ---------- startup ----------
+
+def _startup_once(timeout: float) -> dict:
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix="mc_bench_")
+    # پوشهٔ کاری موقت: فایل‌های وضعیت/تاریخچه/جلسه در مخزن نوشته نمی‌شوند
+    env = dict(os.environ, PORT=str(port), STATUS_PROBE_BACKEND=os.environ.get("STATUS_PROBE_BACKEND", "http"))
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.monotonic()
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "minecraft_manager.py")], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"پردازه با کد {proc.returncode} خارج شد")
+            if time.monotonic() - t0 > timeout:
+                raise RuntimeError(f"بعد از {timeout}s پاسخ سالمی نیامد")
+            try:
+                r = requests.get(base + "/api/status", timeout=1)
+                if r.status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.01)
+        wall_ms = (time.monotonic() - t0) * 1000
+        info = requests.get(base + "/api/startup", timeout=2).json()
+        phases = {p["name"]: p for p in info.get("phases", [])}
+        return {"wall_ms": wall_ms, "server_ms": info.get("first_healthy_response_ms"),
+                "imports_ms": phases.get("imports", {}).get("duration_ms"),
+                "bind_ms": (phases.get("bind", {}).get("start_ms") or 0) + (phases.get("bind", {}).get("duration_ms") or 0)}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def cmd_startup(args) -> int:
+    """زمان تا اولین پاسخ سالم /api/status از لحظهٔ اجرای پردازه.
+
+    گیت فقط روی p50 زمان شروع پردازه تا bind پورت است که خود سرور (StartupTracker) گزارش می‌دهد؛
+    زمان دیوار از بیرون (راه‌اندازی مفسر، زمان‌بندی polling) برای ماشین مشترک CI پرنوسان است و فقط چاپ می‌شود.
+    """
+    runs = []
+    for i in range(args.runs):
+        r = _startup_once(args.timeout)
+        runs.append(r)
+        print(f"run {i + 1}: first healthy response {r['wall_ms']:.0f}ms (wall), "
+              f"{r['server_ms']}ms (server), imports {r['imports_ms']}ms, bind at {r['bind_ms']:.0f}ms")
+    wall = _summary([r["wall_ms"] for r in runs])
+    bind = _summary([r["bind_ms"] for r in runs])
+    print(f"time-to-first-healthy-response ms: {json.dumps(wall)}")
+    print(f"process-start-to-bind ms (server): {json.dumps(bind)}")
+    return _check_baseline("startup", {"bind_p50_ms": bind["p50"]}, args)
+
+
+# ---------- detection ----------
+
+def load_corpus(directory=SNAPSHOT_DIR) -> dict:
+    """{نام فایل: (html، نتیجهٔ مورد انتظار)} از روی snapshots/expected.json"""
+    with open(os.path.join(directory, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    corpus = {}
+    for name, exp in expected.items():
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            corpus[name] = (f.read(), exp)
+    return corpus
+
+
+class _CorpusHandler(BaseHTTPRequestHandler):
+    """/<نام فایل>/<مسیر اصلی صفحه>؛ مسیر اصلی حفظ می‌شود تا تشخیص /login مثل سایت واقعی کار کند"""
+    pages = {}
+
+    def do_GET(self):
+        name = self.path.lstrip("/").partition("/")[0]
+        html = self.pages.get(name)
+        if html is None:
+            self.send_error(404)
+            return
+        body = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve_corpus(corpus):
+    handler = type("CorpusHandler", (_CorpusHandler,), {"pages": {n: html for n, (html, _) in corpus.items()}})
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+def _detect_http(mm, html, url, repeat):
+    from http_probe import probe_html
+
+    samples, got = [], None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        got = mm.detect_status(probe_html(html, url, mm.STATUS_SELECTORS, mm.BUTTON_SELECTORS))
+        samples.append((time.perf_counter() - t) * 1000)
+    return got, samples
+
+
+def _browser_driver(profile=None, backend=None):
+    import driver_engine
+
+    # بدون پروفایل پایدار و بدون مسدودسازی: صفحه‌های corpus محلی‌اند
+    return driver_engine.launch(profile, block=False, backend=backend)
+
+
+def _open_panel(mm, driver, url):
+    import readiness
+
+    driver.get(url)
+    return readiness.wait_for("bench_page",
+                              lambda: readiness.page_ready(driver, mm.STATUS_SELECTORS, mm.ALL_BUTTON_SELECTORS),
+                              timeout=mm.PAGE_READY_TIMEOUT)
+
+
+def _detect_browser(mm, driver, url, repeat):
+    _open_panel(mm, driver, url)
+    samples, got = [], None
+    for _ in range(repeat):
+        # همان یک رفت‌وبرگشت DOM_PROBE_SCRIPT که _get_server_status انجام می‌دهد
+        t = time.perf_counter()
+        got = mm.detect_status(driver.execute_script(mm.DOM_PROBE_SCRIPT, mm.STATUS_SELECTORS, mm.BUTTON_SELECTORS))
+        samples.append((time.perf_counter() - t) * 1000)
+    return got, samples
+
+
+def cmd_detection(args) -> int:
+    """تشخیص وضعیت/دکمه‌ها روی corpus ذخیره‌شده: درستی و تأخیر هر صفحه برای هر backend"""
+    import minecraft_manager as mm
+
+    corpus = load_corpus(args.corpus)
+    backends = ["http", "browser"] if args.backend == "all" else [args.backend]
+    results, wrong = {}, 0
+    for backend in backends:
+        driver = srv = None
+        if backend == "browser":
+            try:
+                driver = _browser_driver()
+            except Exception as e:
+                print(f"⚠️ browser: Chromium راه‌اندازی نشد ({str(e).splitlines()[0]})")
+                if args.backend == "browser":
+                    return 1
+                continue
+            srv, base = _serve_corpus(corpus)
+        try:
+            for name, (html, exp) in corpus.items():
+                if backend == "http":
+                    got, samples = _detect_http(mm, html, "https://magmanode.com" + exp["path"], args.repeat)
+                else:
+                    got, samples = _detect_browser(mm, driver, f"{base}/{name}{exp['path']}", args.repeat)
+                expected = {k: exp[k] for k in ("status", "start", "stop", "login_redirect")}
+                ok = got == expected
+                wrong += 0 if ok else 1
+                stats = _summary(samples)
+                results[f"{backend}/{name}"] = stats["p50"]
+                mark = "✅" if ok else f"❌ got {got}, expected {expected}"
+                print(f"{backend:7} {name:24} p50 {stats['p50']:7.3f}ms  p95 {stats['p95']:7.3f}ms  {mark}")
+        finally:
+            if driver:
+                driver.quit()
+            if srv:
+                srv.shutdown()
+    if wrong:
+        print(f"❌ {wrong} صفحه اشتباه تشخیص داده شد")
+    # تشخیص غلط همیشه شکست است؛ baseline فقط تأخیر را می‌سنجد
+    return max(1 if wrong else 0, _check_baseline("detection", results, args))
+
+
+# ---------- engine ----------
+
+def _engine_once(mm, profile, url, settle) -> dict:
+    import proc_mem
+
+    t = time.perf_counter()
+    driver = _browser_driver(profile)
+    cold_ms = (time.perf_counter() - t) * 1000
+    try:
+        # اولین پروب مثل مدیر: باز کردن صفحه، صبر تا رندر پنل، یک DOM_PROBE_SCRIPT
+        t = time.perf_counter()
+        _open_panel(mm, driver, url)
+        got = mm.detect_status(driver.execute_script(mm.DOM_PROBE_SCRIPT, mm.STATUS_SELECTORS, mm.BUTTON_SELECTORS))
+        probe_ms = (time.perf_counter() - t) * 1000
+        time.sleep(settle)
+        memory, processes = proc_mem.tree_memory(driver.service.process.pid)
+        return {"cold_start_ms": cold_ms, "first_probe_ms": probe_ms, "memory_mb": memory / 1024 / 1024,
+                "processes": processes, "status": got["status"]}
+    finally:
+        driver.quit()
+
+
+def cmd_engine(args) -> int:
+    """برای هر پروفایل driver_engine: زمان راه‌اندازی سرد، حافظهٔ پایدار (PSS درخت پردازه‌ها) و تأخیر اولین پروب"""
+    import driver_engine
+    import minecraft_manager as mm
+
+    corpus = load_corpus(args.corpus)
+    html, exp = corpus[args.page]
+    srv, base = _serve_corpus({args.page: (html, exp)})
+    profiles = list(driver_engine.PROFILES) if args.profile == "all" else [args.profile]
+    results, wrong = {}, 0
+    try:
+        for profile in profiles:
+            runs = []
+            for _ in range(args.runs):
+                try:
+                    runs.append(_engine_once(mm, profile, f"{base}/{args.page}{exp['path']}", args.settle))
+                except Exception as e:
+                    print(f"⚠️ {profile}: Chromium راه‌اندازی نشد ({str(e).splitlines()[0]})")
+                    return 1
+            wrong += sum(1 for r in runs if r["status"] != exp["status"])
+            row = {key: _summary([r[key] for r in runs]) for key in ("cold_start_ms", "first_probe_ms", "memory_mb")}
+            print(f"{profile:15} cold start p50 {row['cold_start_ms']['p50']:8.0f}ms  "
+                  f"first probe p50 {row['first_probe_ms']['p50']:7.0f}ms  "
+                  f"memory p50 {row['memory_mb']['p50']:6.0f}MB ({runs[-1]['processes']} processes)")
+            for key, stats in row.items():
+                results[f"{profile}/{key}_p50"] = stats["p50"]
+    finally:
+        srv.shutdown()
+    if wrong:
+        print(f"❌ {wrong} اجرا وضعیت اشتباه دید")
+    return max(1 if wrong else 0, _check_baseline("engine", results, args))
+
+
+# ---------- passive ----------
+
+def cmd_passive(args) -> int:
+    """بعد از تعویض درایور (نگهبان)، بستن بی‌کار یا ناوبری تازه، پروب بعدی باید از DOM_PROBE_SCRIPT بگذرد نه از وضعیت شبکهٔ قدیمی"""
+    from types import SimpleNamespace
+    import minecraft_manager as mm
+
+    if not mm.NETWORK_STATUS_ENABLED:
+        print("⚠️ NETWORK_STATUS_ENABLED خاموش است؛ پروب غیرفعال (passive) وجود ندارد")
+        return 1
+    corpus = load_corpus(args.corpus)
+    workdir = tempfile.mkdtemp(prefix="mc_bench_passive_")
+    failed = 0
+    manager = None
+    try:
+        # پروب HTTP: سازنده Chrome راه نمی‌اندازد؛ درایورها ساختگی‌اند چون فقط جابه‌جایی‌شان سنجیده می‌شود
+        mm.STATUS_PROBE_BACKEND = "http"
+        manager = mm.MinecraftServerManager("https://magmanode.com/server?id=bench",
+                                            status_file=os.path.join(workdir, "status.json"),
+                                            history_dir=os.path.join(workdir, "history"))
+        fake = lambda: SimpleNamespace(quit=lambda: None, get=lambda url: None)
+        html, exp = corpus[args.page]
+        from http_probe import probe_html
+        probe = probe_html(html, "https://magmanode.com" + exp["path"], mm.STATUS_SELECTORS, mm.BUTTON_SELECTORS)
+        frame = {"method": "Network.webSocketFrameReceived",
+                 "params": {"response": {"payloadData": json.dumps({"status": exp["status"]})}}}
+
+        def primed():
+            manager._last_dom_probe = dict(probe)
+            manager.net_status.feed(None, [frame])
+            return manager._passive_probe() is not None
+
+        cases = {
+            "swap_driver": lambda: manager.browser.swap_driver(fake(), {}),
+            "quit_idle": manager._quit_driver,
+            "navigate": lambda: manager._safe_get(manager.server_url),
+        }
+        manager.browser.set_driver(fake())
+        for name, event in cases.items():
+            if manager.browser.driver is None:
+                manager.browser.set_driver(fake())
+            if not primed():
+                print(f"❌ {name}: وضعیت شبکه حتی قبل از رویداد هم پروب غیرفعال نداد")
+                failed += 1
+                continue
+            event()
+            ok = manager._passive_probe() is None
+            failed += 0 if ok else 1
+            print(f"{name:12} {'✅ پروب بعدی از DOM' if ok else '❌ وضعیت قدیمی شبکه هنوز پاسخ می‌دهد'}")
+    finally:
+        if manager is not None:
+            manager.browser.set_driver(None)
+            manager.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if failed else 0
+
+
+# ---------- cdp ----------
+
+FAKE_DEVTOOLS = os.path.join(HERE, "fake_devtools.py")
+
+
+def _cdp_checks(driver_engine, cdp_backend, repeat) -> dict:
+    """{نام بررسی: (درست؟، توضیح)} روی fake_devtools؛ زمان هر فرمان هم در samples جمع می‌شود"""
+    import block_profile
+
+    checks, samples = {}, {}
+
+    def timed(name, fn):
+        runs = samples.setdefault(name, [])
+        for _ in range(repeat):
+            t = time.perf_counter()
+            got = fn()
+            runs.append((time.perf_counter() - t) * 1000)
+        return got
+
+    driver = driver_engine.launch(backend="cdp", block=True)
+    tmpdir = driver._tmpdir
+    try:
+        checks["launch"] = (driver_engine.backend_of(driver) == "cdp", driver_engine.backend_of(driver))
+        url = "https://magmanode.com/server?id=bench"
+        timed("get", lambda: driver.get(url))
+        checks["get"] = (driver.current_url == url, driver.current_url)
+        arg = {"selectors": [".status"], "n": 3, "text": "وضعیت"}
+        got = timed("execute_script", lambda: driver.execute_script("return arguments[0];", arg))
+        checks["execute_script"] = (got == arg, got)
+        try:
+            driver.execute_script("throw new Error('x');")
+            checks["script_error"] = (False, "exception نیامد")
+        except cdp_backend.CdpError as e:
+            checks["script_error"] = (True, str(e))
+        els = timed("find_elements", lambda: driver.find_elements("css selector", "button"))
+        texts = [el.text for el in els]
+        checks["find_elements"] = (texts == ["START", "STOP"], texts)
+        timed("click", lambda: els[0].click())
+        checks["perf_events"] = (any(m["method"] == "Page.loadEventFired" for m in block_profile.read_perf_messages(driver)),
+                                 "Page.loadEventFired")
+        # تب تازه (ناوگان) باید stealth و الگوهای مسدودسازی تب اول را بگیرد
+        first = driver.current_window_handle
+        driver.switch_to.new_window("tab")
+        sid = driver._sessions[driver.current_window_handle]
+        cmds = driver.execute_cdp_cmd("Fake.commands")["commands"]
+        per_tab = {tab: {m for s, m in cmds if s == driver._sessions[tab]} for tab in (first, driver.current_window_handle)}
+        wanted = {"Page.addScriptToEvaluateOnNewDocument"}
+        if block_profile.get_profile()["patterns"]:
+            wanted.add("Network.setBlockedURLs")
+        checks["new_tab_setup"] = (all(wanted <= methods for methods in per_tab.values()),
+                                   f"{sid}: {sorted(wanted & per_tab[driver.current_window_handle])}")
+    finally:
+        driver.quit()
+    checks["quit_cleanup"] = (driver.proc.returncode is not None and not os.path.exists(tmpdir), tmpdir)
+    return checks, samples
+
+
+def _cdp_failed_launch(cdp_backend) -> tuple:
+    """خطا هنگام attach: Chromium کشته، پوشهٔ موقت پاک و اتصال (سوکت + ترد خواننده) به‌دست launch بسته شود"""
+    opened = []
+
+    # کشتن Chromium سوکت را از آن سمت هم می‌بندد؛ پس خودِ close() شمرده می‌شود، نه فقط نشت ترد
+    class Tracked(cdp_backend.CdpConnection):
+        def __init__(self, *a, **kw):
+            self.closed_by_launch = False
+            opened.append(self)
+            super().__init__(*a, **kw)
+
+        def close(self):
+            self.closed_by_launch = True
+            super().close()
+
+    original = cdp_backend.CdpConnection
+    tmp_before = set(os.listdir(tempfile.gettempdir()))
+    cdp_backend.CdpConnection = Tracked
+    os.environ["FAKE_DEVTOOLS_FAIL"] = "Target.attachToTarget"
+    try:
+        cdp_backend.launch(FAKE_DEVTOOLS, [], timeout=10)
+        return False, "launch باید خطا می‌داد"
+    except cdp_backend.CdpError as e:
+        error = str(e)
+    finally:
+        cdp_backend.CdpConnection = original
+        os.environ.pop("FAKE_DEVTOOLS_FAIL", None)
+    closed = bool(opened) and all(c.closed_by_launch for c in opened)
+    left = [n for n in set(os.listdir(tempfile.gettempdir())) - tmp_before if n.startswith("mc_cdp_")]
+    return closed and not left, f"{error}; connection closed={closed} tmp={left}"
+
+
+def cmd_cdp(args) -> int:
+    """backend مستقیم CDP روی fake_devtools (بدون Chromium): launch، get، find_elements، execute_script،
+    تنظیمات تب تازه و پاک‌سازی launch ناموفق؛ به‌علاوهٔ سربار هر فرمان در سمت کلاینت"""
+    import cdp_backend
+    import driver_engine
+
+    driver_engine.CHROME_BIN = FAKE_DEVTOOLS
+    checks, samples = _cdp_checks(driver_engine, cdp_backend, args.repeat)
+    checks["failed_launch_cleanup"] = _cdp_failed_launch(cdp_backend)
+    failed = 0
+    for name, (ok, detail) in checks.items():
+        failed += 0 if ok else 1
+        print(f"{name:22} {'✅' if ok else '❌'} {detail}")
+    results = {}
+    for name, runs in samples.items():
+        stats = _summary(runs)
+        print(f"  {name:20} p50 {stats['p50']:8.3f}ms  p95 {stats['p95']:8.3f}ms")
+        results[f"{name}_p50"] = stats["p50"]
+    if failed:
+        print(f"❌ {failed} بررسی CDP شکست خورد")
+    return max(1 if failed else 0, _check_baseline("cdp", results, args))
+
+
+# ---------- backend ----------
+
+def _backend_commands(mm, driver, url):
+    """فرمان‌هایی که مدیر در هر چرخه می‌فرستد؛ هر کدام یک رفت‌وبرگشت به مرورگر"""
+    css = ", ".join(mm.STATUS_SELECTORS)
+
+    def first():
+        return driver.find_elements("css selector", css)[0]
+
+    return {
+        "dom_probe": lambda: driver.execute_script(mm.DOM_PROBE_SCRIPT, mm.STATUS_SELECTORS, mm.BUTTON_SELECTORS),
+        "find_elements": lambda: driver.find_elements("css selector", css),
+        "element_text": lambda: first().text,
+        "is_displayed": lambda: first().is_displayed(),
+        "current_url": lambda: driver.current_url,
+        "get_cookies": lambda: driver.execute_cdp_cmd("Network.getCookies", {"urls": [url]}),
+        "navigate": lambda: driver.get(url),
+    }
+
+
+def _backend_once(mm, backend, url, repeat, settle) -> dict:
+    import driver_engine
+    import proc_mem
+
+    t = time.perf_counter()
+    driver = _browser_driver(backend=backend)
+    cold_ms = (time.perf_counter() - t) * 1000
+    try:
+        launched = driver_engine.backend_of(driver)
+        if launched != backend:
+            raise RuntimeError(f"به‌جای {backend} با {launched} بالا آمد")
+        _open_panel(mm, driver, url)
+        got = mm.detect_status(driver.execute_script(mm.DOM_PROBE_SCRIPT, mm.STATUS_SELECTORS, mm.BUTTON_SELECTORS))
+        samples = {}
+        for name, fn in _backend_commands(mm, driver, url).items():
+            runs = samples[name] = []
+            for _ in range(repeat if name != "navigate" else max(1, repeat // 10)):
+                t = time.perf_counter()
+                fn()
+                runs.append((time.perf_counter() - t) * 1000)
+        time.sleep(settle)
+        # در selenium ریشهٔ درخت chromedriver است و خودش هم شمرده می‌شود؛ در cdp خود Chromium
+        memory, processes = proc_mem.tree_memory(driver.service.process.pid)
+        return {"cold_start_ms": cold_ms, "memory_mb": memory / 1024 / 1024, "processes": processes,
+                "commands": samples, "status": got["status"]}
+    finally:
+        driver.quit()
+
+
+def cmd_backend(args) -> int:
+    """selenium (chromedriver) در برابر websocket مستقیم CDP: تأخیر هر فرمان، راه‌اندازی سرد و حافظه"""
+    import driver_engine
+    import minecraft_manager as mm
+
+    corpus = load_corpus(args.corpus)
+    html, exp = corpus[args.page]
+    srv, base = _serve_corpus({args.page: (html, exp)})
+    backends = list(driver_engine.BACKENDS) if args.backend == "all" else [args.backend]
+    results, wrong = {}, 0
+    try:
+        for backend in backends:
+            try:
+                r = _backend_once(mm, backend, f"{base}/{args.page}{exp['path']}", args.repeat, args.settle)
+            except Exception as e:
+                print(f"⚠️ {backend}: راه‌اندازی نشد ({str(e).splitlines()[0]})")
+                return 1
+            wrong += 1 if r["status"] != exp["status"] else 0
+            print(f"{backend:9} cold start {r['cold_start_ms']:8.0f}ms  "
+                  f"memory {r['memory_mb']:6.0f}MB ({r['processes']} processes)")
+            results[f"{backend}/cold_start_ms"] = r["cold_start_ms"]
+            results[f"{backend}/memory_mb"] = r["memory_mb"]
+            for name, samples in r["commands"].items():
+                stats = _summary(samples)
+                print(f"  {name:14} p50 {stats['p50']:8.3f}ms  p95 {stats['p95']:8.3f}ms")
+                results[f"{backend}/{name}_p50"] = stats["p50"]
+    finally:
+        srv.shutdown()
+    if wrong:
+        print(f"❌ {wrong} backend وضعیت اشتباه دید")
+    return max(1 if wrong else 0, _check_baseline("backend", results, args))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="بنچمارک‌های مدیر سرور")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="فایل JSON مقادیر مرجع")
+    parser.add_argument("--update-baseline", action="store_true", help="نتیجهٔ این اجرا را baseline کن")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="پسرفت مجاز نسبی (0.25 = 25%%)")
+    parser.add_argument("--slack-ms", type=float, default=None,
+                        help="پسرفت مجاز مطلق برای نویز زمان‌بندی (پیش‌فرض وابسته به زیرفرمان)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("startup", help="زمان تا اولین پاسخ سالم HTTP")
+    p.add_argument("--runs", type=int, default=15)
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.set_defaults(func=cmd_startup, slack_default=50.0)
+
+    p = sub.add_parser("detection", help="تشخیص وضعیت روی corpus صفحه‌های ذخیره‌شده")
+    p.add_argument("--backend", choices=["http", "browser", "all"], default="all")
+    p.add_argument("--corpus", default=SNAPSHOT_DIR)
+    p.add_argument("--repeat", type=int, default=50, help="تعداد اندازه‌گیری برای هر صفحه")
+    p.set_defaults(func=cmd_detection, slack_default=1.0)
+
+    p = sub.add_parser("engine", help="پروفایل‌های راه‌اندازی Chrome: راه‌اندازی سرد، حافظه، اولین پروب")
+    p.add_argument("--profile", default="all", help="نام پروفایل driver_engine یا all")
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--corpus", default=SNAPSHOT_DIR)
+    p.add_argument("--page", default="running.html", help="صفحهٔ corpus برای اولین پروب")
+    p.add_argument("--settle", type=float, default=3.0, help="ثانیه انتظار قبل از اندازه‌گیری حافظه")
+    p.set_defaults(func=cmd_engine, slack_default=50.0)
+
+    p = sub.add_parser("passive", help="تعویض/بستن درایور و ناوبری تازه، پروب غیرفعال شبکه را باطل می‌کند")
+    p.add_argument("--corpus", default=SNAPSHOT_DIR)
+    p.add_argument("--page", default="running.html", help="صفحهٔ corpus به‌عنوان آخرین پروب DOM")
+    p.set_defaults(func=cmd_passive)
+
+    p = sub.add_parser("cdp", help="backend مستقیم CDP روی DevTools ساختگی (بدون Chromium)")
+    p.add_argument("--repeat", type=int, default=20, help="تعداد اندازه‌گیری برای هر فرمان")
+    p.set_defaults(func=cmd_cdp, slack_default=1.0)
+
+    p = sub.add_parser("backend", help="selenium در برابر CDP مستقیم: تأخیر هر فرمان و حافظه")
+    p.add_argument("--backend", choices=["selenium", "cdp", "all"], default="all")
+    p.add_argument("--repeat", type=int, default=50, help="تعداد اندازه‌گیری برای هر فرمان")
+    p.add_argument("--corpus", default=SNAPSHOT_DIR)
+    p.add_argument("--page", default="running.html", help="صفحهٔ corpus برای اندازه‌گیری")
+    p.add_argument("--settle", type=float, default=3.0, help="ثانیه انتظار قبل از اندازه‌گیری حافظه")
+    p.set_defaults(func=cmd_backend, slack_default=5.0)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger("block_profile")
+
+# پروفایل مسدودسازی درخواست‌های غیرضروری صفحهٔ پنل (تبلیغ، consent، فونت، تصویر)
+# off: هیچ | ads: فقط تبلیغ/ردیاب/consent | lean: ads + فونت + تصویر
+BLOCK_PROFILE = os.environ.get("BROWSER_BLOCK_PROFILE", "lean").strip().lower()
+BLOCK_EXTRA_PATTERNS = [p.strip() for p in os.environ.get("BROWSER_BLOCK_EXTRA", "").split(",") if p.strip()]
+
+AD_PATTERNS = [
+    "*fundingchoicesmessages.google.com*",
+    "*googlesyndication.com*",
+    "*doubleclick.net*",
+    "*googleadservices.com*",
+    "*adservice.google.*",
+    "*googletagmanager.com*",
+    "*google-analytics.com*",
+    "*amazon-adsystem.com*",
+    "*adnxs.com*",
+    "*static.cloudflareinsights.com*",
+]
+FONT_PATTERNS = [
+    "*fonts.googleapis.com*",
+    "*fonts.gstatic.com*",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+]
+# CSS خود پنل مسدود نمی‌شود: بدون آن کلاس‌هایی مثل hidden اثر ندارند و تشخیص دکمه‌ها غلط می‌شود
+IMAGE_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif",
+]
+
+PROFILES = {
+    "off": {"patterns": [], "images": False},
+    "ads": {"patterns": AD_PATTERNS, "images": False},
+    "lean": {"patterns": AD_PATTERNS + FONT_PATTERNS + IMAGE_PATTERNS, "images": True},
+}
+
+# تخمین حجم هر درخواست مسدودشده بر اساس نوع منبع (بایت)
+ESTIMATED_BYTES = {
+    "Image": 40_000,
+    "Font": 35_000,
+    "Script": 90_000,
+    "Stylesheet": 20_000,
+    "Document": 60_000,
+    "XHR": 5_000,
+    "Fetch": 5_000,
+    "Other": 10_000,
+}
+
+
+def get_profile(name=None) -> dict:
+    name = (name or BLOCK_PROFILE).strip().lower()
+    if name not in PROFILES:
+        logger.warning(f"⚠️ پروفایل مسدودسازی ناشناخته «{name}»؛ از lean استفاده می‌کنم.")
+        name = "lean"
+    prof = PROFILES[name]
+    return {"name": name, "patterns": prof["patterns"] + BLOCK_EXTRA_PATTERNS, "images": prof["images"]}
+
+
+def chrome_args(name=None) -> list:
+    """پرچم‌های خط فرمان پروفایل (برای راه‌اندازی بدون chromedriver هم کافی است)"""
+    return ["--blink-settings=imagesEnabled=false"] if get_profile(name)["images"] else []
+
+
+def apply_to_options(opts, name=None):
+    """تنظیمات Chrome که قبل از راه‌اندازی لازم است: غیرفعال‌کردن تصاویر و لاگ شبکه برای شمارش"""
+    prof = get_profile(name)
+    for arg in chrome_args(name):
+        opts.add_argument(arg)
+    if prof["images"]:
+        opts.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if prof["patterns"]:
+        opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return opts
+
+
+def apply_to_driver(driver, name=None) -> int:
+    """الگوهای URL را روی تب فعلی از طریق CDP فعال می‌کند (برای هر تب جدید دوباره صدا زده شود)"""
+    prof = get_profile(name)
+    if not prof["patterns"]:
+        return 0
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": prof["patterns"]})
+        return len(prof["patterns"])
+    except Exception as e:
+        logger.debug(f"Network.setBlockedURLs error: {e}")
+        return 0
+
+
+class BlockStats:
+    """شمارندهٔ درخواست‌های مسدودشده و حجم صرفه‌جویی‌شدهٔ تخمینی، به تفکیک نوع منبع"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_type = {}
+        self.blocked = 0
+        self.bytes_saved = 0
+
+    def record(self, messages) -> dict:
+        """پیام‌های perf log (CDP) را می‌گیرد و تعداد جدید هر نوع را برمی‌گرداند"""
+        delta = {}
+        for msg in messages:
+            if msg.get("method") != "Network.loadingFailed":
+                continue
+            params = msg.get("params", {})
+            if not params.get("blockedReason"):
+                continue
+            rtype = params.get("type") or "Other"
+            delta[rtype] = delta.get(rtype, 0) + 1
+        if delta:
+            with self._lock:
+                for rtype, n in delta.items():
+                    self.by_type[rtype] = self.by_type.get(rtype, 0) + n
+                    self.blocked += n
+                    self.bytes_saved += n * estimated_bytes(rtype)
+        return delta
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"profile": get_profile()["name"], "blocked": self.blocked,
+                    "bytes_saved_estimate": self.bytes_saved, "by_type": dict(self.by_type)}
+
+
+def estimated_bytes(rtype: str) -> int:
+    return ESTIMATED_BYTES.get(rtype, ESTIMATED_BYTES["Other"])
+
+
+def read_perf_messages(driver) -> list:
+    """perf log را خالی می‌کند و پیام‌های CDP را برمی‌گرداند"""
+    # backend مستقیم CDP رویدادها را بدون رفت‌وبرگشت JSON سلنیوم می‌دهد
+    drain = getattr(driver, "drain_events", None)
+    if drain is not None:
+        return drain()
+    out = []
+    try:
+        for entry in driver.get_log("performance"):
+            try:
+                out.append(json.loads(entry["message"])["message"])
+            except Exception:
+                continue
+    except Exception:
+        pass
+    return out
+
+
+STATS = BlockStats()
@@ -0,0 +1,509 @@
+import os
+import json
+import time
+import base64
+import socket
+import shutil
+import hashlib
+import logging
+import itertools
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+logger = logging.getLogger("cdp_backend")
+
+# گفت‌وگوی مستقیم با DevTools websocket خود Chromium؛ بدون پردازهٔ chromedriver و بدون وابستگی خارجی
+CDP_LAUNCH_TIMEOUT = float(os.environ.get("CDP_LAUNCH_TIMEOUT", "30"))
+CDP_COMMAND_TIMEOUT = float(os.environ.get("CDP_COMMAND_TIMEOUT", "60"))
+CDP_PAGE_LOAD_TIMEOUT = float(os.environ.get("CDP_PAGE_LOAD_TIMEOUT", "60"))
+# رویدادهای Network/Page تا خوانده شدن (مثل perf log سلنیوم)؛ قدیمی‌ترها دور ریخته می‌شوند
+CDP_EVENT_BUFFER = int(os.environ.get("CDP_EVENT_BUFFER", "5000"))
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# تنظیمات per-target که هر تب تازه هم باید بگیرد (stealth، الگوهای مسدودسازی، ...)؛ آخرین مقدار هر setter نگه داشته می‌شود
+TAB_SETTERS = ("Network.setBlockedURLs", "Network.setExtraHTTPHeaders", "Network.setUserAgentOverride",
+               "Emulation.setUserAgentOverride")
+TAB_SCRIPTS = "Page.addScriptToEvaluateOnNewDocument"
+
+DISPLAYED_FN = """function() {
+  const s = getComputedStyle(this);
+  if (s.visibility === 'hidden' || s.display === 'none' || parseFloat(s.opacity) === 0) return false;
+  const r = this.getBoundingClientRect();
+  return r.width > 0 && r.height > 0;
+}"""
+# مرکز المنت بعد از اسکرول؛ hit=false یعنی المنت دیگری روی آن است (مثل ElementClickIntercepted سلنیوم)
+CLICK_POINT_FN = """function() {
+  this.scrollIntoView({block: 'center', inline: 'center'});
+  const r = this.getBoundingClientRect();
+  if (!r.width || !r.height) return null;
+  const x = r.left + r.width / 2, y = r.top + r.height / 2;
+  const t = document.elementFromPoint(x, y);
+  return {x: x, y: y, hit: !!t && (t === this || this.contains(t))};
+}"""
+XPATH_FN = """(function(x) {
+  const r = document.evaluate(x, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+  const out = [];
+  for (let i = 0; i < r.snapshotLength; i++) out.push(r.snapshotItem(i));
+  return out;
+})(%s)"""
+
+
+class CdpError(Exception):
+    pass
+
+
+class WebSocket:
+    """کلاینت حداقلی RFC 6455 برای ws:// محلی: فریم متنی، fragment، ping/pong؛ بدون TLS و extension"""
+
+    def __init__(self, url, timeout=CDP_LAUNCH_TIMEOUT):
+        u = urlparse(url)
+        self.sock = socket.create_connection((u.hostname, u.port or 80), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        self.sock.sendall((f"GET {path} HTTP/1.1\r\nHost: {u.netloc}\r\nUpgrade: websocket\r\n"
+                           f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                           f"Sec-WebSocket-Version: 13\r\n\r\n").encode())
+        self._rf = self.sock.makefile("rb")
+        status = self._rf.readline()
+        headers = {}
+        while True:
+            line = self._rf.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        if b" 101 " not in status or headers.get("sec-websocket-accept") != accept:
+            raise CdpError(f"websocket handshake رد شد: {status.strip()!r}")
+        self.sock.settimeout(None)
+        self._send_lock = threading.Lock()
+
+    @staticmethod
+    def _mask(payload: bytes, mask: bytes) -> bytes:
+        # XOR کل payload در یک عملیات عدد صحیح؛ حلقه روی بایت‌ها برای بدنه‌های بزرگ کند است
+        n = len(payload)
+        if not n:
+            return b""
+        key = (mask * (n // 4 + 1))[:n]
+        return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        n = len(payload)
+        head = bytearray([0x80 | opcode])
+        if n < 126:
+            head.append(0x80 | n)
+        elif n < 1 << 16:
+            head.append(0x80 | 126)
+            head += n.to_bytes(2, "big")
+        else:
+            head.append(0x80 | 127)
+            head += n.to_bytes(8, "big")
+        mask = os.urandom(4)
+        with self._send_lock:
+            self.sock.sendall(bytes(head) + mask + self._mask(payload, mask))
+
+    def send(self, text: str):
+        self._send_frame(0x1, text.encode("utf-8"))
+
+    def _read_exact(self, n: int) -> bytes:
+        data = self._rf.read(n)
+        if data is None or len(data) < n:
+            raise ConnectionError("websocket بسته شد")
+        return data
+
+    def recv(self) -> str:
+        """یک پیام کامل (fragmentها سرهم می‌شوند)؛ ping همین‌جا پاسخ می‌گیرد"""
+        parts = []
+        while True:
+            b1, b2 = self._read_exact(2)
+            opcode, n = b1 & 0x0F, b2 & 0x7F
+            if n == 126:
+                n = int.from_bytes(self._read_exact(2), "big")
+            elif n == 127:
+                n = int.from_bytes(self._read_exact(8), "big")
+            mask = self._read_exact(4) if b2 & 0x80 else None
+            payload = self._read_exact(n) if n else b""
+            if mask:
+                payload = self._mask(payload, mask)
+            if opcode == 0x8:
+                raise ConnectionError("websocket از سمت مرورگر بسته شد")
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+            parts.append(payload)
+            if b1 & 0x80:
+                return b"".join(parts).decode("utf-8")
+
+    def close(self):
+        try:
+            self._send_frame(0x8, b"")
+        except Exception:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        self.sock.close()
+
+
+class CdpConnection:
+    """یک websocket به browser target؛ هر تب یک session (flatten). ترد خواننده پاسخ‌ها را به فرمان‌ها می‌رساند
+    و رویدادهای Network/Page را برای perf log نگه می‌دارد"""
+
+    def __init__(self, ws_url):
+        self.ws = WebSocket(ws_url)
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._results = {}
+        self._abandoned = set()
+        self._loads = {}
+        self.events = deque(maxlen=CDP_EVENT_BUFFER)
+        self.closed = None
+        threading.Thread(target=self._reader, daemon=True, name="cdp-reader").start()
+
+    def _reader(self):
+        try:
+            while True:
+                msg = json.loads(self.ws.recv())
+                if "id" in msg:
+                    with self._cond:
+                        if msg["id"] in self._abandoned:
+                            self._abandoned.discard(msg["id"])
+                        else:
+                            self._results[msg["id"]] = msg
+                            self._cond.notify_all()
+                    continue
+                method = msg.get("method", "")
+                if method == "Page.loadEventFired":
+                    sid = msg.get("sessionId")
+                    with self._cond:
+                        self._loads[sid] = self._loads.get(sid, 0) + 1
+                        self._cond.notify_all()
+                if method.startswith(("Network.", "Page.")):
+                    self.events.append({"method": method, "params": msg.get("params", {})})
+        except Exception as e:
+            with self._cond:
+                self.closed = str(e) or type(e).__name__
+                self._cond.notify_all()
+
+    def _write(self, method, params, session_id):
+        if self.closed:
+            raise CdpError(f"اتصال CDP بسته است: {self.closed}")
+        cid = next(self._ids)
+        msg = {"id": cid, "method": method, "params": params or {}}
+        if session_id:
+            msg["sessionId"] = session_id
+        self.ws.send(json.dumps(msg, separators=(",", ":")))
+        return cid
+
+    def send(self, method, params=None, session_id=None, timeout=CDP_COMMAND_TIMEOUT) -> dict:
+        cid = self._write(method, params, session_id)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while cid not in self._results:
+                remaining = deadline - time.monotonic()
+                if self.closed or remaining <= 0:
+                    self._abandoned.add(cid)
+                    raise CdpError(f"{method}: " + (f"اتصال بسته شد ({self.closed})" if self.closed
+                                                    else f"پاسخی در {timeout}s نیامد"))
+                self._cond.wait(remaining)
+            reply = self._results.pop(cid)
+        if "error" in reply:
+            raise CdpError(f"{method}: {reply['error'].get('message')}")
+        return reply.get("result", {})
+
+    def post(self, method, params=None, session_id=None):
+        """فرمانی که نتیجه‌اش لازم نیست (مثل releaseObject)؛ منتظر پاسخ نمی‌ماند"""
+        cid = self._write(method, params, session_id)
+        with self._cond:
+            if self._results.pop(cid, None) is None:
+                self._abandoned.add(cid)
+
+    def load_count(self, session_id) -> int:
+        with self._cond:
+            return self._loads.get(session_id, 0)
+
+    def wait_load(self, session_id, after: int, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._loads.get(session_id, 0) > after or self.closed, timeout) \
+                and not self.closed
+
+    def close(self):
+        self.ws.close()
+
+
+class CdpElement:
+    """handle یک المنت (objectId در همان تب)؛ همان چند متدی که از WebElement سلنیوم استفاده می‌کنیم"""
+
+    def __init__(self, driver, object_id, session_id):
+        self._driver = driver
+        self.object_id = object_id
+        self._session = session_id
+
+    def _call(self, fn, *args):
+        res = self._driver.conn.send("Runtime.callFunctionOn", {
+            "objectId": self.object_id, "functionDeclaration": fn,
+            "arguments": [{"value": a} for a in args], "returnByValue": True,
+        }, self._session)
+        return _result_value(res)
+
+    @property
+    def text(self) -> str:
+        return self._call("function() { return (this.innerText || '').trim(); }") or ""
+
+    def is_displayed(self) -> bool:
+        return bool(self._call(DISPLAYED_FN))
+
+    def is_enabled(self) -> bool:
+        return bool(self._call("function() { return !this.disabled; }"))
+
+    def get_attribute(self, name):
+        return self._call("function(n) { return this.getAttribute(n); }", name)
+
+    def click(self):
+        """کلیک واقعی ماوس (Input.dispatchMouseEvent) روی مرکز المنت"""
+        point = self._call(CLICK_POINT_FN)
+        if not point:
+            raise CdpError("element not interactable")
+        if not point["hit"]:
+            raise CdpError("element click intercepted")
+        for kind in ("mouseMoved", "mousePressed", "mouseReleased"):
+            self._driver.conn.send("Input.dispatchMouseEvent", {
+                "type": kind, "x": point["x"], "y": point["y"], "button": "left", "clickCount": 1,
+            }, self._session)
+
+
+def _result_value(res: dict):
+    if "exceptionDetails" in res:
+        details = res["exceptionDetails"]
+        raise CdpError((details.get("exception") or {}).get("description") or details.get("text") or "JS error")
+    return res.get("result", {}).get("value")
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def new_window(self, type_hint="tab"):
+        target = self._driver.conn.send("Target.createTarget", {"url": "about:blank"})["targetId"]
+        self._driver._attach(target)
+
+    def window(self, handle):
+        self._driver._session = self._driver._sessions[handle]
+        self._driver.current_window_handle = handle
+
+
+class CdpDriver:
+    """زیرمجموعه‌ای از API WebDriver سلنیوم که مدیر و ابزارها لازم دارند، روی CDP مستقیم"""
+
+    backend = "cdp"
+
+    def __init__(self, proc, conn, tmpdir=None):
+        self.proc = proc
+        self.conn = conn
+        self._tmpdir = tmpdir
+        # نگهبان حافظه درخت پردازه را از service.process.pid می‌خواند؛ اینجا ریشه خود Chromium است
+        self.service = SimpleNamespace(process=proc)
+        self.switch_to = _SwitchTo(self)
+        self._sessions = {}
+        self._session = None
+        self.current_window_handle = None
+        self._tab_setup = {}
+        self._tab_scripts = []
+        targets = conn.send("Target.getTargets")["targetInfos"]
+        page = next((t for t in targets if t["type"] == "page"), None)
+        self._attach(page["targetId"] if page else conn.send("Target.createTarget", {"url": "about:blank"})["targetId"])
+
+    def _attach(self, target_id):
+        sid = self.conn.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})["sessionId"]
+        self._sessions[target_id] = sid
+        self._session = sid
+        self.current_window_handle = target_id
+        # رویدادهای load (برای get) و شبکه (برای perf log / network_status)
+        self.conn.send("Page.enable", session_id=sid)
+        self.conn.send("Network.enable", session_id=sid)
+        # در سلنیوم on_new_tab فقط مسدودسازی را دوباره اعمال می‌کند؛ اینجا همهٔ تنظیمات تب اول تکرار می‌شوند
+        for params in self._tab_scripts:
+            self.conn.send(TAB_SCRIPTS, params, sid)
+        for method, params in self._tab_setup.items():
+            self.conn.send(method, params, sid)
+
+    @property
+    def window_handles(self):
+        return list(self._sessions)
+
+    def execute_cdp_cmd(self, cmd, cmd_args=None):
+        result = self.conn.send(cmd, cmd_args or {}, self._session)
+        if cmd == TAB_SCRIPTS:
+            if cmd_args not in self._tab_scripts:
+                self._tab_scripts.append(dict(cmd_args))
+        elif cmd in TAB_SETTERS:
+            self._tab_setup[cmd] = dict(cmd_args or {})
+        return result
+
+    def get(self, url):
+        before = self.conn.load_count(self._session)
+        res = self.execute_cdp_cmd("Page.navigate", {"url": url})
+        if res.get("errorText"):
+            raise CdpError(f"navigate {url}: {res['errorText']}")
+        # بدون loaderId یعنی ناوبری درون‌سندی (#hash)؛ رویداد load نمی‌آید
+        if res.get("loaderId") and not self.conn.wait_load(self._session, before, CDP_PAGE_LOAD_TIMEOUT):
+            raise CdpError(f"صفحه در {CDP_PAGE_LOAD_TIMEOUT}s لود نشد: {url}")
+
+    @property
+    def current_url(self) -> str:
+        return self.execute_script("return location.href;")
+
+    def execute_script(self, script, *args):
+        """همان قرارداد سلنیوم: بدنهٔ تابع با arguments؛ المنت‌ها به‌صورت handle، بقیه به‌صورت JSON"""
+        body = "function() {\n" + script + "\n}"
+        element = next((a for a in args if isinstance(a, CdpElement)), None)
+        if element is not None:
+            res = self.conn.send("Runtime.callFunctionOn", {
+                "objectId": element.object_id, "functionDeclaration": body, "returnByValue": True,
+                "arguments": [{"objectId": a.object_id} if isinstance(a, CdpElement) else {"value": a} for a in args],
+            }, self._session)
+        else:
+            res = self.execute_cdp_cmd("Runtime.evaluate", {
+                "expression": f"({body}).apply(window, {json.dumps(list(args))})", "returnByValue": True,
+            })
+        return _result_value(res)
+
+    def find_elements(self, by, value):
+        if by == "css selector":
+            expr = f"Array.from(document.querySelectorAll({json.dumps(value)}))"
+        elif by == "tag name":
+            expr = f"Array.from(document.getElementsByTagName({json.dumps(value)}))"
+        elif by == "xpath":
+            expr = XPATH_FN % json.dumps(value)
+        else:
+            raise CdpError(f"لوکیتور پشتیبانی نمی‌شود: {by}")
+        res = self.execute_cdp_cmd("Runtime.evaluate", {"expression": expr})
+        _result_value(res)
+        array_id = res["result"]["objectId"]
+        props = self.execute_cdp_cmd("Runtime.getProperties", {"objectId": array_id, "ownProperties": True})
+        self.conn.post("Runtime.releaseObject", {"objectId": array_id}, self._session)
+        items = sorted((int(p["name"]), p["value"]["objectId"]) for p in props.get("result", [])
+                       if p["name"].isdigit() and (p.get("value") or {}).get("objectId"))
+        return [CdpElement(self, oid, self._session) for _, oid in items]
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found:
+            raise CdpError(f"no such element: {by}={value}")
+        return found[0]
+
+    def add_cookie(self, cookie: dict):
+        params = {"name": cookie["name"], "value": cookie["value"], "path": cookie.get("path") or "/",
+                  "secure": bool(cookie.get("secure", False)), "httpOnly": bool(cookie.get("httpOnly", False))}
+        if cookie.get("domain"):
+            params["domain"] = cookie["domain"]
+        else:
+            params["url"] = self.current_url
+        if cookie.get("expiry"):
+            params["expires"] = int(cookie["expiry"])
+        if cookie.get("sameSite"):
+            params["sameSite"] = cookie["sameSite"]
+        if not self.execute_cdp_cmd("Network.setCookie", params).get("success", True):
+            raise CdpError(f"کوکی {cookie['name']} پذیرفته نشد")
+
+    def get_cookies(self) -> list:
+        out = []
+        for c in self.execute_cdp_cmd("Network.getCookies").get("cookies", []):
+            item = {k: c[k] for k in ("name", "value", "domain", "path", "secure", "httpOnly") if k in c}
+            if c.get("expires", -1) > 0:
+                item["expiry"] = int(c["expires"])
+            out.append(item)
+        return out
+
+    def delete_all_cookies(self):
+        self.execute_cdp_cmd("Network.clearBrowserCookies")
+
+    def drain_events(self) -> list:
+        """رویدادهای CDP از آخرین خواندن (همان قالب پیام‌های read_perf_messages)"""
+        out = []
+        while True:
+            try:
+                out.append(self.conn.events.popleft())
+            except IndexError:
+                return out
+
+    def get_log(self, log_type):
+        if log_type != "performance":
+            return []
+        return [{"level": "INFO", "message": json.dumps({"message": m})} for m in self.drain_events()]
+
+    def quit(self):
+        try:
+            self.conn.send("Browser.close", timeout=5)
+        except Exception:
+            pass
+        self.conn.close()
+        try:
+            self.proc.wait(5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+def _read_port_file(path):
+    try:
+        with open(path, "r") as f:
+            lines = f.read().split("\n")
+        if len(lines) >= 2 and lines[0].strip().isdigit() and lines[1].strip():
+            return int(lines[0]), lines[1].strip()
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def launch(binary, args, timeout=CDP_LAUNCH_TIMEOUT) -> CdpDriver:
+    """Chromium با --remote-debugging-port=0؛ پورت واقعی از DevToolsActivePort پروفایل خوانده می‌شود"""
+    if not binary or not os.path.exists(binary):
+        raise CdpError(f"Chromium پیدا نشد: {binary}")
+    args = list(args)
+    user_data = next((a.split("=", 1)[1] for a in args if a.startswith("--user-data-dir=")), None)
+    tmpdir = None
+    if user_data is None:
+        tmpdir = user_data = tempfile.mkdtemp(prefix="mc_cdp_")
+        args.append(f"--user-data-dir={tmpdir}")
+    port_file = os.path.join(user_data, "DevToolsActivePort")
+    try:
+        os.remove(port_file)
+    except FileNotFoundError:
+        pass
+    proc = subprocess.Popen([binary, *args, "--remote-debugging-port=0", "about:blank"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    conn = None
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            found = _read_port_file(port_file)
+            if found:
+                break
+            if proc.poll() is not None:
+                raise CdpError(f"Chromium با کد {proc.returncode} خارج شد")
+            if time.monotonic() > deadline:
+                raise CdpError(f"DevTools در {timeout}s آماده نشد")
+            time.sleep(0.02)
+        port, path = found
+        conn = CdpConnection(f"ws://127.0.0.1:{port}{path}")
+        return CdpDriver(proc, conn, tmpdir)
+    except BaseException:
+        # در خطای attach/enable هم سوکت و ترد خواننده نباید بمانند (هر بار به selenium برمی‌گردیم)
+        if conn is not None:
+            conn.close()
+        proc.kill()
+        proc.wait()
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
@@ -0,0 +1,156 @@
+import os
+import logging
+
+import block_profile
+from session_store import profile_dir
+
+logger = logging.getLogger("driver_engine")
+
+# راه‌اندازی یکسان Chrome برای همهٔ ورودی‌ها (مدیر، auth_checker، render_diag، ابزارهای CLI)
+CHROME_BIN = os.environ.get("CHROME_BIN", "/usr/bin/chromium")
+CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver")
+DRIVER_PROFILE = os.environ.get("DRIVER_PROFILE", "minimal-memory").strip().lower()
+WINDOW_SIZE = os.environ.get("BROWSER_WINDOW_SIZE", "1366,768")
+# selenium: chromedriver (پیش‌فرض) | cdp: websocket مستقیم DevTools بدون chromedriver؛ در خطا به selenium برمی‌گردد
+BROWSER_BACKEND = os.environ.get("BROWSER_BACKEND", "selenium").strip().lower()
+BACKENDS = ("selenium", "cdp")
+
+STEALTH_SCRIPT = "Object.defineProperty(navigator,'webdriver',{get:() => undefined});"
+
+# همان پرچم‌هایی که قبلاً در هر پنج ورودی کپی شده بود
+BASE_ARGS = [
+    "--headless=new",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-blink-features=AutomationControlled",
+]
+# سرویس‌های پس‌زمینه، کش‌ها و ویژگی‌های رندر که پنل لازم ندارد؛ برای کانتینر ۵۱۲MB
+LEAN_ARGS = [
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--disable-breakpad",
+    "--disable-hang-monitor",
+    "--disable-renderer-backgrounding",
+    "--disable-software-rasterizer",
+    "--disable-3d-apis",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--metrics-recording-only",
+    "--password-store=basic",
+    "--use-mock-keychain",
+    "--mute-audio",
+    "--disk-cache-size=1",
+    "--media-cache-size=1",
+    "--aggressive-cache-discard",
+    "--renderer-process-limit=1",
+    "--process-per-site",
+]
+# Chrome فقط آخرین --disable-features را می‌خواند؛ همه در یک پرچم
+LEAN_DISABLED_FEATURES = [
+    "Translate", "OptimizationHints", "MediaRouter", "DialMediaRouteProvider", "AutofillServerCommunication",
+    "CertificateTransparencyComponentUpdater", "InterestFeedContentSuggestions", "BackForwardCache",
+    "PaintHolding", "site-per-process", "IsolateOrigins",
+]
+
+# compat: رفتار قبلی (برای مقایسه/عیب‌یابی) | minimal-memory: پیش‌فرض | diagnostics: compat + perf log همیشه
+PROFILES = {
+    "compat": {"args": [], "disable_features": [], "perf_log": False},
+    "minimal-memory": {"args": LEAN_ARGS, "disable_features": LEAN_DISABLED_FEATURES, "perf_log": False},
+    "diagnostics": {"args": [], "disable_features": [], "perf_log": True},
+}
+
+
+def get_profile(name=None) -> str:
+    name = (name or DRIVER_PROFILE).strip().lower()
+    if name not in PROFILES:
+        logger.warning(f"⚠️ پروفایل راه‌اندازی ناشناخته «{name}»؛ از minimal-memory استفاده می‌کنم.")
+        name = "minimal-memory"
+    return name
+
+
+def get_backend(name=None) -> str:
+    name = (name or BROWSER_BACKEND).strip().lower()
+    if name not in BACKENDS:
+        logger.warning(f"⚠️ backend مرورگر ناشناخته «{name}»؛ از selenium استفاده می‌کنم.")
+        name = "selenium"
+    return name
+
+
+def chrome_args(profile=None, user_data=None, user_agent=None, proxy=None, block=True) -> list:
+    """پرچم‌های خط فرمان Chrome برای یک پروفایل؛ مشترک بین هر دو backend"""
+    prof = PROFILES[get_profile(profile)]
+    args = BASE_ARGS + prof["args"] + [f"--window-size={WINDOW_SIZE}"]
+    if prof["disable_features"]:
+        args.append("--disable-features=" + ",".join(prof["disable_features"]))
+    if user_agent:
+        args.append(f"--user-agent={user_agent}")
+    if proxy:
+        args.append(f"--proxy-server={proxy}")
+    path = profile_dir(user_data) if user_data else None
+    if path:
+        args.append(f"--user-data-dir={path}")
+    if block:
+        args += block_profile.chrome_args()
+    return args
+
+
+def chrome_options(profile=None, user_data=None, perf_log=False, user_agent=None, proxy=None, block=True):
+    """Options برای یک پروفایل؛ user_data نام پروفایل پایدار (session_store)، block یعنی block_profile هم اعمال شود"""
+    from selenium.webdriver.chrome.options import Options
+
+    opts = Options()
+    for arg in chrome_args(profile, user_data, user_agent, proxy, block=False):
+        opts.add_argument(arg)
+    opts.add_experimental_option("excludeSwitches", ["enable-automation"])
+    opts.add_experimental_option("useAutomationExtension", False)
+    if CHROME_BIN and os.path.exists(CHROME_BIN):
+        opts.binary_location = CHROME_BIN
+    if perf_log or PROFILES[get_profile(profile)]["perf_log"]:
+        opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if block:
+        block_profile.apply_to_options(opts)
+    return opts
+
+
+def load_selenium():
+    """import سنگین سلنیوم؛ جدا تا فراخوان بتواند زمانش را جدا اندازه بگیرد"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    return webdriver, Service
+
+
+def _launch_cdp(profile, user_data, user_agent, proxy, block):
+    import cdp_backend
+    # --enable-automation و Options سلنیوم اینجا وجود ندارند؛ perf log هم همیشه از رویدادهای websocket می‌آید
+    return cdp_backend.launch(CHROME_BIN, chrome_args(profile, user_data, user_agent, proxy, block))
+
+
+def launch(profile=None, user_data=None, perf_log=False, user_agent=None, proxy=None, block=True, backend=None):
+    """Chrome تازه با stealth و (در صورت block) الگوهای مسدودسازی روی تب اول؛ driver.backend نشان می‌دهد کدام backend بالا آمد"""
+    driver = None
+    if get_backend(backend) == "cdp":
+        try:
+            driver = _launch_cdp(profile, user_data, user_agent, proxy, block)
+        except Exception as e:
+            logger.warning(f"⚠️ راه‌اندازی backend مستقیم CDP ناموفق بود ({e})؛ برگشت به selenium.")
+    if driver is None:
+        webdriver, Service = load_selenium()
+        opts = chrome_options(profile, user_data, perf_log, user_agent, proxy, block)
+        driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=opts)
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": STEALTH_SCRIPT})
+    except Exception as e:
+        logger.debug(f"Stealth script error: {e}")
+    if block:
+        block_profile.apply_to_driver(driver)
+    return driver
+
+
+def backend_of(driver) -> str:
+    return getattr(driver, "backend", "selenium")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Chromium ساختگی برای bench.py cdp: همان قرارداد راه‌اندازی (--user-data-dir، DevToolsActivePort) و
+زیرمجموعه‌ای از DevTools websocket که cdp_backend می‌فرستد؛ بدون اجرای JS واقعی.
+
+- Runtime.evaluate با قالب execute_script اولین آرگومان را برمی‌گرداند (رفت‌وبرگشت سریال‌سازی)
+- querySelectorAll روی FAKE_ELEMENTS؛ innerText هر المنت متن آن است، بقیهٔ توابع true
+- Fake.commands: [sessionId، method] همهٔ فرمان‌های دریافتی (برای بررسی تنظیمات هر تب)
+- FAKE_DEVTOOLS_FAIL=<method>: آن فرمان با خطا پاسخ می‌گیرد (مسیر پاک‌سازی launch)
+"""
+import os
+import sys
+import json
+import base64
+import socket
+import hashlib
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+FAKE_ELEMENTS = {".status": ["Running"], "button": ["START", "STOP"]}
+FAIL = os.environ.get("FAKE_DEVTOOLS_FAIL", "")
+
+
+class FakeBrowser:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rf = conn.makefile("rb")
+        self.targets = ["T1"]
+        self.urls = {}
+        self.objects = {}
+        self.commands = []
+
+    def handshake(self):
+        key = None
+        while True:
+            line = self.rf.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "sec-websocket-key":
+                key = value.strip()
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+    def send(self, obj, fragmented=False):
+        # سرور فریم بدون mask می‌فرستد؛ پاسخ‌های Runtime در دو fragment با یک ping وسطشان
+        payload = json.dumps(obj).encode()
+
+        def frame(opcode, fin, data):
+            n = len(data)
+            head = bytes([(0x80 if fin else 0) | opcode])
+            if n < 126:
+                head += bytes([n])
+            elif n < 1 << 16:
+                head += bytes([126]) + n.to_bytes(2, "big")
+            else:
+                head += bytes([127]) + n.to_bytes(8, "big")
+            return head + data
+
+        if fragmented and len(payload) > 4:
+            self.conn.sendall(frame(0x1, False, payload[:3]) + frame(0x9, True, b"") + frame(0x0, True, payload[3:]))
+        else:
+            self.conn.sendall(frame(0x1, True, payload))
+
+    def recv(self):
+        b1, b2 = self.rf.read(2)
+        n = b2 & 0x7F
+        if n == 126:
+            n = int.from_bytes(self.rf.read(2), "big")
+        elif n == 127:
+            n = int.from_bytes(self.rf.read(8), "big")
+        mask = self.rf.read(4)
+        data = bytes(b ^ mask[i % 4] for i, b in enumerate(self.rf.read(n)))
+        return b1 & 0x0F, data
+
+    def handle(self, method, params, sid):
+        if method == "Target.getTargets":
+            return {"targetInfos": [{"type": "page", "targetId": t} for t in self.targets]}
+        if method == "Target.createTarget":
+            self.targets.append(f"T{len(self.targets) + 1}")
+            return {"targetId": self.targets[-1]}
+        if method == "Target.attachToTarget":
+            return {"sessionId": "S-" + params["targetId"]}
+        if method == "Page.navigate":
+            self.urls[sid] = params["url"]
+            return {"frameId": "F", "loaderId": "L"}
+        if method == "Fake.commands":
+            return {"commands": self.commands}
+        if method == "Runtime.evaluate":
+            expr = params["expression"]
+            if "location.href" in expr:
+                return {"result": {"type": "string", "value": self.urls.get(sid, "about:blank")}}
+            if "throw " in expr:
+                return {"result": {"type": "object"},
+                        "exceptionDetails": {"text": "Uncaught", "exception": {"description": "Error: fake"}}}
+            if "querySelectorAll(" in expr:
+                selector = json.loads(expr.split("querySelectorAll(", 1)[1].rsplit("))", 1)[0])
+                oid = f"A{len(self.objects)}"
+                self.objects[oid] = FAKE_ELEMENTS.get(selector, [])
+                return {"result": {"type": "object", "objectId": oid}}
+            if ").apply(window, " in expr:
+                args = json.loads(expr.rsplit(").apply(window, ", 1)[1][:-1])
+                return {"result": {"value": args[0] if args else None}}
+            return {"result": {"type": "undefined"}}
+        if method == "Runtime.getProperties":
+            texts = self.objects.get(params["objectId"], [])
+            # ترتیب عمداً برعکس: cdp_backend باید بر اساس اندیس مرتب کند
+            props = [{"name": str(i), "value": {"objectId": f"E:{t}"}} for i, t in reversed(list(enumerate(texts)))]
+            return {"result": props + [{"name": "length", "value": {"value": len(texts)}}]}
+        if method == "Runtime.callFunctionOn":
+            fn = params["functionDeclaration"]
+            text = params["objectId"].split(":", 1)[-1]
+            if "innerText" in fn:
+                return {"result": {"value": text}}
+            if "elementFromPoint" in fn:
+                return {"result": {"value": {"x": 10, "y": 10, "hit": True}}}
+            return {"result": {"value": True}}
+        if method == "Network.getCookies":
+            return {"cookies": []}
+        return {}
+
+    def serve(self):
+        self.handshake()
+        while True:
+            try:
+                opcode, data = self.recv()
+            except (ValueError, OSError):
+                return
+            if opcode == 0x8:
+                return
+            if opcode != 0x1:
+                continue
+            msg = json.loads(data)
+            method, params, sid = msg["method"], msg.get("params", {}), msg.get("sessionId")
+            self.commands.append([sid, method])
+            if method == FAIL:
+                self.send({"id": msg["id"], "error": {"code": -32000, "message": f"fake failure: {method}"}})
+                continue
+            reply = {"id": msg["id"], "result": self.handle(method, params, sid)}
+            self.send(reply, fragmented=method.startswith("Runtime."))
+            if method == "Page.navigate":
+                self.send({"method": "Network.requestWillBeSent", "params": {"request": {"url": params["url"]}},
+                           "sessionId": sid})
+                self.send({"method": "Page.loadEventFired", "params": {}, "sessionId": sid})
+            if method == "Browser.close":
+                return
+
+
+def main(argv) -> int:
+    user_data = next(a.split("=", 1)[1] for a in argv if a.startswith("--user-data-dir="))
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(1)
+    tmp = os.path.join(user_data, "DevToolsActivePort.tmp")
+    with open(tmp, "w") as f:
+        f.write(f"{srv.getsockname()[1]}\n/devtools/browser/fake\n")
+    os.replace(tmp, os.path.join(user_data, "DevToolsActivePort"))
+    conn, _ = srv.accept()
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    with conn:
+        FakeBrowser(conn).serve()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,181 @@
+import re
+import json
+import logging
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("http_probe")
+
+DEFAULT_UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36")
+
+# عناصر بدون تگ بسته
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+              "link", "meta", "param", "source", "track", "wbr"}
+
+_SELECTOR_PART = re.compile(
+    r'(?P<tag>^[a-zA-Z][\w-]*)'
+    r'|\.(?P<cls>[\w-]+)'
+    r'|\[(?P<attr>[\w-]+)(?:(?P<op>\*?=)"(?P<val>[^"]*)")?\]'
+)
+
+
+def parse_selector(selector: str):
+    """یک CSS selector ساده (tag، .class، [attr]، [attr="v"]، [attr*="v"]) را تجزیه می‌کند."""
+    tag, classes, attrs = None, [], []
+    pos = 0
+    for m in _SELECTOR_PART.finditer(selector):
+        if m.start() != pos:
+            raise ValueError(f"unsupported selector: {selector}")
+        pos = m.end()
+        if m.group("tag"):
+            tag = m.group("tag").lower()
+        elif m.group("cls"):
+            classes.append(m.group("cls"))
+        else:
+            attrs.append((m.group("attr").lower(), m.group("op"), m.group("val")))
+    if pos != len(selector):
+        raise ValueError(f"unsupported selector: {selector}")
+    return tag, classes, attrs
+
+
+def element_matches(el, parsed) -> bool:
+    tag, classes, attrs = parsed
+    if tag and el["tag"] != tag:
+        return False
+    el_classes = (el["attrs"].get("class") or "").split()
+    if any(c not in el_classes for c in classes):
+        return False
+    for name, op, val in attrs:
+        if name not in el["attrs"]:
+            return False
+        actual = el["attrs"][name] or ""
+        if op == "=" and actual != val:
+            return False
+        if op == "*=" and val not in actual:
+            return False
+    return True
+
+
+def _is_visible(el) -> bool:
+    a = el["attrs"]
+    if "hidden" in a:
+        return False
+    if "hidden" in (a.get("class") or "").split():
+        return False
+    style = (a.get("style") or "").replace(" ", "").lower()
+    return "display:none" not in style and "visibility:hidden" not in style
+
+
+class PanelHTMLParser(HTMLParser):
+    """فهرست تخت عناصر صفحه همراه با attribute و متن داخلی‌شان"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.elements = []
+        self._open = []
+
+    def handle_starttag(self, tag, attrs):
+        el = {"tag": tag, "attrs": {k.lower(): (v if v is not None else "") for k, v in attrs}, "text": []}
+        self.elements.append(el)
+        if tag not in _VOID_TAGS:
+            self._open.append(el)
+
+    def handle_startendtag(self, tag, attrs):
+        self.elements.append({"tag": tag, "attrs": {k.lower(): (v or "") for k, v in attrs}, "text": []})
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i]["tag"] == tag:
+                del self._open[i:]
+                break
+
+    def handle_data(self, data):
+        for el in self._open:
+            el["text"].append(data)
+
+
+def probe_html(html: str, url: str, status_selectors, button_selectors) -> dict:
+    """همان اطلاعاتی که پروب مرورگر برمی‌گرداند، از روی HTML خام."""
+    parser = PanelHTMLParser()
+    parser.feed(html or "")
+    parser.close()
+    elements = parser.elements
+
+    status_text, status_selector = "", None
+    for s in status_selectors:
+        parsed = parse_selector(s)
+        for el in elements:
+            if element_matches(el, parsed):
+                text = " ".join("".join(el["text"]).split())
+                if text:
+                    status_text, status_selector = text.lower(), s
+                    break
+        if status_selector:
+            break
+
+    buttons = {}
+    for kind, selectors in button_selectors.items():
+        results = []
+        for s in selectors:
+            parsed = parse_selector(s)
+            el = next((e for e in elements if element_matches(e, parsed)), None)
+            results.append({
+                "selector": s,
+                "found": el is not None,
+                "visible": bool(el) and _is_visible(el),
+                "enabled": bool(el) and "disabled" not in el["attrs"],
+            })
+        buttons[kind] = results
+
+    return {
+        "url": url,
+        "status_text": status_text,
+        "status_selector": status_selector,
+        "buttons": buttons,
+    }
+
+
+class HttpStatusProbe:
+    """پروب وضعیت بدون مرورگر: صفحهٔ سرور با یک Session دارای connection pool خوانده می‌شود."""
+
+    def __init__(self, server_url, cookies_json, status_selectors, button_selectors,
+                 user_agent=DEFAULT_UA, timeout=10):
+        self.server_url = server_url
+        self.status_selectors = status_selectors
+        self.button_selectors = button_selectors
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": user_agent})
+        self.load_cookies(cookies_json)
+
+    def load_cookies(self, cookies_json):
+        host = urlparse(self.server_url).hostname
+        try:
+            cookies = json.loads(cookies_json) if cookies_json else []
+        except Exception as e:
+            logger.error(f"فرمت کوکی‌ها نامعتبر است: {e}")
+            return 0
+        added = 0
+        for c in cookies if isinstance(cookies, list) else []:
+            if c.get("name") and c.get("value") is not None:
+                self.session.cookies.set(c["name"], c["value"],
+                                         domain=c.get("domain") or host,
+                                         path=c.get("path") or "/")
+                added += 1
+        return added
+
+    def fetch(self) -> dict:
+        r = self.session.get(self.server_url, timeout=self.timeout)
+        r.raise_for_status()
+        return probe_html(r.text, r.url, self.status_selectors, self.button_selectors)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,170 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# خروجی به فرمت متنی Prometheus (text exposition 0.0.4) بدون هیچ وابستگی خارجی
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt_value(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """مقدار لحظه‌ای؛ اگر fn داده شود هنگام خروجی گرفتن صدا زده می‌شود (عدد یا dict از labelها به عدد)"""
+    kind = "gauge"
+
+    def __init__(self, name, doc, labelnames=(), fn=None):
+        super().__init__(name, doc, labelnames)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        if self.fn is not None:
+            try:
+                got = self.fn()
+            except Exception:
+                got = None
+            if got is None:
+                items = []
+            elif isinstance(got, dict):
+                items = sorted((tuple(str(x) for x in (k if isinstance(k, tuple) else (k,))), v)
+                               for k, v in got.items())
+            else:
+                items = [((), got)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            st = self._values.get(key)
+            if st is None:
+                st = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    st["counts"][i] += 1
+                    break
+            st["sum"] += value
+            st["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]})
+                           for k, v in self._values.items())
+        lines = self._header()
+        for key, st in items:
+            cumulative = 0
+            for b, c in zip(self.buckets, st["counts"]):
+                cumulative += c
+                le = 'le="' + _fmt_value(float(b)) + '"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(round(st['sum'], 6))}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {st['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, doc, labelnames=()):
+        return self._register(Counter(name, doc, labelnames))
+
+    def gauge(self, name, doc, labelnames=(), fn=None):
+        return self._register(Gauge(name, doc, labelnames, fn))
+
+    def histogram(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, doc, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
@@ -4,12 +4,11 @@ import random
 import logging
 from datetime import datetime
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+
+import driver_engine
 
 logging.basicConfig(
     level=os.environ.get("LOG_LEVEL", "INFO"),
@@ -18,8 +17,6 @@ logging.basicConfig(
 logger = logging.getLogger("minecraft_cli")
 
 MAGMA_SERVER_URL = os.environ.get("MAGMANODE_SERVER_URL", "https://magmanode.com/server?id=770999")
-CHROME_BIN = os.environ.get("CHROME_BIN", "/usr/bin/chromium")
-CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver")
 
 class MinecraftAutoClicker:
     def __init__(self):
@@ -31,30 +28,9 @@ class MinecraftAutoClicker:
         self.start_time = datetime.now()
         self.consecutive_failures = 0
 
-    def _opts(self):
-        o = Options()
-        o.add_argument("--headless=new")
-        o.add_argument("--no-sandbox")
-        o.add_argument("--disable-dev-shm-usage")
-        o.add_argument("--disable-gpu")
-        o.add_argument("--window-size=1366,768")
-        o.add_experimental_option("excludeSwitches", ["enable-automation"])
-        o.add_experimental_option("useAutomationExtension", False)
-        if CHROME_BIN and os.path.exists(CHROME_BIN):
-            o.binary_location = CHROME_BIN
-        o.add_argument("--disable-blink-features=AutomationControlled")
-        return o
-
     def _setup(self):
-        s = Service(CHROMEDRIVER_PATH)
-        self.driver = webdriver.Chrome(service=s, options=self._opts())
-        try:
-            self.driver.execute_cdp_cmd(
-                "Page.addScriptToEvaluateOnNewDocument",
-                {"source": "Object.defineProperty(navigator,'webdriver',{get:() => undefined});"},
-            )
-        except Exception:
-            pass
+        # بدون مسدودسازی، مثل قبل؛ پرچم‌ها از پروفایل DRIVER_PROFILE
+        self.driver = driver_engine.launch(block=False)
         logger.info("Chrome headless آماده است.")
 
     def find_start_button(self):
@@ -1,20 +1,45 @@
 import os
 import time
+
+# شروع پردازه، قبل از importهای سنگین (برای گزارش مراحل راه‌اندازی)
+PROCESS_START = time.monotonic()
+
 import random
+import sys
 import json
+import queue
+import signal
+import itertools
+import functools
 import threading
+import multiprocessing
+from types import SimpleNamespace
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
 from datetime import datetime, timedelta
 import logging
 from urllib.parse import urlparse
 
-from flask import Flask, render_template, jsonify, request
-
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
+from werkzeug.serving import make_server
+
+# سلنیوم lazy است: پورت قبل از آن bind می‌شود و در حالت http تا اولین کلیک اصلاً لازم نیست
+
+from http_probe import HttpStatusProbe
+from status_history import StatusHistory
+from metrics import REGISTRY as METRICS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+import block_profile
+import readiness
+import driver_engine
+import proc_mem
+from session_store import SessionStore, SESSION_FILE
+from auth_checker import check_auth, AUTH_OK, AUTH_LOGIN, AUTH_ERROR
+from tracing import Tracer, waterfall, copy_context as trace_context, TRACE_RING_SIZE
+from network_status import NetworkStatusSource, NETWORK_STATUS_ENABLED
+from start_verifier import StartVerifier, RETRYABLE, RUNNING as START_RUNNING
+from shared_status import (StatusSegment, ControlServer, OwnerHeartbeat, control_call, segment_path,
+                           control_address, ensure_private_dir, new_authkey, SHARED_STATUS_DIR)
 
 # ===== تنظیمات عمومی =====
 logging.basicConfig(
@@ -24,6 +49,12 @@ logging.basicConfig(
 logger = logging.getLogger("minecraft_manager")
 
 STATUS_FILE = 'server_status.json'
+# وقتی فقط فیلدهای ساعتی عوض شده‌اند، فایل وضعیت حداکثر با این فاصله بازنویسی می‌شود
+STATUS_FILE_MIN_INTERVAL = float(os.environ.get("STATUS_FILE_MIN_INTERVAL", "60"))
+HISTORY_DIR = os.environ.get("HISTORY_DIR", "history")
+HISTORY_RING_SIZE = int(os.environ.get("HISTORY_RING_SIZE", "2000"))
+HISTORY_SEGMENT_KB = int(os.environ.get("HISTORY_SEGMENT_KB", "256"))
+HISTORY_MAX_SEGMENTS = int(os.environ.get("HISTORY_MAX_SEGMENTS", "16"))
 
 # ---------- helpers ----------
 def normalize_url(raw: str, fallback: str) -> str:
@@ -46,28 +77,709 @@ RAW_SERVER_URL = os.environ.get("MAGMANODE_SERVER_URL", DEFAULT_SERVER_URL)
 MAGMA_SERVER_URL = normalize_url(RAW_SERVER_URL, DEFAULT_SERVER_URL)
 
 COOKIES_JSON = os.environ.get("MAGMANODE_COOKIES_JSON", "")
+# کوکی‌های جلسه (فایل بازنویسی‌شده یا ENV)؛ بین همهٔ سرورهای ناوگان مشترک
+SESSION = SessionStore(SESSION_FILE, COOKIES_JSON)
+
+# حالت ناوگان: چند سرور با یک مرورگر مشترک (مثلاً "770999,812345")
+SERVER_IDS = [i.strip() for i in os.environ.get("MAGMANODE_SERVER_IDS", "").split(",") if i.strip()]
 
 CHECK_MIN_MINUTES = float(os.environ.get("CHECK_MIN_MINUTES", "1"))
 CHECK_MAX_MINUTES = float(os.environ.get("CHECK_MAX_MINUTES", "3"))
 
-CHROME_BIN = os.environ.get("CHROME_BIN", "/usr/bin/chromium")
-CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver")
+# نگهبان حافظهٔ Chrome: بالاتر از این حد (MB) یا این سن (دقیقه) درایور در پس‌زمینه تعویض می‌شود (0 = غیرفعال)
+# روی پلن رایگان Render (۵۱۲MB) حد باید جای یک Chrome دوم را در لحظهٔ تعویض باقی بگذارد
+BROWSER_MEMORY_LIMIT_MB = float(os.environ.get("BROWSER_MEMORY_LIMIT_MB", "300"))
+BROWSER_MAX_AGE_MINUTES = float(os.environ.get("BROWSER_MAX_AGE_MINUTES", "180"))
+WATCHDOG_INTERVAL_SECONDS = float(os.environ.get("WATCHDOG_INTERVAL_SECONDS", "30"))
+
+# فاصلهٔ پایهٔ پروب و سقف انتظار برای یک snapshot تازه (ثانیه)
+MONITOR_INTERVAL_SECONDS = float(os.environ.get("MONITOR_INTERVAL_SECONDS", "10"))
+# زمان‌بند تطبیقی: پروب سریع هنگام starting/بعد از کلیک، کمی کندتر هنگام مشکل، backoff نمایی هنگام running
+POLL_FAST_SECONDS = float(os.environ.get("POLL_FAST_SECONDS", "5"))
+POLL_TROUBLE_SECONDS = float(os.environ.get("POLL_TROUBLE_SECONDS", "15"))
+POST_CLICK_WINDOW_SECONDS = float(os.environ.get("POST_CLICK_WINDOW_SECONDS", "180"))
+POLL_JITTER = float(os.environ.get("POLL_JITTER", "0.1"))
+# بعد از START موفق، کلیک START دیگری (دستی یا خودکار) تا این مدت انجام نمی‌شود
+ACTION_COOLDOWN_SECONDS = float(os.environ.get("ACTION_COOLDOWN_SECONDS", "120"))
+# وضعیت از ترافیک خود پنل (حالت browser): تا این سن به‌جای پرس‌وجوی DOM معتبر است
+NETWORK_STATUS_MAX_AGE = float(os.environ.get("NETWORK_STATUS_MAX_AGE", "90"))
+# فاصلهٔ خواندن perf log بین دو پروب (یک دستور get_log، بدون DOM) برای تشخیص سریع تغییر وضعیت
+NETWORK_WATCH_SECONDS = float(os.environ.get("NETWORK_WATCH_SECONDS", "5"))
+SNAPSHOT_WAIT_TIMEOUT = float(os.environ.get("SNAPSHOT_WAIT_TIMEOUT", "30"))
+
+# پروب روتین: "http" (بدون مرورگر) یا "browser"؛ Chrome در حالت http فقط برای کلیک بالا می‌آید
+STATUS_PROBE_BACKEND = os.environ.get("STATUS_PROBE_BACKEND", "http").strip().lower()
+BROWSER_IDLE_SECONDS = float(os.environ.get("BROWSER_IDLE_SECONDS", "300"))
+
+STATUS_SELECTORS = [
+    'span[data-server-status]',
+    'span.font-medium[data-server-status]',
+    '.server-status',
+    '.status-indicator',
+    'span.font-medium',
+]
+BUTTON_SELECTORS = {
+    'start': [
+        'button[data-action="start"]',
+        'button.bg-green-600',
+        'button[class*="bg-green-600"]',
+    ],
+    'stop': [
+        'button[data-action="stop"]',
+        'button.bg-red-600',
+        'button[class*="bg-red-600"]',
+    ],
+}
+
+# لوکیتورهای دکمهٔ START؛ ترتیب واقعی امتحان از روی آمار SelectorRegistry تعیین می‌شود
+# همان مقادیر By.CSS_SELECTOR / By.XPATH سلنیوم، بدون import آن
+CSS_SELECTOR = "css selector"
+XPATH = "xpath"
+
+START_BUTTON_LOCATORS = [
+    (CSS_SELECTOR, 'button[data-action="start"]'),
+    (CSS_SELECTOR, 'button.bg-green-600'),
+    (XPATH, '//button[contains(text(),"START")]'),
+    (XPATH, '//button[text()="START"]'),
+    (CSS_SELECTOR, 'button.bg-green-600.text-white'),
+    (CSS_SELECTOR, 'button[type="submit"].bg-green-600'),
+    (CSS_SELECTOR, 'button[class*="bg-green-600"]'),
+    (CSS_SELECTOR, 'button[class*="bg-green"][class*="text-white"]'),
+    (XPATH, '//button[contains(@class, "bg-green")]'),
+    (XPATH, '//button[contains(text(), "Start")]'),
+    (XPATH, '//button[contains(text(), "شروع")]'),
+]
+SELECTOR_STATS_FILE = os.environ.get("SELECTOR_STATS_FILE", "selector_stats.json")
+# سقف کل جستجوی START (نه برای هر لوکیتور)
+START_BUTTON_WAIT_SECONDS = float(os.environ.get("START_BUTTON_WAIT_SECONDS", "2"))
+# سقف انتظار برای رندر صفحه و تغییر وضعیت بعد از کلیک (به‌جای sleepهای ثابت قبلی)
+PAGE_READY_TIMEOUT = float(os.environ.get("PAGE_READY_TIMEOUT", "10"))
+ALL_BUTTON_SELECTORS = BUTTON_SELECTORS['start'] + BUTTON_SELECTORS['stop']
+
+# پروب DOM در یک رفت‌وبرگشت: متن وضعیت، وضعیت هر سلکتور دکمه و URL فعلی
+DOM_PROBE_SCRIPT = """
+const statusSelectors = arguments[0], buttonSelectors = arguments[1];
+const visible = (el) => {
+  const st = window.getComputedStyle(el);
+  return st.display !== 'none' && st.visibility !== 'hidden' && el.getClientRects().length > 0;
+};
+let statusText = '', statusSelector = null;
+for (const s of statusSelectors) {
+  const el = document.querySelector(s);
+  const t = el ? (el.innerText || el.textContent || '').trim() : '';
+  if (t) { statusText = t.toLowerCase(); statusSelector = s; break; }
+}
+const buttons = {};
+for (const kind of Object.keys(buttonSelectors)) {
+  buttons[kind] = buttonSelectors[kind].map((s) => {
+    const el = document.querySelector(s);
+    return {selector: s, found: !!el, visible: !!el && visible(el), enabled: !!el && !el.disabled};
+  });
+}
+return {url: location.href, status_text: statusText, status_selector: statusSelector, buttons: buttons};
+"""
+
+# اولویت‌های صف مرورگر؛ عدد کمتر زودتر اجرا می‌شود
+PRIORITY_MANUAL = 0
+PRIORITY_CLICK = 1
+PRIORITY_PROBE_URGENT = 2
+PRIORITY_PROBE = 3
+BROWSER_CALL_TIMEOUT = float(os.environ.get("BROWSER_CALL_TIMEOUT", "120"))
+
+# فیلدهایی که /api/events فقط هنگام تغییر می‌فرستد، و فیلدهای ساعتی که همراه heartbeat می‌روند
+STREAM_KEYS = ('status', 'start_button_available', 'stop_button_available', 'click_count',
+               'successful_clicks', 'failed_clicks', 'last_action', 'last_status_change', 'poll_reason',
+               'auth_state', 'auth_detail', 'status_source', 'start_verification')
+STREAM_CLOCK_KEYS = ('uptime', 'last_check', 'next_check')
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+
+# بیشتر از 1: یک پردازهٔ مالک مرورگر + این تعداد پردازهٔ وب که از segment مشترک می‌خوانند
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "1"))
+
+# snapshot تغییرناپذیر وضعیت؛ taken_at زمان شروع پروب (monotonic) است
+StatusSnapshot = namedtuple("StatusSnapshot", ["version", "taken_at", "data"])
 
 # Flask: قالب در همین مسیر (dashboard.html بدون تغییر)
 app = Flask(__name__, template_folder=".")
 
-class MinecraftServerManager:
-    def __init__(self):
+# ===== متریک‌ها (/metrics) =====
+PHASE_SECONDS = METRICS.histogram(
+    "mc_phase_seconds", "Duration of each browser/probe phase in seconds.", ["phase"])
+# هر چرخهٔ پروب/کلیک یک trace (/api/trace)
+TRACER = Tracer()
+
+
+@contextmanager
+def phase(name, **attrs):
+    """mc_phase_seconds{phase} + span همنام در trace فعال"""
+    with PHASE_SECONDS.time(phase=name), TRACER.span(name, **attrs) as span:
+        yield span
+CLICKS_TOTAL = METRICS.counter(
+    "mc_clicks_total", "Start/stop click attempts by outcome.", ["server", "action", "source", "outcome"])
+CLICK_METHOD_TOTAL = METRICS.counter(
+    "mc_click_method_total", "Successful clicks by method index in _perform_click.", ["method"])
+LOGIN_REDIRECTS_TOTAL = METRICS.counter(
+    "mc_login_redirects_total", "Probes that landed on the login page.", ["server"])
+PROBE_ERRORS_TOTAL = METRICS.counter(
+    "mc_probe_errors_total", "Probe failures by backend.", ["backend"])
+BLOCKED_REQUESTS_TOTAL = METRICS.counter(
+    "mc_blocked_requests_total", "Requests blocked by the browser block profile.", ["type"])
+BLOCKED_BYTES_TOTAL = METRICS.counter(
+    "mc_blocked_bytes_estimated_total", "Estimated bytes not downloaded thanks to request blocking.")
+BROWSER_RECYCLES_TOTAL = METRICS.counter(
+    "mc_browser_recycles_total", "Background driver rebuilds by trigger.", ["reason"])
+STATUS_SOURCE_TOTAL = METRICS.counter(
+    "mc_status_source_total", "Probes by where the status came from (network, dom, http).", ["server", "source"])
+ACTIONS_COALESCED_TOTAL = METRICS.counter(
+    "mc_actions_coalesced_total", "Start/stop requests that joined an in-flight action or hit the cooldown.",
+    ["server", "action", "outcome"])
+STATUS_TRANSITIONS_TOTAL = METRICS.counter(
+    "mc_status_transitions_total", "Detected status transitions.", ["server", "to"])
+START_VERIFICATIONS_TOTAL = METRICS.counter(
+    "mc_start_verifications_total", "START attempts by verified outcome (running, reverted, silent, timeout).",
+    ["server", "outcome"])
+START_TO_RUNNING_SECONDS = METRICS.histogram(
+    "mc_start_to_running_seconds", "Seconds from the first START click to the first probe that saw running.",
+    ["server"], buckets=(10, 20, 30, 45, 60, 90, 120, 180, 300, 600))
+
+
+def classify_status(status_text: str, start_exists: bool, stop_exists: bool) -> str:
+    if 'running' in status_text:
+        return 'running'
+    if 'offline' in status_text:
+        return 'offline'
+    if 'starting' in status_text:
+        return 'starting'
+    # استنتاج از روی دکمه‌ها
+    if start_exists and not stop_exists:
+        return 'offline'
+    if stop_exists and not start_exists:
+        return 'running'
+    return 'unknown'
+
+
+def button_available(probe: dict, button_type: str) -> bool:
+    return any(b['found'] and b['visible'] and b['enabled'] for b in probe['buttons'].get(button_type, []))
+
+
+def detect_status(probe: dict) -> dict:
+    """طبقه‌بندی خالص یک پروب (مرورگر یا HTTP)؛ همان چیزی که bench.py detection روی corpus می‌سنجد"""
+    login_redirect = "/login" in (probe.get('url') or "").lower()
+    if login_redirect:
+        return {'status': 'unknown', 'start': False, 'stop': False, 'login_redirect': True}
+    start_exists = button_available(probe, 'start')
+    stop_exists = button_available(probe, 'stop')
+    return {'status': classify_status(probe.get('status_text') or "", start_exists, stop_exists),
+            'start': start_exists, 'stop': stop_exists, 'login_redirect': False}
+
+
+def server_url_for(server_id: str, base_url: str = MAGMA_SERVER_URL) -> str:
+    p = urlparse(base_url)
+    query = [q for q in p.query.split("&") if q and not q.startswith("id=")]
+    query.append(f"id={server_id}")
+    return p._replace(query="&".join(query)).geturl()
+
+
+def status_file_for(server_id=None) -> str:
+    """فایل وضعیت هر سرور در حالت ناوگان (بدون id: سرور اول، مثل server_manager)؛ در حالت تک‌سرور همان STATUS_FILE"""
+    if not SERVER_IDS:
+        return STATUS_FILE
+    return f"server_status-{server_id or SERVER_IDS[0]}.json"
+
+
+def server_id_from_url(url: str) -> str:
+    for q in urlparse(url).query.split("&"):
+        if q.startswith("id="):
+            return q[3:]
+    return "default"
+
+
+class StartupTracker:
+    """مراحل راه‌اندازی با زمان‌بندی نسبت به شروع پردازه؛ هر مرحله فقط بار اول ثبت می‌شود"""
+
+    def __init__(self, t0):
+        self.t0 = t0
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.first_response_ms = None
+
+    def _ms(self, t):
+        return round((t - self.t0) * 1000, 1)
+
+    def mark(self, name, since=None):
+        """مرحله‌ای که همین الان تمام شد (از since، پیش‌فرض شروع پردازه)"""
+        now = time.monotonic()
+        since = self.t0 if since is None else since
+        with self._lock:
+            self.phases.setdefault(name, {"start_ms": self._ms(since), "duration_ms": round((now - since) * 1000, 1),
+                                          "ok": True})
+
+    @contextmanager
+    def phase(self, name):
+        with self._lock:
+            if name in self.phases:
+                entry = None
+            else:
+                entry = self.phases[name] = {"start_ms": self._ms(time.monotonic()), "duration_ms": None, "ok": None}
+        if entry is None:
+            yield
+            return
+        t = time.monotonic()
+        try:
+            yield
+            entry["ok"] = True
+        except BaseException as e:
+            entry["ok"] = False
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry["duration_ms"] = round((time.monotonic() - t) * 1000, 1)
+
+    def responded(self):
+        if self.first_response_ms is None:
+            self.first_response_ms = self._ms(time.monotonic())
+
+    def info(self) -> dict:
+        with self._lock:
+            phases = [{"name": k, **v} for k, v in self.phases.items()]
+        return {"uptime_ms": self._ms(time.monotonic()), "first_healthy_response_ms": self.first_response_ms,
+                "phases": phases}
+
+
+STARTUP = StartupTracker(PROCESS_START)
+
+
+class BrowserWorker:
+    """تنها تردی که به WebDriver دست می‌زند؛ دستورها از یک صف اولویت‌دار یکی‌یکی اجرا می‌شوند."""
+
+    def __init__(self, name="browser-worker"):
         self.driver = None
+        self.driver_started = None
+        self.last_used = 0.0
+        # در حالت ناوگان هر سرور یک تب (window handle) دارد
+        self._tabs = {}
+        self._context = None
+        # تنظیمات per-tab (مثل مسدودسازی CDP) روی هر تب تازه
+        self.on_new_tab = None
+        # هر بار درایور عوض/بسته می‌شود (swap نگهبان، بستن بی‌کار، راه‌اندازی تازه)؛ وضعیت وابسته به صفحه باطل شود
+        self.on_driver_change = None
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, priority=PRIORITY_PROBE, context=None, **kwargs) -> Future:
+        fut = Future()
+        if self._stopped:
+            fut.set_exception(RuntimeError("browser worker stopped"))
+            return fut
+        # دستور زیر همان trace صدازننده اجرا می‌شود؛ span «browser» زمان انتظار در صف را نشان می‌دهد
+        fn = functools.partial(trace_context().run, self._traced, fn, time.monotonic())
+        # seq ترتیب FIFO را در یک اولویت حفظ می‌کند و نمی‌گذارد Futureها مقایسه شوند
+        self._queue.put((priority, next(self._seq), fut, context, fn, args, kwargs))
+        return fut
+
+    @staticmethod
+    def _traced(fn, queued_at, *args, **kwargs):
+        with TRACER.span("browser", job=getattr(fn, "__name__", "job"),
+                         queue_ms=round((time.monotonic() - queued_at) * 1000, 1)):
+            return fn(*args, **kwargs)
+
+    def call(self, fn, *args, priority=PRIORITY_PROBE, timeout=BROWSER_CALL_TIMEOUT, context=None, **kwargs):
+        # فراخوانی از داخل خود ورکر در صف نمی‌رود (وگرنه بن‌بست)
+        if threading.current_thread() is self._thread:
+            self.activate(context)
+            return fn(*args, **kwargs)
+        fut = self.submit(fn, *args, priority=priority, context=context, **kwargs)
+        try:
+            return fut.result(timeout)
+        except FuturesTimeout:
+            # اگر هنوز شروع نشده، از صف حذفش کن
+            fut.cancel()
+            raise
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def activate(self, context):
+        """تب مربوط به context را جلو می‌آورد؛ اولین context تب اصلی را می‌گیرد"""
+        if context is None or self.driver is None or context == self._context:
+            return
+        handle = self._tabs.get(context)
+        if handle is None:
+            if self._tabs:
+                self.driver.switch_to.new_window('tab')
+                if self.on_new_tab:
+                    self.on_new_tab(self.driver)
+            handle = self.driver.current_window_handle
+            self._tabs[context] = handle
+        else:
+            self.driver.switch_to.window(handle)
+        self._context = context
+
+    def set_driver(self, driver, tabs=None):
+        # تب‌های درایور قبلی دیگر معتبر نیستند
+        self.driver = driver
+        self.driver_started = time.monotonic() if driver is not None else None
+        self._tabs = dict(tabs or {})
+        self._context = None
+        if self.on_driver_change:
+            self.on_driver_change()
+
+    def swap_driver(self, driver, tabs):
+        """فقط داخل ورکر: درایور گرم‌شده را جایگزین می‌کند و قبلی را برمی‌گرداند (بستنش با صدازننده)"""
+        if self.driver is None:
+            # در این فاصله مرورگر بی‌کار بسته شده؛ درایور تازه لازم نیست
+            return driver
+        old = self.driver
+        self.set_driver(driver, tabs)
+        self.last_used = time.monotonic()
+        return old
+
+    def stop(self):
+        self._stopped = True
+        self._queue.put((-1, next(self._seq), None, None, None, (), {}))
+
+    def _run(self):
+        while True:
+            _, _, fut, context, fn, args, kwargs = self._queue.get()
+            if fn is None:
+                break
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                self.activate(context)
+                fut.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                fut.set_exception(e)
+
+
+class BrowserWatchdog:
+    """حافظهٔ درخت پردازهٔ chromedriver/Chromium را نمونه می‌گیرد؛ با عبور از حد حافظه یا سن،
+    درایور تازه‌ای در پس‌زمینه ساخته، کوکی‌خورده و روی صفحهٔ سرورها برده می‌شود و در ورکر جایگزین می‌شود."""
+
+    MIN_DRIVER_AGE_SECONDS = 300
+
+    def __init__(self, browser, managers, interval=WATCHDOG_INTERVAL_SECONDS,
+                 limit_mb=BROWSER_MEMORY_LIMIT_MB, max_age_minutes=BROWSER_MAX_AGE_MINUTES):
+        self.browser = browser
+        self.managers = managers
+        self.interval = interval
+        self.limit_bytes = limit_mb * 1024 * 1024
+        self.max_age = max_age_minutes * 60
+        self.memory_bytes = 0
+        self.processes = 0
+        self.recycles = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="browser-watchdog", daemon=True)
+        self._thread.start()
+
+    def sample(self):
+        driver = self.browser.driver
+        try:
+            pid = driver.service.process.pid
+        except Exception:
+            self.memory_bytes, self.processes = 0, 0
+            return None
+        self.memory_bytes, self.processes = proc_mem.tree_memory(pid)
+        return self.memory_bytes
+
+    def _reason(self):
+        if self.sample() is None:
+            return None
+        started = self.browser.driver_started
+        # درایور تازه را دوباره عوض نکن (اگر حد خیلی پایین باشد، چرخهٔ بی‌پایان می‌شد)
+        if started is not None and time.monotonic() - started < self.MIN_DRIVER_AGE_SECONDS:
+            return None
+        if self.limit_bytes and self.memory_bytes >= self.limit_bytes:
+            return 'memory'
+        if self.max_age and started is not None and time.monotonic() - started >= self.max_age:
+            return 'age'
+        return None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                reason = self._reason()
+                if reason:
+                    self.recycle(reason)
+            except Exception as e:
+                logger.error(f"❌ خطا در نگهبان حافظهٔ مرورگر: {e}")
+
+    def _warm_driver(self):
+        """درایور جدید بیرون از ورکر: کوکی‌ها + یک تب آماده روی صفحهٔ هر سرور"""
+        lead = self.managers[0]
+        driver = lead._launch_driver()
+        try:
+            lead._load_session(driver)
+            tabs = {}
+            for i, m in enumerate(self.managers):
+                if i:
+                    driver.switch_to.new_window('tab')
+                    block_profile.apply_to_driver(driver)
+                driver.get(m.server_url)
+                try:
+                    from selenium.webdriver.support.ui import WebDriverWait
+                    WebDriverWait(driver, PAGE_READY_TIMEOUT, 0.25).until(
+                        lambda d: readiness.page_ready(d, STATUS_SELECTORS, ALL_BUTTON_SELECTORS))
+                except Exception:
+                    logger.debug(f"recycle: صفحهٔ {m.server_id} در زمان مقرر آماده نشد")
+                tabs[m.server_id] = driver.current_window_handle
+            return driver, tabs
+        except Exception:
+            driver.quit()
+            raise
+
+    def recycle(self, reason):
+        mb = self.memory_bytes / 1024 / 1024
+        logger.info(f"♻️ تعویض Chrome ({reason}؛ {mb:.0f}MB در {self.processes} پردازه) در پس‌زمینه...")
+        # کوکی‌های زندهٔ مرورگر فعلی (ممکن است چرخیده باشند) اول در SESSION نوشته می‌شوند
+        lead = self.managers[0]
+        try:
+            self.browser.call(lambda: SESSION.capture(self.browser.driver, lead.server_url, force=True),
+                              priority=PRIORITY_PROBE, timeout=30)
+        except Exception:
+            pass
+        driver, tabs = self._warm_driver()
+        try:
+            old = self.browser.call(self.browser.swap_driver, driver, tabs, priority=PRIORITY_MANUAL, timeout=60)
+        except Exception:
+            driver.quit()
+            raise
+        try:
+            if old is not None:
+                old.quit()
+        except Exception:
+            pass
+        self.recycles += 1
+        BROWSER_RECYCLES_TOTAL.inc(reason=reason)
+        logger.info("✅ Chrome جدید جایگزین شد.")
+
+    def stop(self):
+        self._stop.set()
+
+
+class PollScheduler:
+    """فاصلهٔ پروب بعدی را از روی وضعیت تعیین می‌کند؛ مانیتور و کلیکر هر دو از همین یک زمان‌بند پیروی می‌کنند.
+
+    بازهٔ [min, max] (دقیقه، از set_check_interval) سقف backoff حالت running و فاصلهٔ بین دو کلیک خودکار است.
+    """
+
+    def __init__(self, min_minutes=CHECK_MIN_MINUTES, max_minutes=CHECK_MAX_MINUTES):
+        self._lock = threading.Lock()
+        self._running_delay = 0.0
+        self._last_click = None
+        self._click_ready_at = 0.0
+        self.reason = 'initial'
+        self.set_bounds(min_minutes, max_minutes)
+
+    def set_bounds(self, min_minutes, max_minutes):
+        lo, hi = sorted((max(0.0, float(min_minutes)), max(0.0, float(max_minutes))))
+        with self._lock:
+            self.min_seconds = max(POLL_FAST_SECONDS, lo * 60)
+            self.max_seconds = max(self.min_seconds, hi * 60)
+            self._running_delay = 0.0
+
+    def note_click(self):
+        now = time.monotonic()
+        with self._lock:
+            self._last_click = now
+            self._click_ready_at = now + random.uniform(self.min_seconds, self.max_seconds)
+
+    def click_due(self) -> bool:
+        return time.monotonic() >= self._click_ready_at
+
+    def next_delay(self, status: str, login_redirect=False, verify_delay=None) -> float:
+        """verify_delay: فاصلهٔ پروب تنگ StartVerifier وقتی یک START در حال تأیید است"""
+        now = time.monotonic()
+        with self._lock:
+            after_click = self._last_click is not None and now - self._last_click < POST_CLICK_WINDOW_SECONDS
+            if verify_delay is not None and status != 'running':
+                self._running_delay = 0.0
+                delay, self.reason = min(verify_delay, POLL_FAST_SECONDS), 'verifying'
+            elif status == 'starting' or (after_click and status != 'running'):
+                self._running_delay = 0.0
+                delay, self.reason = POLL_FAST_SECONDS, 'starting' if status == 'starting' else 'post_click'
+            elif login_redirect or status not in ('running', 'offline'):
+                self._running_delay = 0.0
+                delay, self.reason = POLL_TROUBLE_SECONDS, 'login_redirect' if login_redirect else 'trouble'
+            elif status == 'running':
+                # دو برابر شدن از فاصلهٔ پایه تا سقف max
+                self._running_delay = min(self.max_seconds, max(MONITOR_INTERVAL_SECONDS, self._running_delay * 2))
+                delay, self.reason = self._running_delay, 'running_backoff'
+            else:
+                # offline: تا نوبت کلیک بعدی با فاصلهٔ «مشکل» پروب کن
+                self._running_delay = 0.0
+                until_click = self._click_ready_at - now
+                delay = min(POLL_TROUBLE_SECONDS, max(POLL_FAST_SECONDS, until_click))
+                self.reason = 'offline'
+        return max(1.0, delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER))
+
+
+class ActionCoordinator:
+    """single-flight برای start/stop: درخواست هم‌زمان برای همان اقدام به اجرای در جریان می‌پیوندد و نتیجه‌اش را می‌گیرد.
+
+    بعد از START موفق (یا وقتی سرور starting است) تا پایان cooldown کلیک START تازه‌ای انجام نمی‌شود؛
+    موفقیت اقدام مخالف (STOP) cooldown را پاک می‌کند.
+    """
+
+    RAN, JOINED, COOLDOWN = 'ran', 'joined', 'cooldown'
+
+    def __init__(self, server_id, cooldown=ACTION_COOLDOWN_SECONDS):
+        self.server_id = server_id
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._started_at = None
+
+    def cooling_down(self, action, status=None) -> bool:
+        if action != 'start':
+            return False
+        if status == 'starting':
+            return True
+        return (self._started_at is not None and time.monotonic() - self._started_at < self.cooldown
+                and status != 'running')
+
+    def clear_cooldown(self):
+        """START قبلی به‌طور قطعی شکست خورده (StartVerifier)؛ کلیک دوباره مجاز است"""
+        with self._lock:
+            self._started_at = None
+
+    def run(self, action, fn, status=None):
+        """(نتیجه، نحوه)؛ نحوه یکی از ran / joined / cooldown است و در cooldown نتیجه None است"""
+        with self._lock:
+            fut = self._inflight.get(action)
+            if fut is None:
+                if self.cooling_down(action, status):
+                    ACTIONS_COALESCED_TOTAL.inc(server=self.server_id, action=action, outcome=self.COOLDOWN)
+                    return None, self.COOLDOWN
+                fut = self._inflight[action] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            ACTIONS_COALESCED_TOTAL.inc(server=self.server_id, action=action, outcome=self.JOINED)
+            logger.info(f"🔗 درخواست {action} به اجرای در جریان پیوست.")
+            return fut.result(), self.JOINED
+        try:
+            result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result, self.RAN
+        finally:
+            with self._lock:
+                del self._inflight[action]
+                if fut.done() and not fut.exception() and fut.result():
+                    self._started_at = time.monotonic() if action == 'start' else None
+
+
+class SelectorRegistry:
+    """آمار hit/miss و تأخیر هر لوکیتور؛ لوکیتور برندهٔ تاریخی اول امتحان می‌شود و آمار روی دیسک می‌ماند."""
+
+    def __init__(self, locators, path):
+        self.locators = list(locators)
+        self.path = path
+        self._lock = threading.Lock()
+        self.stats = {self.key(loc): {'hits': 0, 'misses': 0, 'total_ms': 0.0, 'last_hit': None}
+                      for loc in self.locators}
+        self._load()
+
+    @staticmethod
+    def key(locator) -> str:
+        by, sel = locator
+        return f"{by}:{sel}"
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                # لوکیتورهایی که دیگر در کد نیستند نادیده گرفته می‌شوند
+                for k, v in saved.items():
+                    if k in self.stats:
+                        self.stats[k].update(v)
+        except Exception as e:
+            logger.warning(f"⚠️ آمار سلکتورها خوانده نشد: {e}")
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.stats, ensure_ascii=False)
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(data)
+        except Exception as e:
+            logger.error(f"❌ خطا در ذخیره آمار سلکتورها: {e}")
+
+    def _hit_rate(self, st) -> float:
+        # هموارسازی لاپلاس تا لوکیتور تازه با یک شکست از رده خارج نشود
+        return (st['hits'] + 1) / (st['hits'] + st['misses'] + 2)
+
+    def ordered(self):
+        with self._lock:
+            ranked = sorted(
+                enumerate(self.locators),
+                key=lambda item: (-self._hit_rate(self.stats[self.key(item[1])]), item[0]),
+            )
+        return [loc for _, loc in ranked]
+
+    def record(self, locator, hit: bool, elapsed_ms: float):
+        with self._lock:
+            st = self.stats[self.key(locator)]
+            st['hits' if hit else 'misses'] += 1
+            st['total_ms'] += elapsed_ms
+            if hit:
+                st['last_hit'] = datetime.now().isoformat()
+
+    def report(self):
+        out = []
+        for loc in self.ordered():
+            with self._lock:
+                st = dict(self.stats[self.key(loc)])
+            tries = st['hits'] + st['misses']
+            out.append({
+                'by': loc[0],
+                'selector': loc[1],
+                'hits': st['hits'],
+                'misses': st['misses'],
+                'hit_rate': round(st['hits'] / tries, 3) if tries else None,
+                'avg_ms': round(st['total_ms'] / tries, 1) if tries else None,
+                'last_hit': st['last_hit'],
+            })
+        return out
+
+
+class MinecraftServerManager:
+    def __init__(self, server_url=None, browser=None, selectors=None, status_file=STATUS_FILE,
+                 history_dir=HISTORY_DIR):
         self.click_count = 0
         self.failed_clicks = 0
         self.successful_clicks = 0
         self.start_time = datetime.now()
         self.last_known_status = None
+        self.scheduler = PollScheduler()
+        self._login_redirect = False
         self.auto_click_active = True
         self.monitoring_active = True
         self.is_ready = False
-        self.server_url = MAGMA_SERVER_URL
+        self.server_url = server_url or MAGMA_SERVER_URL
+        self.server_id = server_id_from_url(self.server_url)
+        self.actions = ActionCoordinator(self.server_id)
+        self.status_file = status_file
+        self.probe_backend = STATUS_PROBE_BACKEND
+        self.start_selectors = selectors or SelectorRegistry(START_BUTTON_LOCATORS, SELECTOR_STATS_FILE)
+        self.history = StatusHistory(history_dir, HISTORY_RING_SIZE, HISTORY_SEGMENT_KB * 1024, HISTORY_MAX_SEGMENTS)
+        # هر START تا running/شکست دنبال می‌شود؛ نمونه‌های زمان تا running از تاریخچه بازیابی می‌شوند
+        self.verifier = StartVerifier(poll_max=POLL_FAST_SECONDS)
+        try:
+            self.verifier.seed(self.history.events('start'))
+        except Exception as e:
+            logger.warning(f"⚠️ تاریخچهٔ STARTها خوانده نشد: {e}")
+        self._status_file_key = None
+        self._status_file_written = 0.0
 
         logger.info(f"🌐 URL در حال استفاده: {self.server_url}")
 
@@ -78,7 +790,9 @@ class MinecraftServerManager:
             'next_check': None,
             'last_action': None,
             'auto_check_active': True,
-            'check_interval_minutes': random.uniform(CHECK_MIN_MINUTES, CHECK_MAX_MINUTES),
+            'check_interval_minutes': round(MONITOR_INTERVAL_SECONDS / 60, 2),
+            'check_bounds_minutes': [CHECK_MIN_MINUTES, CHECK_MAX_MINUTES],
+            'poll_reason': 'initial',
             'click_count': 0,
             'successful_clicks': 0,
             'failed_clicks': 0,
@@ -86,42 +800,108 @@ class MinecraftServerManager:
             'last_status_change': None,
             'start_button_available': False,
             'stop_button_available': False,
-            'current_url': ''
+            'current_url': '',
+            # نتیجهٔ بررسی ورود: unknown تا اولین پروب، بعد authenticated / login_redirect / error
+            'auth_state': 'unknown',
+            'auth_detail': None,
+            'auth_checked_at': None,
+            # منبع آخرین تشخیص: network (ترافیک پنل) / dom / http
+            'status_source': None,
+            # تأیید START و توزیع زمان کلیک تا running (SLO بازیابی)
+            'start_verification': self.verifier.summary(),
         }
 
-        self._setup_driver_headless()
-        # تلاش برای تزریق کوکی‌ها (اگر وجود داشته باشد)
-        if COOKIES_JSON:
-            self._inject_cookies_if_any(COOKIES_JSON, self.server_url)
+        # فقط ترد مانیتورینگ پروب می‌کند؛ هندلرهای Flask آخرین snapshot را می‌خوانند
+        self._snapshot = StatusSnapshot(0, 0.0, dict(self.status))
+        self._snapshot_cond = threading.Condition()
+        self._probe_requested = threading.Event()
+        # متن وضعیت لحظهٔ قبل از آخرین کلیک START (برای انتظار رویدادمحور بعد از کلیک)
+        self._status_before_click = None
+        # در حالت چندپردازه‌ای هر snapshot در segment مشترک هم نوشته می‌شود
+        self.segment = None
+
+        # همهٔ دسترسی‌ها به self.driver از این ورکر عبور می‌کند (در حالت ناوگان مشترک است)
+        self._owns_browser = browser is None
+        self.browser = browser or BrowserWorker()
+        self.watchdog = BrowserWatchdog(self.browser, [self]) if self._owns_browser else None
+        # perf log مال کل درایور است؛ در ناوگان (چند تب روی یک درایور) به سرور مشخصی نسبت داده نمی‌شود
+        self.net_status = NetworkStatusSource() if (NETWORK_STATUS_ENABLED and self._owns_browser) else None
+        self._last_dom_probe = None
+        if self._owns_browser:
+            self.browser.on_driver_change = self._reset_page_state
+        self.http_probe = None
+        if self.probe_backend == 'http':
+            self.http_probe = HttpStatusProbe(self.server_url, json.dumps(SESSION.load()),
+                                              STATUS_SELECTORS, BUTTON_SELECTORS)
+            logger.info("🪶 پروب وضعیت از طریق HTTP؛ Chrome فقط هنگام کلیک راه‌اندازی می‌شود.")
         else:
-            logger.warning("کوکی‌های MAGMANODE_COOKIES_JSON تنظیم نشده‌اند؛ احتمال ری‌دایرکت به /login.")
+            self._on_browser(self._ensure_driver, priority=PRIORITY_MANUAL)
+
+    @property
+    def driver(self):
+        return self.browser.driver
 
-    def _chrome_options(self):
-        opts = Options()
-        opts.add_argument("--headless=new")
-        opts.add_argument("--no-sandbox")
-        opts.add_argument("--disable-dev-shm-usage")
-        opts.add_argument("--disable-gpu")
-        opts.add_argument("--disable-extensions")
-        opts.add_argument("--window-size=1366,768")
-        opts.add_experimental_option("excludeSwitches", ["enable-automation"])
-        opts.add_experimental_option("useAutomationExtension", False)
-        if CHROME_BIN and os.path.exists(CHROME_BIN):
-            opts.binary_location = CHROME_BIN
-        opts.add_argument("--disable-blink-features=AutomationControlled")
-        return opts
+    def _on_browser(self, fn, *args, priority=PRIORITY_PROBE, **kwargs):
+        """اجرای fn روی ورکر مرورگر، در تب همین سرور"""
+        return self.browser.call(fn, *args, priority=priority, context=self.server_id, **kwargs)
+
+    def _init_browser(self):
+        self._setup_driver_headless()
+        self._load_session(self.driver)
+
+    def _load_session(self, driver):
+        """کوکی‌ها یک‌جا با CDP و بدون ناوبری؛ اولین get مستقیم صفحهٔ سرور با جلسهٔ معتبر است"""
+        cookies = SESSION.load()
+        if not cookies:
+            logger.warning("کوکی‌های MAGMANODE_COOKIES_JSON تنظیم نشده‌اند؛ احتمال ری‌دایرکت به /login.")
+            return 0
+        try:
+            with STARTUP.phase("cookie_restore"), phase("cookie_inject"):
+                added = SESSION.apply(driver, self.server_url, cookies)
+            logger.info(f"✅ {added} کوکی با Network.setCookies بارگذاری شد.")
+            return added
+        except Exception as e:
+            # روش قدیمی: ناوبری به ریشهٔ دامنه و add_cookie تک‌تک
+            logger.warning(f"⚠️ بارگذاری CDP کوکی‌ها ناموفق بود ({e})؛ add_cookie تک‌تک.")
+            with phase("cookie_inject", fallback="add_cookie"):
+                return self._add_cookies(cookies, self.server_url, driver)
+
+    def _ensure_driver(self):
+        """در حالت http، مرورگر تنبل راه‌اندازی می‌شود (فقط داخل ورکر صدا زده شود)"""
+        if self.driver is None:
+            self._init_browser()
+            self.browser.activate(self.server_id)
+        self.browser.last_used = time.monotonic()
+
+    def _release_idle_browser(self):
+        # وقتی پروب‌ها HTTP هستند، Chrome بی‌کار را می‌بندیم تا RAM آزاد شود
+        if self.probe_backend != 'http' or self.driver is None:
+            return
+        if time.monotonic() - self.browser.last_used < BROWSER_IDLE_SECONDS:
+            return
+        self.browser.submit(self._quit_idle_driver, priority=PRIORITY_PROBE)
+
+    def _quit_idle_driver(self):
+        # ممکن است تا رسیدن نوبت این دستور، کلیکی با مرورگر انجام شده باشد
+        if self.driver is not None and time.monotonic() - self.browser.last_used >= BROWSER_IDLE_SECONDS:
+            self._quit_driver()
+            logger.info("💤 Chrome بی‌کار بسته شد.")
+
+    def _launch_driver(self):
+        """یک Chrome تازه از driver_engine (پروفایل DRIVER_PROFILE، backend از BROWSER_BACKEND)؛ هنوز به ورکر سپرده نشده"""
+        backend = driver_engine.get_backend()
+        if backend == "selenium":
+            with STARTUP.phase("selenium_import"):
+                driver_engine.load_selenium()
+        with STARTUP.phase("driver_launch"), phase("driver_launch", profile=driver_engine.get_profile(), backend=backend):
+            driver = driver_engine.launch(user_data="manager", perf_log=NETWORK_STATUS_ENABLED, backend=backend)
+            TRACER.annotate(launched=driver_engine.backend_of(driver))
+            return driver
 
     def _setup_driver_headless(self):
         try:
-            service = Service(CHROMEDRIVER_PATH)
-            self.driver = webdriver.Chrome(service=service, options=self._chrome_options())
-            try:
-                self.driver.execute_cdp_cmd(
-                    "Page.addScriptToEvaluateOnNewDocument",
-                    {"source": "Object.defineProperty(navigator,'webdriver',{get:() => undefined});"},
-                )
-            except Exception as e:
-                logger.debug(f"Stealth script error: {e}")
+            self.browser.set_driver(self._launch_driver())
+            self.browser.on_new_tab = block_profile.apply_to_driver
             logger.info("✅ Chrome headless راه‌اندازی شد.")
         except Exception as e:
             logger.error(f"❌ خطا در راه‌اندازی Chrome headless: {e}")
@@ -131,18 +911,11 @@ class MinecraftServerManager:
         p = urlparse(url)
         return f"{p.scheme}://{p.hostname}"
 
-    def _inject_cookies_if_any(self, cookies_json: str, base_url: str):
-        try:
-            cookies = json.loads(cookies_json)
-            if not isinstance(cookies, list):
-                raise ValueError("cookies json must be a list")
-        except Exception as e:
-            logger.error(f"فرمت کوکی‌ها نامعتبر است: {e}")
-            return
-
+    def _add_cookies(self, cookies, base_url: str, driver=None) -> int:
+        driver = driver or self.driver
         root = self._domain_root(base_url)
-        self.driver.get(root)
-        time.sleep(1)
+        driver.get(root)
+        readiness.wait_for('cookie_root', lambda: readiness.document_ready(driver), timeout=5, baseline=1)
 
         added = 0
         for c in cookies:
@@ -161,14 +934,13 @@ class MinecraftServerManager:
                 }
                 if "expires" in c or "expiry" in c:
                     cookie_dict["expiry"] = int(c.get("expires") or c.get("expiry"))
-                self.driver.add_cookie(cookie_dict)
+                driver.add_cookie(cookie_dict)
                 added += 1
             except Exception as e:
                 logger.debug(f"خطا در افزودن کوکی: {e}")
+        return added
 
-        logger.info(f"✅ {added} کوکی تزریق شد.")
-
-    def _save_status_to_file(self):
+    def _save_status_to_file(self, probed_at=None):
         self.status['last_check'] = datetime.now().isoformat()
         self.status['click_count'] = self.click_count
         self.status['successful_clicks'] = self.successful_clicks
@@ -178,146 +950,354 @@ class MinecraftServerManager:
         minutes = int((uptime_delta.total_seconds() % 3600) // 60)
         seconds = int(uptime_delta.total_seconds() % 60)
         self.status['uptime'] = f"{hours}:{minutes:02d}:{seconds:02d}"
-        try:
-            with open(STATUS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.status, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"❌ خطا در ذخیره وضعیت: {e}")
-
-    def _update_next_check_time(self):
+        # تاریخچه در status_history است؛ این فایل فقط آخرین وضعیت برای ری‌استارت را نگه می‌دارد
+        key = json.dumps({k: v for k, v in self.status.items() if k not in STREAM_CLOCK_KEYS},
+                         ensure_ascii=False, sort_keys=True)
+        now = time.monotonic()
+        if key != self._status_file_key or now - self._status_file_written >= STATUS_FILE_MIN_INTERVAL:
+            try:
+                with phase("save_status"), open(self.status_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.status, f, ensure_ascii=False, separators=(',', ':'))
+                self._status_file_key = key
+                self._status_file_written = now
+            except Exception as e:
+                logger.error(f"❌ خطا در ذخیره وضعیت: {e}")
+        self._publish_snapshot(probed_at)
+
+    def _record_click(self, action: str, source: str, ok: bool):
+        self.history.append('click', action=action, source=source, ok=bool(ok))
+        CLICKS_TOTAL.inc(server=self.server_id, action=action, source=source, outcome='ok' if ok else 'failed')
+
+    def _publish_snapshot(self, probed_at=None):
+        """انتشار یک snapshot جدید؛ اگر probed_at داده نشود، تازگی داده همان قبلی است."""
+        with self._snapshot_cond:
+            prev = self._snapshot
+            taken_at = prev.taken_at if probed_at is None else probed_at
+            self._snapshot = StatusSnapshot(prev.version + 1, taken_at, dict(self.status))
+            self._snapshot_cond.notify_all()
+            if self.segment is not None:
+                self.segment.publish(*self._snapshot)
+
+    def get_snapshot(self) -> StatusSnapshot:
+        return self._snapshot
+
+    def wait_for_version(self, version: int, timeout: float) -> StatusSnapshot:
+        """تا انتشار snapshotی جدیدتر از version صبر می‌کند (یا تا timeout)"""
+        with self._snapshot_cond:
+            self._snapshot_cond.wait_for(lambda: self._snapshot.version > version, timeout)
+            return self._snapshot
+
+    def wait_for_snapshot(self, max_age: float, timeout: float = SNAPSHOT_WAIT_TIMEOUT) -> StatusSnapshot:
+        """snapshotی که حداکثر max_age ثانیه قدمت دارد؛ در صورت نیاز از مانیتور پروب تازه می‌خواهد."""
+        snap = self._snapshot
+        requested_at = time.monotonic()
+        if snap.version and requested_at - snap.taken_at <= max_age:
+            return snap
+        self._probe_requested.set()
+        with self._snapshot_cond:
+            self._snapshot_cond.wait_for(lambda: self._snapshot.taken_at >= requested_at, timeout)
+            return self._snapshot
+
+    def _update_next_check_time(self, delay=None):
+        if delay is not None:
+            self.status['check_interval_minutes'] = round(delay / 60, 2)
+            self.status['poll_reason'] = self.scheduler.reason
         if self.status['auto_check_active']:
             interval_minutes = self.status['check_interval_minutes']
             next_check_time = datetime.now() + timedelta(minutes=interval_minutes)
             self.status['next_check'] = next_check_time.isoformat()
 
-    def _check_button_exists(self, button_type: str):
+    def _dom_probe(self) -> dict:
+        with phase("probe_dom"):
+            return self.driver.execute_script(DOM_PROBE_SCRIPT, STATUS_SELECTORS, BUTTON_SELECTORS)
+
+    def _check_button_exists(self, button_type: str, probe=None):
         try:
-            if button_type == 'start':
-                selectors = [
-                    'button[data-action="start"]',
-                    'button.bg-green-600',
-                    'button[class*="bg-green-600"]'
-                ]
-            else:
-                selectors = [
-                    'button[data-action="stop"]',
-                    'button.bg-red-600',
-                    'button[class*="bg-red-600"]'
-                ]
-            for s in selectors:
-                try:
-                    el = self.driver.find_element(By.CSS_SELECTOR, s)
-                    if el.is_displayed() and el.is_enabled():
-                        return True
-                except Exception:
-                    continue
-            return False
+            return button_available(probe or self._dom_probe(), button_type)
         except Exception:
             return False
 
+    def _reset_page_state(self):
+        """وضعیت شبکه و آخرین پروب DOM مال صفحه/درایور قبلی‌اند؛ پروب بعدی حتماً از DOM می‌گذرد"""
+        if self.net_status is not None:
+            self.net_status.reset()
+        self._last_dom_probe = None
+
     def _safe_get(self, url: str) -> bool:
         """navigate safely; return True on success, False on failure"""
         try:
-            self.driver.get(url)
+            # پیام‌های صفحهٔ قبلی اول مصرف می‌شوند تا بعد از reset وضعیت قدیمی را برنگردانند
+            self._drain_perf_log()
+            self._reset_page_state()
+            with phase("navigate", url=url):
+                self.driver.get(url)
             return True
         except Exception as e:
             logger.error(f"❌ خطا در باز کردن URL: {e} | url='{url}'")
             return False
 
+    @staticmethod
+    def _on_server_page(url: str) -> bool:
+        # بعد از تزریق کوکی روی ریشهٔ دامنه‌ایم، نه صفحهٔ سرور
+        return "magmanode.com" in (url or "") and urlparse(url).path not in ("", "/")
+
+    def _ensure_server_page(self) -> bool:
+        self._ensure_driver()
+        if not self._on_server_page(self.driver.current_url or ""):
+            if not self._safe_get(self.server_url):
+                return False
+            self._wait_page_ready('navigate')
+        return True
+
+    def _wait_page_ready(self, label, baseline=3):
+        """تا رندر شدن المنت وضعیت یا دکمه‌ها صبر می‌کند (داخل ورکر)"""
+        with TRACER.span("page_ready", label=label) as span:
+            ok = readiness.wait_for(
+                label, lambda: readiness.page_ready(self.driver, STATUS_SELECTORS, ALL_BUTTON_SELECTORS),
+                timeout=PAGE_READY_TIMEOUT, baseline=baseline,
+            )
+            span.set(ok=ok)
+            return ok
+
+    def _status_mutated(self, before):
+        if self.driver is None:
+            return False
+        return readiness.status_mutated(self.driver, STATUS_SELECTORS, before)
+
+    def _wait_after_click(self, label, baseline):
+        """بیرون از ورکر: تا تغییر متن وضعیت (MutationObserver) یا پایان baseline صبر می‌کند"""
+        before = self._status_before_click
+        with TRACER.span("wait_after_click", label=label, baseline_s=baseline) as span:
+            changed = readiness.wait_for(
+                label,
+                lambda: self._on_browser(self._status_mutated, before, priority=PRIORITY_PROBE_URGENT),
+                timeout=baseline, poll=0.5,
+            )
+            span.set(changed=changed)
+        if changed:
+            # وضعیت جدید را همین حالا در داشبورد نشان بده
+            self._probe_requested.set()
+        return changed
+
+    def _apply_probe(self, probe: dict) -> str:
+        """نتیجهٔ یک پروب (مرورگر یا HTTP) را به وضعیت تبدیل و در self.status ثبت می‌کند"""
+        self.status['current_url'] = probe.get('url') or ""
+        detected = detect_status(probe)
+        self._login_redirect = detected['login_redirect']
+        self.status['start_button_available'] = detected['start']
+        self.status['stop_button_available'] = detected['stop']
+
+        if self._login_redirect:
+            logger.warning("به صفحهٔ login ری‌دایرکت شدیم؛ احتمالاً کوکی‌ها نامعتبرند.")
+            LOGIN_REDIRECTS_TOTAL.inc(server=self.server_id)
+            self._set_auth(AUTH_LOGIN)
+            return 'unknown'
+
+        detected_status = detected['status']
+        if detected_status != 'unknown':
+            self._set_auth(AUTH_OK)
+
+        if self.last_known_status != detected_status:
+            logger.info(f"🔄 تغییر وضعیت: {self.last_known_status} → {detected_status}")
+            self.history.append('status', frm=self.last_known_status, to=detected_status)
+            STATUS_TRANSITIONS_TOTAL.inc(server=self.server_id, to=detected_status)
+            self.last_known_status = detected_status
+            self.status['last_status_change'] = datetime.now().isoformat()
+
+        return detected_status
+
+    def _set_auth(self, state, detail=None):
+        if state != self.status['auth_state']:
+            icon = "✅" if state == AUTH_OK else "❌"
+            logger.info(f"{icon} وضعیت ورود: {self.status['auth_state']} → {state}" + (f" ({detail})" if detail else ""))
+        self.status['auth_state'] = state
+        self.status['auth_detail'] = detail
+        self.status['auth_checked_at'] = datetime.now().isoformat()
+
+    def _check_auth_job(self, url):
+        """بررسی ورود با همین درایور گرم (جایگزین اجرای جداگانهٔ auth_checker.py هنگام بوت)"""
+        self._ensure_driver()
+        with STARTUP.phase("auth_check"), TRACER.span("auth_check") as span:
+            result = check_auth(self.driver, url)
+            span.set(state=result['state'])
+        self._drain_perf_log()
+        if result['state'] == AUTH_OK:
+            SESSION.capture(self.driver, url, force=True)
+        self._set_auth(result['state'], result['detail'])
+        return result
+
     def _get_server_status(self) -> str:
         """کوشش برای تشخیص وضعیت سرور با متن یا دکمه‌ها"""
         try:
-            # اگر هنوز صفحهٔ سرور لود نشده، برو
-            if "magmanode.com" not in (self.driver.current_url or ""):
-                if not self._safe_get(self.server_url):
-                    return 'unknown'
-                time.sleep(3)
-
-            self.status['current_url'] = self.driver.current_url or ""
-
-            url_l = self.status['current_url'].lower()
-            if "/login" in url_l:
-                logger.warning("به صفحهٔ login ری‌دایرکت شدیم؛ احتمالاً کوکی‌ها نامعتبرند.")
-                self.status['start_button_available'] = False
-                self.status['stop_button_available'] = False
-                return 'unknown'
-
-            # خواندن متن وضعیت
-            status_selectors = [
-                'span[data-server-status]',
-                'span.font-medium[data-server-status]',
-                '.server-status',
-                '.status-indicator',
-                'span.font-medium'
-            ]
-            status_text = ""
-            for s in status_selectors:
-                try:
-                    el = self.driver.find_element(By.CSS_SELECTOR, s)
-                    if el and el.text.strip():
-                        status_text = el.text.strip().lower()
-                        break
-                except Exception:
-                    continue
-
-            start_exists = self._check_button_exists('start')
-            stop_exists = self._check_button_exists('stop')
-
-            self.status['start_button_available'] = start_exists
-            self.status['stop_button_available'] = stop_exists
-
-            detected_status = 'unknown'
-            if 'running' in status_text:
-                detected_status = 'running'
-            elif 'offline' in status_text:
-                detected_status = 'offline'
-            elif 'starting' in status_text:
-                detected_status = 'starting'
+            self._ensure_driver()
+            self._drain_perf_log()
+            probe = self._passive_probe()
+            if probe is not None:
+                # وضعیت همان است که پنل خودش از شبکه گرفته؛ پرس‌وجوی DOM لازم نیست
+                source = 'network'
             else:
-                # استنتاج از روی دکمه‌ها
-                if start_exists and not stop_exists:
-                    detected_status = 'offline'
-                elif stop_exists and not start_exists:
-                    detected_status = 'running'
-
-            if self.last_known_status != detected_status:
-                logger.info(f"🔄 تغییر وضعیت: {self.last_known_status} → {detected_status}")
-                self.last_known_status = detected_status
-                self.status['last_status_change'] = datetime.now().isoformat()
-
-            return detected_status
+                source = 'dom'
+                probe = self._dom_probe()
+                # اگر هنوز صفحهٔ سرور لود نشده، برو
+                if not self._on_server_page(probe['url']):
+                    if not self._safe_get(self.server_url):
+                        return 'unknown'
+                    self._wait_page_ready('navigate')
+                    probe = self._dom_probe()
+                self._last_dom_probe = probe
+            SESSION.capture(self.driver, self.server_url)
+            STATUS_SOURCE_TOTAL.inc(server=self.server_id, source=source)
+            self.status['status_source'] = source
+            return self._apply_probe(probe)
         except Exception as e:
+            PROBE_ERRORS_TOTAL.inc(backend='browser')
             logger.error(f"❌ خطا در تشخیص وضعیت: {e}")
             return 'unknown'
 
-    def _find_start_button(self):
-        selectors = [
-            (By.CSS_SELECTOR, 'button[data-action="start"]'),
-            (By.CSS_SELECTOR, 'button.bg-green-600'),
-            (By.XPATH, '//button[contains(text(),"START")]'),
-            (By.XPATH, '//button[text()="START"]'),
-            (By.CSS_SELECTOR, 'button.bg-green-600.text-white'),
-            (By.CSS_SELECTOR, 'button[type="submit"].bg-green-600'),
-            (By.CSS_SELECTOR, 'button[class*="bg-green-600"]'),
-            (By.CSS_SELECTOR, 'button[class*="bg-green"][class*="text-white"]'),
-            (By.XPATH, '//button[contains(@class, "bg-green")]'),
-            (By.XPATH, '//button[contains(text(), "Start")]'),
-            (By.XPATH, '//button[contains(text(), "شروع")]'),
-        ]
-        for by, sel in selectors:
+    def _get_server_status_http(self):
+        """پروب سبک؛ None یعنی نتیجه قطعی نیست و باید از مرورگر پرسید"""
+        try:
+            with phase("probe_http"):
+                probe = self.http_probe.fetch()
+            SESSION.capture_jar(self.http_probe.session.cookies)
+        except Exception as e:
+            PROBE_ERRORS_TOTAL.inc(backend='http')
+            logger.warning(f"⚠️ پروب HTTP ناموفق بود، سراغ مرورگر می‌روم: {e}")
+            return None
+        has_markers = probe['status_text'] or any(
+            b['found'] for group in probe['buttons'].values() for b in group
+        )
+        if not has_markers and "/login" not in (probe['url'] or "").lower():
+            logger.warning("⚠️ در HTML صفحه نشانگر وضعیت پیدا نشد؛ سراغ مرورگر می‌روم.")
+            return None
+        STATUS_SOURCE_TOTAL.inc(server=self.server_id, source='http')
+        self.status['status_source'] = 'http'
+        return self._apply_probe(probe)
+
+    def probe_status(self, priority=PRIORITY_PROBE) -> str:
+        if self.http_probe:
+            status = self._get_server_status_http()
+            if status is not None:
+                return status
+        return self._on_browser(self._get_server_status, priority=priority)
+
+    def _click_start(self) -> bool:
+        """پیدا کردن و کلیک START در یک دستور ورکر تا المنت بین دو دستور stale نشود"""
+        if not self._ensure_server_page():
+            return False
+        try:
+            with phase("find_start_button"):
+                btn = self._find_start_button()
             try:
-                el = WebDriverWait(self.driver, 2).until(EC.element_to_be_clickable((by, sel)))
-                text = (el.text or "").strip().upper()
-                if any(k in text for k in ['START', 'شروع']):
-                    return el
+                # observer قبل از کلیک نصب می‌شود تا اولین تغییر متن وضعیت از دست نرود
+                self._status_before_click = readiness.watch_status(self.driver, STATUS_SELECTORS)
             except Exception:
-                continue
-        raise Exception("دکمه START پیدا نشد.")
+                self._status_before_click = None
+            with phase("perform_click"):
+                return self._perform_click(btn)
+        finally:
+            self._drain_perf_log()
+            SESSION.capture(self.driver, self.server_url, force=True)
+
+    def _drain_perf_log(self):
+        """perf log را خالی می‌کند (تا در حافظهٔ chromedriver انباشته نشود)، درخواست‌های مسدودشده را می‌شمارد
+        و پیام‌های شبکهٔ پنل را به منبع وضعیت شبکه می‌دهد"""
+        if self.driver is None:
+            return
+        messages = block_profile.read_perf_messages(self.driver)
+        for rtype, n in block_profile.STATS.record(messages).items():
+            BLOCKED_REQUESTS_TOTAL.inc(n, type=rtype)
+            BLOCKED_BYTES_TOTAL.inc(n * block_profile.estimated_bytes(rtype))
+        if self.net_status is not None:
+            self.net_status.feed(self.driver, messages)
+
+    def _passive_probe(self):
+        """پروب از روی ترافیک پنل، بدون DOM؛ None یعنی باید DOM را پرسید.
+
+        فقط وقتی استفاده می‌شود که وضعیت شبکه تازه است و با آخرین پروب DOM هم‌خوان است؛
+        تغییر وضعیت یک بار با DOM تأیید می‌شود تا دکمه‌ها هم به‌روز شوند.
+        """
+        last = self._last_dom_probe
+        if self.net_status is None or last is None or not self._on_server_page(last['url']):
+            return None
+        net = self.net_status.current(NETWORK_STATUS_MAX_AGE)
+        if net is None or net != detect_status(last)['status']:
+            return None
+        return dict(last, status_text=net)
+
+    def _network_changed(self) -> bool:
+        """داخل ورکر: perf log را می‌خواند؛ True اگر ترافیک پنل وضعیتی غیر از وضعیت فعلی نشان دهد"""
+        if self.driver is None:
+            return False
+        self._drain_perf_log()
+        net = self.net_status.current(NETWORK_STATUS_MAX_AGE)
+        return net is not None and net != self.status['status']
+
+    def _wait_next_probe(self, delay):
+        """تا پروب بعدی صبر می‌کند؛ در حالت browser هر NETWORK_WATCH_SECONDS ترافیک پنل را نگاه می‌کند
+        و با دیدن تغییر وضعیت، پروب را جلو می‌اندازد"""
+        deadline = time.monotonic() + delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self.net_status is None or self.probe_backend == 'http' or self.driver is None:
+                self._probe_requested.wait(remaining)
+                return
+            if self._probe_requested.wait(min(remaining, NETWORK_WATCH_SECONDS)):
+                return
+            try:
+                if self._on_browser(self._network_changed, priority=PRIORITY_PROBE):
+                    logger.info(f"📡 ترافیک پنل تغییر وضعیت نشان داد ({self.net_status.status})؛ پروب فوری.")
+                    return
+            except Exception as e:
+                logger.debug(f"network watch error: {e}")
+
+    def _scan_start_locators(self, driver):
+        """یک دور روی همهٔ لوکیتورها به ترتیب آماری؛ نتیجهٔ هر لوکیتور در _last_scan می‌ماند"""
+        self._last_scan = []
+        for loc in self.start_selectors.ordered():
+            t0 = time.perf_counter()
+            found = None
+            try:
+                for el in driver.find_elements(*loc):
+                    text = (el.text or "").strip().upper()
+                    if el.is_displayed() and el.is_enabled() and any(k in text for k in ['START', 'شروع']):
+                        found = el
+                        break
+            except Exception:
+                pass
+            self._last_scan.append((loc, found is not None, (time.perf_counter() - t0) * 1000))
+            if found is not None:
+                return found
+        return False
+
+    def _find_start_button(self):
+        # یک مهلت کلی برای همهٔ لوکیتورها، به‌جای ۲ ثانیه برای هر کدام
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        self._last_scan = []
+        try:
+            return WebDriverWait(self.driver, START_BUTTON_WAIT_SECONDS, poll_frequency=0.25).until(
+                self._scan_start_locators
+            )
+        except Exception:
+            raise Exception("دکمه START پیدا نشد.")
+        finally:
+            # فقط دور آخر ثبت می‌شود تا پولینگ، missها را چند برابر نکند
+            for loc, hit, ms in self._last_scan:
+                self.start_selectors.record(loc, hit, ms)
+                if hit:
+                    TRACER.annotate(selector=loc[1], by=loc[0])
+            TRACER.annotate(locators_tried=len(self._last_scan))
+            self.start_selectors.save()
 
     def _perform_click(self, button):
         try:
             self.driver.execute_script("arguments[0].scrollIntoView({behavior:'smooth',block:'center'});", button)
-            time.sleep(random.uniform(0.5, 1.5))
+            pause = random.uniform(0.5, 1.5)
+            TRACER.annotate(pre_click_sleep_ms=round(pause * 1000))
+            time.sleep(pause)
             methods = [
                 lambda: button.click(),
                 lambda: self.driver.execute_script("arguments[0].click();", button),
@@ -328,12 +1308,15 @@ class MinecraftServerManager:
             for i, m in enumerate(methods, start=1):
                 try:
                     m()
+                    TRACER.annotate(method=i)
+                    CLICK_METHOD_TOTAL.inc(method=i)
                     self.successful_clicks += 1
                     logger.info(f"✅ کلیک موفق با روش {i}")
                     return True
                 except Exception:
                     continue
             self.failed_clicks += 1
+            TRACER.annotate(method=None, methods_tried=len(methods))
             logger.error("❌ هیچ روش کلیک کار نکرد.")
             return False
         except Exception as e:
@@ -341,122 +1324,214 @@ class MinecraftServerManager:
             logger.error(f"❌ خطا در کلیک: {e}")
             return False
 
-    def _get_random_wait_time(self):
-        minutes = random.uniform(CHECK_MIN_MINUTES, CHECK_MAX_MINUTES)
-        seconds = minutes * 60
-        logger.info(f"⏰ انتظار برای {minutes:.1f} دقیقه ({int(seconds)} ثانیه)")
-        return seconds
+    def monitor_once(self, priority=PRIORITY_PROBE):
+        """یک دور پروب + انتشار snapshot؛ (وضعیت، فاصلهٔ پروب بعدی) را برمی‌گرداند"""
+        # درخواستی که وسط پروب برسد، دور بعدی را فوراً بیدار می‌کند
+        self._probe_requested.clear()
+        probed_at = time.monotonic()
+        with STARTUP.phase("first_probe"), TRACER.span("probe", backend=self.probe_backend) as span:
+            current_status = self.probe_status(priority)
+            span.set(status=current_status, source=self.status['status_source'])
+        self.history.append('probe', status=current_status,
+                            ms=round((time.monotonic() - probed_at) * 1000, 1))
+        self.status['status'] = current_status
+        self._verify_start(current_status)
+        delay = self.scheduler.next_delay(current_status, self._login_redirect,
+                                          self.verifier.next_delay() if self.verifier.pending else None)
+        self._update_next_check_time(delay)
+        self._save_status_to_file(probed_at)
+        self._release_idle_browser()
+        return current_status, delay
+
+    def _verify_start(self, status: str):
+        """پیشرفت START در حال تأیید؛ با شکست قابل تکرار، cooldown برداشته می‌شود تا چرخهٔ بعد دوباره کلیک کند"""
+        done = self.verifier.observe(status)
+        if done is not None:
+            outcome, elapsed, attempt = done
+            START_VERIFICATIONS_TOTAL.inc(server=self.server_id, outcome=outcome)
+            self.history.append('start', outcome=outcome, s=round(elapsed, 1), retries=attempt['retries'],
+                                source=attempt['source'], starting_s=attempt['starting_s'])
+            if outcome == START_RUNNING:
+                START_TO_RUNNING_SECONDS.observe(elapsed, server=self.server_id)
+                logger.info(f"✅ START تأیید شد: running بعد از {elapsed:.0f}s"
+                            + (f" ({attempt['retries']} تلاش مجدد)" if attempt['retries'] else ""))
+            else:
+                logger.warning(f"⚠️ START به running نرسید ({outcome}، {elapsed:.0f}s)"
+                               + ("؛ کلیک دوباره." if self.verifier.retry_due else "."))
+                if outcome in RETRYABLE:
+                    self.actions.clear_cooldown()
+        self.status['start_verification'] = self.verifier.summary()
+
+    def _should_click(self, curr: str) -> bool:
+        """تنها جای تصمیم کلیک خودکار؛ cooldown و single-flight را ActionCoordinator داخل auto_click_once اعمال می‌کند"""
+        if curr not in ('offline', 'unknown') or self._login_redirect or not self.status['auto_check_active']:
+            return False
+        # تلاش مجدد START تأییدنشده منتظر نوبت کلیک زمان‌بند نمی‌ماند
+        return self.verifier.retry_due or (self.auto_click_active and self.scheduler.click_due())
 
-    def continuous_monitoring(self):
-        logger.info("👁️ شروع مانیتورینگ مداوم...")
-        while self.monitoring_active:
-            try:
-                current_status = self._get_server_status()
-                self.status['status'] = current_status
-                self._update_next_check_time()
+    def auto_click_once(self, curr: str) -> bool:
+        """یک بار START (فقط بعد از _should_click صدا زده می‌شود)؛ True یعنی کلیک انجام شد"""
+        source = 'retry' if self.verifier.retry_due else 'auto'
+        try:
+            clicked, how = self.actions.run(
+                'start', lambda: self._on_browser(self._click_start, priority=PRIORITY_CLICK), curr)
+            TRACER.annotate(flight=how)
+            if how != ActionCoordinator.RAN:
+                # کلیک را درخواست دیگری انجام داده (یا در cooldown است)؛ کلیک تکراری نمی‌زنیم
+                return False
+            self._record_click('start', source, clicked)
+            self.scheduler.note_click()
+            if clicked:
+                self.click_count += 1
+                self.verifier.begin(source)
+                self.status['start_verification'] = self.verifier.summary()
+                self.status['last_action'] = f"START{' retry' if source == 'retry' else ''} @ {datetime.now().strftime('%H:%M:%S')}"
                 self._save_status_to_file()
-                time.sleep(10)
-            except Exception as e:
-                logger.error(f"❌ خطا در مانیتورینگ: {e}")
-                time.sleep(30)
+            else:
+                self.verifier.abandon()
+            return clicked
+        except Exception as e:
+            self.failed_clicks += 1
+            self.scheduler.note_click()
+            self.verifier.abandon()
+            self._record_click('start', source, False)
+            logger.error(f"❌ پیدا/کلیک دکمه START: {e}")
+            return False
 
     def run_auto_clicker(self, url=None, max_clicks=None):
         try:
             logger.info("🚀 شروع Auto Clicker...")
-            # ترد مانیتورینگ را از همین ابتدا روشن کن که حتی اگر ناوبری خطا داد، داشبورد زنده بماند
-            mt = threading.Thread(target=self.continuous_monitoring, daemon=True)
-            mt.start()
             self.is_ready = True
 
             target = (url or self.server_url)
-            # تلاش اولیه برای باز کردن صفحه
-            if not self._safe_get(target):
-                # اگر نشد، چند بار دیگر هم تلاش کن
-                for _ in range(3):
-                    time.sleep(3)
-                    if self._safe_get(target):
-                        break
-
-            time.sleep(5)
-
-            # وضعیت اولیه
-            initial_status = self._get_server_status()
-            self.status['status'] = initial_status
-            self._update_next_check_time()
-            self._save_status_to_file()
-
-            logger.info("✅ سیستم آماده شد. حلقهٔ کلیکر شروع شد.")
-
-            while self.auto_click_active:
-                try:
-                    curr = self._get_server_status()
-                    # اگر سرور روشن است، صبر کن
-                    if curr == 'running':
-                        time.sleep(self._get_random_wait_time())
-                        continue
-
-                    # اگر آف‌لاین/نامعلوم است، تلاش برای START
-                    if curr in ('offline', 'unknown', 'starting'):
+            # بررسی ورود + باز کردن صفحه با همان مرورگر (در حالت http مرورگری در کار نیست و
+            # اولین پروب HTTP وضعیت ورود را تعیین می‌کند)
+            if self.probe_backend != 'http':
+                with TRACER.trace("startup_auth", server=self.server_id) as tr:
+                    for attempt in range(4):
+                        if attempt:
+                            with TRACER.span("retry_sleep", attempt=attempt):
+                                time.sleep(3)
                         try:
-                            btn = self._find_start_button()
-                            if self._perform_click(btn):
-                                self.click_count += 1
-                                self.status['last_action'] = f"START @ {datetime.now().strftime('%H:%M:%S')}"
-                                self._save_status_to_file()
-                                time.sleep(15)
+                            if self._on_browser(self._check_auth_job, target, priority=PRIORITY_CLICK)['state'] != AUTH_ERROR:
+                                break
                         except Exception as e:
-                            self.failed_clicks += 1
-                            logger.error(f"❌ پیدا/کلیک دکمه START: {e}")
-
-                    if max_clicks and self.successful_clicks >= max_clicks:
-                        logger.info("✅ حد اکثر کلیک انجام شد.")
-                        break
-
-                    time.sleep(self._get_random_wait_time())
-                except Exception as e:
-                    logger.error(f"❌ خطا در حلقهٔ اصلی: {e}")
-                    time.sleep(30)
+                            self._set_auth(AUTH_ERROR, str(e))
+                    tr.set(attempts=attempt + 1, state=self.status['auth_state'])
+            # انتظار برای رندر صفحه داخل check_auth انجام شده است
+
+            logger.info("✅ سیستم آماده شد. حلقهٔ پروب/کلیک شروع شد.")
+
+            # یک حلقه برای پروب و کلیک؛ فاصله را PollScheduler از روی وضعیت تعیین می‌کند
+            while self.monitoring_active:
+                delay = self._cycle(max_clicks)
+                if delay:
+                    # force_check، کلیک دستی یا تغییر وضعیت در ترافیک پنل زودتر بیدار می‌کند
+                    self._wait_next_probe(delay)
         finally:
             logger.info("Auto clicker پایان یافت.")
 
+    def _cycle(self, max_clicks=None) -> float:
+        """یک چرخهٔ پروب/کلیک به‌صورت یک trace؛ فاصلهٔ انتظار تا چرخهٔ بعد (0 یعنی بلافاصله)"""
+        with TRACER.trace("cycle", server=self.server_id) as cycle:
+            try:
+                curr, delay = self.monitor_once()
+                cycle.set(status=curr)
+
+                # اگر آف‌لاین/نامعلوم است و نوبت کلیک رسیده، تلاش برای START
+                if self._should_click(curr) and self.auto_click_once(curr):
+                    cycle.set(clicked=True)
+                    self._wait_after_click('after_click', 15)
+                    return 0
+
+                if max_clicks and self.successful_clicks >= max_clicks:
+                    logger.info("✅ حد اکثر کلیک انجام شد.")
+                    self.auto_click_active = False
+                cycle.set(next_delay_s=round(delay, 1), reason=self.scheduler.reason)
+                return delay
+            except Exception as e:
+                logger.error(f"❌ خطا در حلقهٔ اصلی: {e}")
+                cycle.set(error=str(e))
+                with TRACER.span("error_backoff"):
+                    time.sleep(30)
+                return 0
+
+    def _start_server_job(self):
+        curr = self._get_server_status()
+        if curr == 'running':
+            return None
+        return self._click_start()
+
+    def _stop_server_job(self) -> bool:
+        if not self._ensure_server_page():
+            return False
+        # پروب می‌گوید کدام سلکتور قابل کلیک است؛ فقط همان را پیدا می‌کنیم
+        probe = self._dom_probe()
+        for b in probe['buttons']['stop']:
+            if b['found'] and b['visible'] and b['enabled']:
+                try:
+                    self.driver.find_element(CSS_SELECTOR, b['selector']).click()
+                    return True
+                except Exception:
+                    continue
+        return False
+
     def start_server_manual(self):
+        with TRACER.trace("manual_start", server=self.server_id) as tr:
+            ok, msg = self._start_server_manual()
+            tr.set(ok=ok, message=msg)
+            return ok, msg
+
+    def _start_server_manual(self):
         try:
-            curr = self._get_server_status()
-            if curr == 'running':
+            # دستور دستی از پروب‌های روتین جلو می‌زند
+            ok, how = self.actions.run(
+                'start', lambda: self._on_browser(self._start_server_job, priority=PRIORITY_MANUAL),
+                self.status['status'])
+            TRACER.annotate(flight=how)
+            if how == ActionCoordinator.COOLDOWN:
+                return False, "سرور در حال روشن شدن است؛ کلیک دوباره انجام نشد."
+            if ok is None:
                 return False, "سرور همین الان روشن است."
-            btn = self._find_start_button()
-            ok = self._perform_click(btn)
+            if how == ActionCoordinator.JOINED:
+                return bool(ok), ("درخواست START در جریان بود و انجام شد." if ok else "کلیک روی START ناموفق بود.")
+            self._record_click('start', 'manual', ok)
             if ok:
+                self.verifier.begin('manual')
+                self.status['start_verification'] = self.verifier.summary()
                 self.status['last_action'] = f"START manual @ {datetime.now().strftime('%H:%M:%S')}"
                 self._save_status_to_file()
-                time.sleep(10)
+                # انتظار بیرون از ورکر تا مرورگر برای بقیه آزاد بماند
+                self._wait_after_click('manual_start', 10)
                 return True, "درخواست روشن شدن ارسال شد."
             return False, "کلیک روی START ناموفق بود."
+        except FuturesTimeout:
+            return False, "مرورگر در زمان مقرر پاسخ نداد."
         except Exception as e:
             return False, f"خطا: {e}"
 
     def stop_server_manual(self):
+        with TRACER.trace("manual_stop", server=self.server_id) as tr:
+            ok, msg = self._stop_server_manual()
+            tr.set(ok=ok, message=msg)
+            return ok, msg
+
+    def _stop_server_manual(self):
         try:
-            stop_selectors = [
-                'button[data-action="stop"]',
-                'button.bg-red-600',
-                'button[class*="bg-red-600"]'
-            ]
-            stop_btn = None
-            for s in stop_selectors:
-                try:
-                    b = self.driver.find_element(By.CSS_SELECTOR, s)
-                    if b.is_displayed() and b.is_enabled():
-                        stop_btn = b
-                        break
-                except Exception:
-                    continue
-            if not stop_btn:
+            ok, how = self.actions.run('stop', lambda: self._on_browser(self._stop_server_job, priority=PRIORITY_MANUAL))
+            TRACER.annotate(flight=how)
+            if how == ActionCoordinator.JOINED:
+                return bool(ok), ("درخواست STOP در جریان بود و انجام شد." if ok else "دکمه STOP پیدا نشد.")
+            self._record_click('stop', 'manual', ok)
+            if not ok:
                 return False, "دکمه STOP پیدا نشد."
-            stop_btn.click()
+            self.verifier.cancel()
+            self.status['start_verification'] = self.verifier.summary()
             self.status['last_action'] = f"STOP manual @ {datetime.now().strftime('%H:%M:%S')}"
             self._save_status_to_file()
             return True, "درخواست خاموشی ارسال شد."
+        except FuturesTimeout:
+            return False, "مرورگر در زمان مقرر پاسخ نداد."
         except Exception as e:
             return False, f"خطا: {e}"
 
@@ -470,37 +1545,278 @@ class MinecraftServerManager:
         return True, f"بررسی خودکار {'فعال' if active else 'غیرفعال'} شد"
 
     def set_check_interval(self, min_minutes, max_minutes):
-        self.status['check_interval_minutes'] = random.uniform(min_minutes, max_minutes)
-        if self.status['auto_check_active']:
-            self._update_next_check_time()
+        # دیگر یک مقدار ثابت انتخاب نمی‌شود؛ بازه، سقف backoff و فاصلهٔ کلیک‌های زمان‌بند است
+        self.scheduler.set_bounds(min_minutes, max_minutes)
+        self.status['check_bounds_minutes'] = [min_minutes, max_minutes]
+        self._probe_requested.set()
         self._save_status_to_file()
         return True, f"فاصلهٔ بررسی: {min_minutes}-{max_minutes} دقیقه"
 
     def get_detailed_status(self):
-        curr = self._get_server_status()
-        self.status['status'] = curr
-        self.status['current_url'] = self.driver.current_url if self.driver else ''
-        self.status['start_button_available'] = self._check_button_exists('start')
-        self.status['stop_button_available'] = self._check_button_exists('stop')
-        return self.status
+        # بدون scrape؛ همان آخرین snapshot منتشرشده توسط مانیتور
+        return dict(self.get_snapshot().data)
+
+    def _quit_driver(self):
+        try:
+            if self.driver:
+                self.driver.quit()
+        except Exception:
+            pass
+        self.browser.set_driver(None)
 
     def close(self):
         self.auto_click_active = False
         self.monitoring_active = False
+        # مرورگر مشترک ناوگان را FleetManager می‌بندد
+        if self._owns_browser:
+            self.watchdog.stop()
+            try:
+                self.browser.call(self._quit_driver, priority=PRIORITY_MANUAL, timeout=30)
+            except Exception:
+                pass
+            self.browser.stop()
+        if self.http_probe:
+            self.http_probe.close()
+        self.history.close()
+
+
+class FleetManager:
+    """چند سرور MagmaNode با یک مرورگر مشترک (هر سرور یک تب) و یک زمان‌بند که سرورهای آف‌لاین را جلو می‌اندازد."""
+
+    # ترتیب رسیدگی: هرچه کوچک‌تر، فوری‌تر
+    URGENCY = {'offline': 0, 'unknown': 1, 'initializing': 1, 'starting': 2, 'running': 3}
+
+    def __init__(self, server_ids):
+        self.browser = BrowserWorker()
+        selectors = SelectorRegistry(START_BUTTON_LOCATORS, SELECTOR_STATS_FILE)
+        self.managers = {}
+        for sid in server_ids:
+            self.managers[sid] = MinecraftServerManager(
+                server_url=server_url_for(sid),
+                browser=self.browser,
+                selectors=selectors,
+                status_file=status_file_for(sid),
+                history_dir=os.path.join(HISTORY_DIR, sid),
+            )
+        self._next_probe = {sid: 0.0 for sid in self.managers}
+        self.watchdog = BrowserWatchdog(self.browser, list(self.managers.values()))
+        self.active = True
+
+    def _due(self, now):
+        due = [sid for sid, m in self.managers.items()
+               if now >= self._next_probe[sid] or m._probe_requested.is_set()]
+        return sorted(due, key=lambda sid: self.URGENCY.get(self.managers[sid].status['status'], 1))
+
+    def run(self):
+        logger.info(f"🚢 حالت ناوگان برای {len(self.managers)} سرور: {', '.join(self.managers)}")
+        for m in self.managers.values():
+            m.is_ready = True
+        while self.active:
+            now = time.monotonic()
+            for sid in self._due(now):
+                m = self.managers[sid]
+                with TRACER.trace("cycle", server=sid) as cycle:
+                    try:
+                        urgent = self.URGENCY.get(m.status['status'], 1) < self.URGENCY['starting']
+                        curr, delay = m.monitor_once(PRIORITY_PROBE_URGENT if urgent else PRIORITY_PROBE)
+                        cycle.set(status=curr, urgent=urgent)
+                        self._next_probe[sid] = time.monotonic() + delay
+                        if m._should_click(curr) and m.auto_click_once(curr):
+                            # پنجرهٔ بعد از کلیک: پروب بعدی با فاصلهٔ سریع
+                            cycle.set(clicked=True)
+                            self._next_probe[sid] = time.monotonic() + m.scheduler.next_delay(curr)
+                    except Exception as e:
+                        logger.error(f"❌ خطا در زمان‌بند ناوگان ({sid}): {e}")
+                        cycle.set(error=str(e))
+                        self._next_probe[sid] = time.monotonic() + 30
+            time.sleep(0.5)
+
+    def close(self):
+        self.active = False
+        self.watchdog.stop()
+        for m in self.managers.values():
+            m.close()
         try:
-            if self.driver:
-                self.driver.quit()
+            self.browser.call(lambda: self.browser.driver and self.browser.driver.quit(),
+                              priority=PRIORITY_MANUAL, timeout=30)
         except Exception:
             pass
+        self.browser.stop()
+
+
+class SharedStatusView:
+    """جای MinecraftServerManager در پردازه‌های وب: وضعیت از segment مشترک، اقدام‌ها از کانال کنترل مالک مرورگر"""
+
+    def __init__(self, server_id, base_dir, status_file=STATUS_FILE):
+        self.server_id = server_id
+        self.status_file = status_file
+        self.segment = StatusSegment(segment_path(base_dir, server_id))
+        self.address = control_address(base_dir)
+        self.history = SimpleNamespace(
+            query=lambda t_from, t_to, resolution: self._call('history', t_from=t_from, t_to=t_to,
+                                                               resolution=resolution))
+        self.start_selectors = SimpleNamespace(report=lambda: self._call('selectors'))
+
+    def _call(self, action, **args):
+        return control_call(self.address, action, self.server_id, **args)
+
+    def _action(self, action, **args):
+        try:
+            ok, msg = self._call(action, **args)
+            return ok, msg
+        except Exception as e:
+            return False, f"پردازهٔ مرورگر در دسترس نیست: {e}"
+
+    @property
+    def is_ready(self) -> bool:
+        return self.segment.read()[0] > 0 and self.segment.owner_alive()
+
+    def owner_info(self) -> dict:
+        pid, age = self.segment.owner()
+        return {'pid': pid or None, 'heartbeat_age_seconds': round(age, 1) if age is not None else None,
+                'alive': self.segment.owner_alive()}
+
+    @property
+    def status(self) -> dict:
+        return self.get_snapshot().data
+
+    @staticmethod
+    def _snapshot(raw) -> StatusSnapshot:
+        version, taken_at, data = raw
+        return StatusSnapshot(version, taken_at, data or {})
+
+    def get_snapshot(self) -> StatusSnapshot:
+        return self._snapshot(self.segment.read())
+
+    def wait_for_version(self, version: int, timeout: float) -> StatusSnapshot:
+        return self._snapshot(self.segment.wait_for(lambda s: s[0] > version, timeout))
+
+    def wait_for_snapshot(self, max_age: float, timeout: float = SNAPSHOT_WAIT_TIMEOUT) -> StatusSnapshot:
+        snap = self.get_snapshot()
+        requested_at = time.monotonic()
+        if snap.version and requested_at - snap.taken_at <= max_age:
+            return snap
+        # taken_at از time.monotonic مالک است که در همین ماشین با ساعت ما یکی است
+        self._call('probe')
+        return self._snapshot(self.segment.wait_for(lambda s: s[1] >= requested_at, timeout))
+
+    def start_server_manual(self):
+        return self._action('start')
+
+    def stop_server_manual(self):
+        return self._action('stop')
+
+    def toggle_auto_check(self, active: bool):
+        return self._action('toggle_auto_check', active=active)
+
+    def set_check_interval(self, min_minutes, max_minutes):
+        return self._action('set_check_interval', min_minutes=min_minutes, max_minutes=max_minutes)
+
+
+# اقدام‌هایی که پردازه‌های وب از مالک مرورگر می‌خواهند؛ (manager, args) → نتیجهٔ قابل pickle
+CONTROL_ACTIONS = {
+    'start': lambda m, a: m.start_server_manual(),
+    'stop': lambda m, a: m.stop_server_manual(),
+    'toggle_auto_check': lambda m, a: m.toggle_auto_check(bool(a.get('active', True))),
+    'set_check_interval': lambda m, a: m.set_check_interval(a['min_minutes'], a['max_minutes']),
+    'probe': lambda m, a: m._probe_requested.set(),
+    'history': lambda m, a: m.history.query(a['t_from'], a['t_to'], a['resolution']),
+    'selectors': lambda m, a: m.start_selectors.report(),
+}
+# اطلاعات سراسری پردازهٔ مالک (بدون سرور)
+CONTROL_INFO = {
+    'metrics': lambda: METRICS.render(),
+    'readiness': lambda: readiness.STATS.info(),
+    'startup': lambda: STARTUP.info(),
+    'traces': lambda: TRACER.recent(TRACE_RING_SIZE),
+}
+
+
+def _handle_control(action, server_id, args):
+    if action in CONTROL_INFO:
+        return CONTROL_INFO[action]()
+    if action not in CONTROL_ACTIONS:
+        raise ValueError(f"اقدام ناشناخته: {action}")
+    manager = fleet.managers.get(str(server_id)) if (fleet and server_id is not None) else server_manager
+    if manager is None or not manager.is_ready:
+        raise RuntimeError("سیستم هنوز آماده نشده است")
+    return CONTROL_ACTIONS[action](manager, args)
+
+
+def open_segments(server_ids, base_dir) -> dict:
+    """segmentها قبل از راه‌اندازی Chrome ساخته می‌شوند تا ضربان مالک از همان ابتدا دیده شود"""
+    ensure_private_dir(base_dir)
+    segments = {str(sid): StatusSegment(segment_path(base_dir, sid), create=True) for sid in server_ids}
+    OwnerHeartbeat(segments.values())
+    return segments
+
+
+def share_status(managers, segments, base_dir):
+    """segmentها را به مدیرها وصل می‌کند و سوکت کنترل (با کلید تازهٔ این اجرا) را می‌سازد
+    تا پردازه‌های وب بدون مرورگر سرویس بدهند"""
+    for m in managers:
+        seg = segments.get(str(m.server_id))
+        if seg is None:
+            seg = segments[str(m.server_id)] = StatusSegment(segment_path(base_dir, m.server_id), create=True)
+            seg.beat()
+        snap = m.get_snapshot()
+        if snap.version:
+            seg.publish(*snap)
+        m.segment = seg
+    server = ControlServer(control_address(base_dir), _handle_control, new_authkey(base_dir))
+    logger.info(f"🧩 وضعیت مشترک در {base_dir} ({len(managers)} segment)")
+    return server
 
 
 server_manager = None
+fleet = None
+# standalone: مدیر در همین پردازه | worker: فقط segment و کانال کنترل | owner: مالک مرورگر بدون HTTP
+APP_ROLE = "standalone"
+_shared_dir = SHARED_STATUS_DIR
+
+
+def _all_managers():
+    if fleet is not None:
+        return list(fleet.managers.values())
+    return [server_manager] if server_manager else []
+
+
+def _driver_age():
+    # در نقش worker جای مدیر یک SharedStatusView است که مرورگر/نگهبان ندارد
+    browser = getattr(server_manager, 'browser', None)
+    if browser is None or browser.driver_started is None:
+        return 0
+    return round(time.monotonic() - browser.driver_started, 3)
+
 
+def _browser_memory():
+    watchdog = getattr(fleet or server_manager, 'watchdog', None)
+    return watchdog.memory_bytes if watchdog is not None else None
 
-def load_status_from_file():
+
+def _browser_queue_depth():
+    browser = getattr(server_manager, 'browser', None)
+    return browser.pending() if browser is not None else None
+
+
+METRICS.gauge("mc_uptime_seconds", "Seconds since the manager process started.",
+              fn=lambda: round(time.monotonic() - PROCESS_START, 3))
+METRICS.gauge("mc_driver_age_seconds", "Seconds since the current Chrome driver was launched (0 if none).",
+              fn=_driver_age)
+METRICS.gauge("mc_browser_memory_bytes", "PSS (or RSS) of the chromedriver/Chromium process tree.",
+              fn=_browser_memory)
+METRICS.gauge("mc_browser_queue_depth", "Commands waiting in the browser worker queue.",
+              fn=_browser_queue_depth)
+METRICS.gauge("mc_readiness_saved_seconds", "Wall-clock saved versus the old fixed sleeps, per wait point.", ["label"],
+              fn=readiness.STATS.saved_by_label)
+METRICS.gauge("mc_server_up", "1 when the last probe saw the server running.", ["server"],
+              fn=lambda: {m.server_id: int(m.status['status'] == 'running') for m in _all_managers()})
+
+
+def load_status_from_file(path=STATUS_FILE):
     try:
-        if os.path.exists(STATUS_FILE):
-            with open(STATUS_FILE, 'r', encoding='utf-8') as f:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
                 return json.load(f)
     except Exception:
         pass
@@ -522,89 +1838,358 @@ def load_status_from_file():
     }
 
 
+def _snapshot_payload(snap):
+    data = dict(snap.data)
+    data['snapshot_version'] = snap.version
+    data['snapshot_age'] = round(time.monotonic() - snap.taken_at, 3)
+    return data
+
+
+def _request_server_id():
+    sid = request.args.get("server")
+    if sid is None and request.is_json:
+        sid = (request.get_json(silent=True) or {}).get("server")
+    return sid
+
+
+def target_manager():
+    """مدیر سروری که درخواست به آن اشاره دارد (?server= یا فیلد server در JSON)"""
+    if fleet is None:
+        return server_manager
+    sid = _request_server_id()
+    if sid is None:
+        return server_manager
+    return fleet.managers.get(str(sid))
+
+
+def current_status(max_age=None, manager=None):
+    """وضعیت برای هندلرها: snapshot مانیتور، یا فایل ذخیره‌شده تا وقتی snapshotی منتشر نشده."""
+    manager = manager or server_manager
+    if manager and manager.is_ready:
+        if max_age is not None:
+            snap = manager.wait_for_snapshot(max_age)
+        else:
+            snap = manager.get_snapshot()
+        if snap.version:
+            return _snapshot_payload(snap)
+    # هنوز اولین پروب انجام نشده (مثلاً بلافاصله بعد از bind پورت): آخرین وضعیت ذخیره‌شده
+    data = load_status_from_file(manager.status_file if manager else status_file_for())
+    data['stale'] = True
+    return data
+
+
 @app.route("/")
 def dashboard():
-    status = load_status_from_file()
-    return render_template("dashboard.html", status=status)
+    manager = target_manager() or server_manager
+    status = current_status(manager=manager)
+    servers = list(fleet.managers) if fleet else []
+    return render_template("dashboard.html", status=status, servers=servers,
+                           server_id=manager.server_id if (fleet and manager) else None)
 
 
 @app.route("/api/status")
 def api_status():
-    if server_manager and server_manager.is_ready:
-        status = server_manager.get_detailed_status()
-        server_manager._save_status_to_file()
-    else:
-        status = load_status_from_file()
-    return jsonify(status)
+    max_age = request.args.get("max_age", type=float)
+    if APP_ROLE == "worker" and not server_manager.segment.owner_alive():
+        # health check همین مسیر است: snapshot یخ‌زدهٔ مالک مرده نباید 200 بگیرد (یک مالک برای همهٔ سرورها)
+        return jsonify({'success': False, 'message': 'پردازهٔ مالک مرورگر پاسخ نمی‌دهد',
+                        'owner': server_manager.owner_info(), 'stale': True}), 503
+    # در حالت ناوگان بدون ?server= وضعیت همهٔ سرورها کلیددار برمی‌گردد
+    if fleet is not None and _request_server_id() is None:
+        return jsonify({'servers': {sid: current_status(max_age, m) for sid, m in fleet.managers.items()}})
+    manager = target_manager()
+    if fleet is not None and manager is None:
+        return jsonify({'success': False, 'message': 'سرور ناشناخته'}), 404
+    return jsonify(current_status(max_age, manager))
+
+
+def _sse(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
+
+
+def status_events(heartbeat=SSE_HEARTBEAT_SECONDS, server_id=None):
+    """جریان SSE: اول وضعیت کامل، بعد فقط فیلدهای تغییرکرده؛ بدون هیچ پروب اضافه"""
+    yield "retry: 5000\n\n"
+    # تا آماده شدن مدیر، همان وضعیت ذخیره‌شده
+    while True:
+        manager = fleet.managers.get(server_id) if (fleet and server_id) else server_manager
+        if manager and manager.is_ready:
+            break
+        # فایل همین سرور؛ ناوگان ممکن است هنوز ساخته نشده باشد
+        yield _sse(load_status_from_file(manager.status_file if manager else status_file_for(server_id)))
+        time.sleep(heartbeat)
+
+    snap = manager.get_snapshot()
+    sent = dict(snap.data)
+    yield _sse(_snapshot_payload(snap), event_id=snap.version)
+    version = snap.version
+    while True:
+        snap = manager.wait_for_version(version, heartbeat)
+        clock = {k: snap.data.get(k) for k in STREAM_CLOCK_KEYS}
+        if snap.version == version:
+            yield _sse(clock, event="heartbeat")
+            continue
+        version = snap.version
+        delta = {k: snap.data.get(k) for k in STREAM_KEYS if sent.get(k) != snap.data.get(k)}
+        if delta:
+            sent.update(delta)
+            delta.update(clock)
+            yield _sse(delta, event_id=version)
+
+
+@app.route("/api/events")
+def api_events():
+    return Response(
+        stream_with_context(status_events(server_id=_request_server_id())),
+        mimetype="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+def _parse_time_arg(raw, default: float) -> float:
+    """epoch ثانیه یا ISO-8601"""
+    if raw in (None, ""):
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return datetime.fromisoformat(raw).timestamp()
+
+
+@app.route("/api/history")
+def api_history():
+    manager = target_manager()
+    if not manager:
+        return jsonify({'success': False, 'message': 'سیستم هنوز آماده نشده است'})
+    try:
+        now = time.time()
+        t_to = _parse_time_arg(request.args.get("to"), now)
+        t_from = _parse_time_arg(request.args.get("from"), t_to - 3600)
+        resolution = float(request.args.get("resolution") or 60)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'پارامتر نامعتبر: {e}'}), 400
+    if t_from >= t_to:
+        return jsonify({'success': False, 'message': 'from باید قبل از to باشد'}), 400
+    # سقف تعداد نقاط سری
+    resolution = max(resolution, (t_to - t_from) / 2000)
+    data = manager.history.query(t_from, t_to, resolution)
+    data['success'] = True
+    return jsonify(data)
+
+
+def _owner_info(name):
+    """در پردازهٔ وب، اطلاعات از مالک مرورگر؛ اگر در دسترس نبود، مقدار محلی همین پردازه"""
+    if APP_ROLE == "worker":
+        try:
+            return control_call(control_address(_shared_dir), name, timeout=5)
+        except Exception as e:
+            logger.debug(f"control {name}: {e}")
+    return CONTROL_INFO[name]()
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(_owner_info('metrics'), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route("/api/readiness")
+def api_readiness():
+    return jsonify({'success': True, **_owner_info('readiness')})
+
+
+@app.after_request
+def _note_first_response(response):
+    if response.status_code < 400:
+        STARTUP.responded()
+    return response
+
+
+@app.route("/api/startup")
+def api_startup():
+    managers = _all_managers()
+    data = {'success': True, 'role': APP_ROLE, 'ready': bool(managers) and all(m.is_ready for m in managers),
+            **STARTUP.info()}
+    if APP_ROLE == "worker":
+        # مراحل مرورگر (driver_launch، first_probe، ...) در پردازهٔ مالک ثبت می‌شوند
+        data['owner'] = _owner_info('startup')
+    return jsonify(data)
+
+
+@app.route("/api/trace")
+def api_trace():
+    """آخرین traceها (پیش‌فرض 20)؛ ?name=cycle|manual_start|... و ?format=text برای waterfall متنی"""
+    last = max(0, min(request.args.get("last", 20, type=int), TRACE_RING_SIZE))
+    name = request.args.get("name")
+    traces = _owner_info('traces')
+    server = _request_server_id()
+    if name:
+        traces = [t for t in traces if t["name"] == name]
+    if server:
+        traces = [t for t in traces if str(t["attrs"].get("server")) == str(server)]
+    traces = traces[-last:] if last else []
+    if request.args.get("format") == "text":
+        return Response("\n\n".join(waterfall(t) for t in traces) + "\n", mimetype="text/plain; charset=utf-8")
+    return jsonify({'success': True, 'traces': traces})
+
+
+@app.route("/api/selectors")
+def api_selectors():
+    manager = target_manager()
+    if not manager:
+        return jsonify({'success': False, 'message': 'سیستم هنوز آماده نشده است'})
+    return jsonify({'success': True, 'start': manager.start_selectors.report()})
 
 
 @app.route("/api/start", methods=["POST"])
 def api_start():
-    if not server_manager or not server_manager.is_ready:
+    manager = target_manager()
+    if not manager or not manager.is_ready:
         return jsonify({'success': False, 'message': 'سیستم هنوز آماده نشده است'})
-    ok, msg = server_manager.start_server_manual()
+    ok, msg = manager.start_server_manual()
     return jsonify({'success': ok, 'message': msg})
 
 
 @app.route("/api/stop", methods=["POST"])
 def api_stop():
-    if not server_manager or not server_manager.is_ready:
+    manager = target_manager()
+    if not manager or not manager.is_ready:
         return jsonify({'success': False, 'message': 'سیستم هنوز آماده نشده است'})
-    ok, msg = server_manager.stop_server_manual()
+    ok, msg = manager.stop_server_manual()
     return jsonify({'success': ok, 'message': msg})
 
 
 @app.route("/api/toggle_auto_check", methods=["POST"])
 def api_toggle():
-    if not server_manager or not server_manager.is_ready:
+    manager = target_manager()
+    if not manager or not manager.is_ready:
         return jsonify({'success': False, 'message': 'سیستم هنوز آماده نشده است'})
     data = request.json or {}
     active = bool(data.get("active", True))
-    ok, msg = server_manager.toggle_auto_check(active)
+    ok, msg = manager.toggle_auto_check(active)
     return jsonify({'success': ok, 'message': msg})
 
 
 @app.route("/api/set_check_interval", methods=["POST"])
 def api_set_interval():
-    if not server_manager or not server_manager.is_ready:
+    manager = target_manager()
+    if not manager or not manager.is_ready:
         return jsonify({'success': False, 'message': 'سیستم هنوز آماده نشده است'})
     data = request.json or {}
     min_m = int(data.get("min", CHECK_MIN_MINUTES))
     max_m = int(data.get("max", CHECK_MAX_MINUTES))
-    ok, msg = server_manager.set_check_interval(min_m, max_m)
+    ok, msg = manager.set_check_interval(min_m, max_m)
     return jsonify({'success': ok, 'message': msg})
 
 
 @app.route("/api/force_check", methods=["POST"])
 def api_force():
-    if not server_manager or not server_manager.is_ready:
+    manager = target_manager()
+    if not manager or not manager.is_ready:
         return jsonify({'success': False, 'message': 'سیستم هنوز آماده نشده است'})
     try:
-        status = server_manager.get_detailed_status()
-        server_manager._save_status_to_file()
-        return jsonify({'success': True, 'status': status, 'message': 'بررسی انجام شد'})
+        requested_at = time.monotonic()
+        snap = manager.wait_for_snapshot(0)
+        if snap.taken_at < requested_at:
+            return jsonify({'success': False, 'status': _snapshot_payload(snap),
+                            'message': 'پروب تازه در زمان مقرر انجام نشد'})
+        return jsonify({'success': True, 'status': _snapshot_payload(snap), 'message': 'بررسی انجام شد'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'خطا: {e}'}), 500
 
 
-def run_server_manager():
-    global server_manager
+def run_server_manager(share_dir=None):
+    global server_manager, fleet
     try:
+        segments = open_segments(SERVER_IDS or [server_id_from_url(MAGMA_SERVER_URL)], share_dir) \
+            if share_dir else None
+        if SERVER_IDS:
+            fleet = FleetManager(SERVER_IDS)
+            server_manager = fleet.managers[SERVER_IDS[0]]
+            if share_dir:
+                share_status(list(fleet.managers.values()), segments, share_dir)
+            fleet.run()
+            return
         server_manager = MinecraftServerManager()
+        if share_dir:
+            share_status([server_manager], segments, share_dir)
         # 🔁 دیگر حتی اگر یک بار navigate خطا دهد، run_auto_clicker خودش retry می‌کند و خارج نمی‌شود
         server_manager.run_auto_clicker(url=MAGMA_SERVER_URL, max_clicks=None)
     except Exception as e:
         logger.error(f"❌ خطا در اجرای مدیر: {e}")
 
 
+def create_app(role="standalone", shared_dir=None):
+    """app برای سرور WSGI. role=worker: بدون مرورگر، از segmentهای پردازهٔ مالک می‌خواند
+    (مثلاً چند پردازه با factory «minecraft_manager:create_app('worker')»)."""
+    global APP_ROLE, _shared_dir, server_manager, fleet
+    APP_ROLE = role
+    _shared_dir = shared_dir or _shared_dir
+    if role == "worker":
+        if not _shared_dir:
+            raise ValueError("حالت worker به SHARED_STATUS_DIR نیاز دارد")
+        if SERVER_IDS:
+            views = {sid: SharedStatusView(sid, _shared_dir, status_file_for(sid)) for sid in SERVER_IDS}
+            fleet = SimpleNamespace(managers=views)
+            server_manager = views[SERVER_IDS[0]]
+        else:
+            server_manager = SharedStatusView(server_id_from_url(MAGMA_SERVER_URL), _shared_dir)
+    return app
+
+
+def run_owner(shared_dir):
+    """پردازهٔ مالک مرورگر: مدیر/ناوگان + segmentها + کانال کنترل، بدون HTTP"""
+    create_app("owner", shared_dir)
+    try:
+        run_server_manager(shared_dir)
+    finally:
+        owner = fleet or server_manager
+        if owner:
+            owner.close()
+
+
+def _exit_on_sigterm(signum, frame):
+    # SystemExit تا atexit پردازه‌های فرزند (daemon) را هم ببندد
+    sys.exit(0)
+
+
 def main():
+    STARTUP.mark("imports")
     logger.info("🚀 راه‌اندازی سیستم مدیریت سرور (Render)")
-    # ترد بک‌گراند برای کلیکر
-    t = threading.Thread(target=run_server_manager, daemon=True)
-    t.start()
-    # وب‌سرور
+    # اول پورت: health check پلتفرم نباید منتظر Chrome بماند
     port = int(os.environ.get("PORT", "5000"))
-    app.run(debug=False, host="0.0.0.0", port=port)
+    if WEB_WORKERS > 1:
+        serve_multiprocess(port, WEB_WORKERS)
+        return
+    t = time.monotonic()
+    srv = make_server("0.0.0.0", port, app, threaded=True)
+    STARTUP.mark("bind", since=t)
+    logger.info(f"🌐 پورت {port} باز شد؛ {STARTUP.info()['uptime_ms']:.0f}ms پس از شروع پردازه")
+    # ترد بک‌گراند برای کلیکر (با SHARED_STATUS_DIR، پردازه‌های WSGI دیگر هم می‌توانند از آن بخوانند)
+    threading.Thread(target=run_server_manager, args=(SHARED_STATUS_DIR or None,), daemon=True).start()
+    srv.serve_forever()
+
+
+def serve_multiprocess(port, workers):
+    """یک پردازهٔ مالک مرورگر و workers پردازهٔ وب روی یک سوکت شنونده (prefork)"""
+    shared_dir = SHARED_STATUS_DIR or os.path.abspath("shared_status")
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    # fork قبل از هر تردی؛ مالک سوکت HTTP را به ارث نمی‌برد
+    ctx = multiprocessing.get_context("fork")
+    ctx.Process(target=run_owner, args=(shared_dir,), name="browser-owner", daemon=True).start()
+    create_app("worker", shared_dir)
+    t = time.monotonic()
+    srv = make_server("0.0.0.0", port, app, threaded=True)
+    STARTUP.mark("bind", since=t)
+    for i in range(workers - 1):
+        ctx.Process(target=srv.serve_forever, name=f"web-{i + 1}", daemon=True).start()
+    logger.info(f"🌐 پورت {port} باز شد؛ {workers} پردازهٔ وب + مالک مرورگر ({shared_dir})")
+    srv.serve_forever()
 
 
 if __name__ == "__main__":
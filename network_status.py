@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger("network_status")
+
+# وضعیت سرور از روی ترافیک خود پنل (perf log کروم): فریم‌های WebSocket و پاسخ‌های JSON درخواست‌های XHR/fetch
+NETWORK_STATUS_ENABLED = os.environ.get("NETWORK_STATUS", "1").strip().lower() not in ("0", "false", "off", "no")
+# فقط بدنهٔ پاسخ XHR/fetch هایی که URL شان یکی از این‌ها را دارد خوانده می‌شود (هر کدام یک دستور CDP)
+URL_PATTERNS = [p.strip().lower() for p in
+                os.environ.get("NETWORK_STATUS_URL_PATTERNS", "status,server,resources,stats").split(",") if p.strip()]
+MAX_BODY_BYTES = 256 * 1024
+
+# مقادیر رایج در API پنل‌ها → وضعیت‌های classify_status
+STATE_WORDS = {
+    "running": "running", "online": "running", "started": "running",
+    "offline": "offline", "stopped": "offline",
+    "starting": "starting", "booting": "starting", "installing": "starting",
+}
+STATE_KEYS = ("status", "state", "server_status", "serverstatus", "current_state", "power_state")
+
+
+def _state_word(value):
+    if isinstance(value, str):
+        return STATE_WORDS.get(value.strip().lower())
+    return None
+
+
+def extract_status(obj, depth=0):
+    """وضعیت را از یک پیام JSON پیدا می‌کند: {"event":"status","args":["running"]} یا کلیدهایی مثل status/state"""
+    if depth > 6:
+        return None
+    if isinstance(obj, dict):
+        # قالب websocket پنل‌های Pterodactyl-مانند
+        if str(obj.get("event", "")).lower() == "status":
+            args = obj.get("args") or []
+            found = _state_word(args[0] if isinstance(args, list) and args else args)
+            if found:
+                return found
+        for key, value in obj.items():
+            if key.lower() in STATE_KEYS:
+                found = _state_word(value)
+                if found:
+                    return found
+        for value in obj.values():
+            if isinstance(value, (dict, list)):
+                found = extract_status(value, depth + 1)
+                if found:
+                    return found
+    elif isinstance(obj, list):
+        for value in obj[:50]:
+            found = extract_status(value, depth + 1)
+            if found:
+                return found
+    return None
+
+
+def extract_status_text(text):
+    if not text:
+        return None
+    text = text.strip()
+    if not text or text[0] not in "[{":
+        return None
+    try:
+        return extract_status(json.loads(text))
+    except ValueError:
+        return None
+
+
+class NetworkStatusSource:
+    """پیام‌های perf log را مصرف می‌کند و آخرین وضعیتی را که پنل از شبکه گرفته نگه می‌دارد"""
+
+    def __init__(self, url_patterns=None):
+        self.url_patterns = URL_PATTERNS if url_patterns is None else url_patterns
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.status = None
+        self.updated_at = 0.0
+        self.source = None
+        self.stats = {"frames": 0, "bodies": 0, "hits": 0}
+
+    def _matches(self, url: str) -> bool:
+        url = (url or "").lower()
+        return any(p in url for p in self.url_patterns)
+
+    def _set(self, status, source):
+        with self._lock:
+            if status != self.status:
+                logger.debug(f"network status: {self.status} → {status} ({source})")
+            self.status, self.source, self.updated_at = status, source, time.monotonic()
+            self.stats["hits"] += 1
+
+    def feed(self, driver, messages):
+        """messages: خروجی block_profile.read_perf_messages؛ برای پاسخ‌های مرتبط بدنه با Network.getResponseBody خوانده می‌شود"""
+        for msg in messages:
+            method = msg.get("method")
+            params = msg.get("params", {})
+            if method == "Network.webSocketFrameReceived":
+                self.stats["frames"] += 1
+                found = extract_status_text(params.get("response", {}).get("payloadData"))
+                if found:
+                    self._set(found, "websocket")
+            elif method == "Network.responseReceived":
+                res = params.get("response", {})
+                if params.get("type") in ("XHR", "Fetch") and "json" in (res.get("mimeType") or "") \
+                        and self._matches(res.get("url")):
+                    self._pending[params.get("requestId")] = res.get("url")
+            elif method == "Network.loadingFinished":
+                url = self._pending.pop(params.get("requestId"), None)
+                if url is None or (params.get("encodedDataLength") or 0) > MAX_BODY_BYTES:
+                    continue
+                try:
+                    body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": params["requestId"]})
+                except Exception as e:
+                    logger.debug(f"Network.getResponseBody error: {e}")
+                    continue
+                self.stats["bodies"] += 1
+                if not body.get("base64Encoded"):
+                    found = extract_status_text(body.get("body"))
+                    if found:
+                        self._set(found, "xhr")
+            elif method == "Network.loadingFailed":
+                self._pending.pop(params.get("requestId"), None)
+        # درخواست‌هایی که پایانشان هرگز نرسید انباشته نشوند
+        if len(self._pending) > 200:
+            self._pending.clear()
+
+    def current(self, max_age: float):
+        """آخرین وضعیت شبکه اگر از max_age ثانیه تازه‌تر باشد، وگرنه None"""
+        with self._lock:
+            if self.status and time.monotonic() - self.updated_at <= max_age:
+                return self.status
+            return None
+
+    def reset(self):
+        """بعد از تعویض درایور/ناوبری تازه، وضعیت قدیمی معتبر نیست"""
+        with self._lock:
+            self._pending.clear()
+            self.status, self.source, self.updated_at = None, None, 0.0
+
+    def info(self) -> dict:
+        with self._lock:
+            age = round(time.monotonic() - self.updated_at, 1) if self.status else None
+            return {"status": self.status, "source": self.source, "age_seconds": age, **self.stats}
@@ -0,0 +1,56 @@
+import os
+
+# حافظهٔ درخت پردازه‌ها (chromedriver + همهٔ پردازه‌های Chromium) از روی /proc؛ فقط لینوکس
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _ppid(pid: int):
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            data = f.read()
+        # نام پردازه می‌تواند فاصله و پرانتز داشته باشد؛ بعد از آخرین ')' فیلدها ثابت‌اند
+        return int(data[data.rindex(")") + 2:].split()[1])
+    except Exception:
+        return None
+
+
+def process_tree(root: int) -> list:
+    """root و همهٔ نوادگانش"""
+    children = {}
+    try:
+        names = os.listdir("/proc")
+    except Exception:
+        return [root]
+    for name in names:
+        if name.isdigit():
+            pp = _ppid(int(name))
+            if pp is not None:
+                children.setdefault(pp, []).append(int(name))
+    out, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        out.append(pid)
+        stack.extend(children.get(pid, ()))
+    return out
+
+
+def process_memory(pid: int) -> int:
+    """PSS (سهم واقعی از صفحات مشترک) اگر در دسترس باشد، وگرنه RSS؛ بایت"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except Exception:
+        return 0
+
+
+def tree_memory(root: int):
+    """(مجموع حافظه به بایت، تعداد پردازه‌ها)"""
+    pids = process_tree(root)
+    return sum(process_memory(p) for p in pids), len(pids)
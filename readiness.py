@@ -0,0 +1,138 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger("readiness")
+
+# به‌جای sleep ثابت، تا برقرار شدن یک شرط مشخص (با سقف زمانی) صبر می‌کنیم.
+# baseline همان sleep قدیمی است؛ اختلافش با زمان واقعی «زمان صرفه‌جویی‌شده» است.
+
+DOCUMENT_READY_SCRIPT = "return document.readyState !== 'loading';"
+
+# صفحه آماده است اگر المنت وضعیت متن داشته باشد یا یکی از دکمه‌ها رندر شده باشد (یا به login رفته باشیم)
+PAGE_READY_SCRIPT = r"""
+const statusSelectors = arguments[0], buttonSelectors = arguments[1];
+if (document.readyState === 'loading') return false;
+if (location.href.toLowerCase().indexOf('/login') !== -1) return true;
+for (const s of statusSelectors) {
+  const el = document.querySelector(s);
+  if (el && (el.textContent || '').trim()) return true;
+}
+for (const s of buttonSelectors) {
+  if (document.querySelector(s)) return true;
+}
+return false;
+"""
+
+# میلی‌ثانیه از پایان آخرین درخواست شبکهٔ صفحه
+NETWORK_QUIET_SCRIPT = r"""
+const entries = performance.getEntriesByType('resource');
+let last = 0;
+for (const e of entries) { if (e.responseEnd > last) last = e.responseEnd; }
+return performance.now() - last;
+"""
+
+# MutationObserver روی المنت وضعیت؛ هر تغییر متن در window.__mcStatusWatch ثبت می‌شود
+STATUS_OBSERVER_SCRIPT = r"""
+const statusSelectors = arguments[0];
+let el = null;
+for (const s of statusSelectors) { el = document.querySelector(s); if (el) break; }
+const w = window.__mcStatusWatch = {text: el ? (el.textContent || '').trim() : null, mutations: 0};
+if (window.__mcStatusObserver) window.__mcStatusObserver.disconnect();
+if (!el) return null;
+window.__mcStatusObserver = new MutationObserver(() => {
+  w.mutations += 1;
+  w.text = (el.textContent || '').trim();
+});
+window.__mcStatusObserver.observe(el, {childList: true, characterData: true, subtree: true, attributes: true});
+return w.text;
+"""
+
+STATUS_WATCH_SCRIPT = "return window.__mcStatusWatch || null;"
+
+
+class ReadinessStats:
+    """برای هر برچسب انتظار: تعداد، timeoutها، میانگین زمان و زمان صرفه‌جویی‌شده نسبت به sleep قدیمی"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels = {}
+
+    def record(self, label, elapsed, baseline, ok):
+        with self._lock:
+            st = self._labels.setdefault(label, {"count": 0, "timeouts": 0, "elapsed_sum": 0.0,
+                                                 "saved_sum": 0.0, "baseline": baseline})
+            st["count"] += 1
+            st["timeouts"] += 0 if ok else 1
+            st["elapsed_sum"] += elapsed
+            st["saved_sum"] += baseline - elapsed
+            st["baseline"] = baseline
+            st["last_elapsed"] = round(elapsed, 3)
+            st["last_saved"] = round(baseline - elapsed, 3)
+
+    def saved_by_label(self) -> dict:
+        with self._lock:
+            return {k: round(v["saved_sum"], 3) for k, v in self._labels.items()}
+
+    def info(self) -> dict:
+        with self._lock:
+            labels = {
+                k: {"count": v["count"], "timeouts": v["timeouts"], "baseline_s": v["baseline"],
+                    "avg_elapsed_s": round(v["elapsed_sum"] / v["count"], 3),
+                    "avg_saved_s": round(v["saved_sum"] / v["count"], 3),
+                    "saved_total_s": round(v["saved_sum"], 3),
+                    "last_elapsed_s": v["last_elapsed"], "last_saved_s": v["last_saved"]}
+                for k, v in self._labels.items()
+            }
+        return {"labels": labels, "saved_total_s": round(sum(v["saved_total_s"] for v in labels.values()), 3)}
+
+
+STATS = ReadinessStats()
+
+
+def wait_for(label, condition, timeout, baseline=None, poll=0.2):
+    """condition را تا برقرار شدن یا پایان timeout صدا می‌زند؛ خطای condition یعنی «هنوز نه»."""
+    baseline = timeout if baseline is None else baseline
+    t0 = time.monotonic()
+    deadline = t0 + timeout
+    ok = False
+    while True:
+        try:
+            ok = bool(condition())
+        except Exception as e:
+            logger.debug(f"readiness {label}: {e}")
+            ok = False
+        if ok or time.monotonic() >= deadline:
+            break
+        time.sleep(min(poll, max(0.0, deadline - time.monotonic())))
+    elapsed = time.monotonic() - t0
+    STATS.record(label, elapsed, baseline, ok)
+    if not ok:
+        logger.debug(f"⏱️ readiness {label}: بعد از {elapsed:.1f}s برقرار نشد")
+    return ok
+
+
+def document_ready(driver) -> bool:
+    return bool(driver.execute_script(DOCUMENT_READY_SCRIPT))
+
+
+def page_ready(driver, status_selectors, button_selectors) -> bool:
+    return bool(driver.execute_script(PAGE_READY_SCRIPT, list(status_selectors), list(button_selectors)))
+
+
+def network_quiet(driver, quiet_ms=500) -> bool:
+    return (driver.execute_script(NETWORK_QUIET_SCRIPT) or 0) >= quiet_ms
+
+
+def watch_status(driver, status_selectors):
+    """observer را نصب می‌کند و متن فعلی وضعیت را برمی‌گرداند"""
+    return driver.execute_script(STATUS_OBSERVER_SCRIPT, list(status_selectors))
+
+
+def status_mutated(driver, status_selectors, before) -> bool:
+    """آیا متن وضعیت نسبت به before عوض شده؟ اگر صفحه بعد از کلیک دوباره لود شده باشد observer از نو نصب می‌شود"""
+    w = driver.execute_script(STATUS_WATCH_SCRIPT)
+    if not w:
+        current = watch_status(driver, status_selectors)
+        return current is not None and current != before
+    return w.get("mutations", 0) > 0 and (w.get("text") or None) != before
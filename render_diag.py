@@ -7,13 +7,16 @@ try:
 except Exception:
     requests = None
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+import block_profile
+import readiness
+import driver_engine
+from session_store import SessionStore
+from tracing import Tracer, waterfall
+
 APP = Flask("render_diag")
 
 # ===== تنظیمات =====
@@ -23,29 +26,29 @@ UA = os.getenv("MAGMANODE_USER_AGENT",
 PROXY_URL = os.getenv("PROXY_URL", "").strip()
 COOKIE_FILE = os.getenv("MAGMANODE_COOKIES_FILE", "/tmp/magma_cookies.json")
 ENV_COOKIES = os.getenv("MAGMANODE_COOKIES_JSON", "").strip()
-CHROME_BIN = "/usr/bin/chromium"
-CHROME_DRV = "/usr/bin/chromedriver"
+# پروفایل راه‌اندازی driver_engine؛ diagnostics همیشه perf log دارد (برای بخش network خروجی)
+DIAG_DRIVER_PROFILE = os.getenv("DIAG_DRIVER_PROFILE", "diagnostics")
+DIAG_STATUS_SELECTORS = ['span[data-server-status]', '.server-status', '.status-indicator']
+DIAG_BUTTON_SELECTORS = ['button[data-action="start"]', 'button[data-action="stop"]']
+# استخر مرورگرهای گرم
+POOL_SIZE = max(1, int(os.getenv("DIAG_POOL_SIZE", "1")))
+POOL_MAX_USES = int(os.getenv("DIAG_POOL_MAX_USES", "20"))
+POOL_IDLE_SECONDS = int(os.getenv("DIAG_POOL_IDLE_SECONDS", "900"))
+POOL_LEASE_TIMEOUT = int(os.getenv("DIAG_POOL_LEASE_TIMEOUT", "90"))
+# هر اجرای click_once یک trace در فایل جدا از مدیر اصلی
+TRACER = Tracer(os.getenv("DIAG_TRACE_FILE", "/tmp/diag_traces.jsonl"))
 
 # وضعیت زمان‌بندی
 _schedule = {"at": None, "action": None, "armed": False}
 _last_run = {"when": None, "result": None}
 _stop_keepalive = threading.Event()
 
+# کوکی‌ها: اول فایل (که کوکی‌های چرخیده هم در آن بازنویسی می‌شوند)، بعد ENV
+_session = SessionStore(COOKIE_FILE, ENV_COOKIES)
+
 # ===== ابزار =====
 def _load_cookies():
-    # اول از فایل، بعد از ENV
-    if os.path.exists(COOKIE_FILE):
-        try:
-            with open(COOKIE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, list) and data:
-                return data
-        except Exception:
-            pass
-    try:
-        return json.loads(ENV_COOKIES) if ENV_COOKIES else []
-    except Exception:
-        return []
+    return _session.load()
 
 def _to_selenium_cookie(c):
     return {
@@ -60,8 +63,9 @@ def _to_selenium_cookie(c):
 def _read_perf_log(driver):
     out = []
     try:
-        for entry in driver.get_log("performance"):
-            msg = json.loads(entry["message"])["message"]
+        messages = block_profile.read_perf_messages(driver)
+        block_profile.STATS.record(messages)
+        for msg in messages:
             method = msg.get("method", "")
             params = msg.get("params", {})
             if method == "Network.requestWillBeSent":
@@ -70,50 +74,27 @@ def _read_perf_log(driver):
             elif method == "Network.responseReceived":
                 res = params.get("response", {})
                 out.append(f"- RES {int(res.get('status', -1))} {res.get('url','')}")
+            elif method == "Network.loadingFailed" and params.get("blockedReason"):
+                out.append(f"- BLK {params.get('type', 'Other')} {params.get('blockedReason')}")
     except Exception:
         pass
     return out
 
-@contextmanager
-def make_driver():
-    opts = Options()
-    opts.binary_location = CHROME_BIN
-    opts.add_argument("--headless=new")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--window-size=1366,768")
-    opts.add_argument(f"--user-agent={UA}")
-    opts.add_experimental_option("excludeSwitches", ["enable-automation"])
-    opts.add_experimental_option("useAutomationExtension", False)
-    opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
-    if PROXY_URL:
-        opts.add_argument(f"--proxy-server={PROXY_URL}")
-
-    service = Service(CHROME_DRV)
-    driver = webdriver.Chrome(service=service, options=opts)
-
-    try:
-        driver.execute_cdp_cmd(
-            "Page.addScriptToEvaluateOnNewDocument",
-            {"source": 'Object.defineProperty(navigator,"webdriver",{get:()=>undefined});'}
-        )
-    except Exception:
-        pass
-
-    try:
-        yield driver
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
+def _new_driver():
+    # تشخیص iframeها (switch_to.frame) فقط در سلنیوم هست؛ BROWSER_BACKEND اینجا اعمال نمی‌شود
+    return driver_engine.launch(DIAG_DRIVER_PROFILE, user_data="render_diag", perf_log=True,
+                                user_agent=UA, proxy=PROXY_URL, backend="selenium")
 
 def inject_cookies(driver, cookies):
     if not cookies:
         return 0, None
+    # یک Network.setCookies قبل از هر ناوبری؛ روش قدیمی فقط اگر CDP خطا داد
+    try:
+        return _session.apply(driver, SERVER_URL or "https://magmanode.com/", cookies), None
+    except Exception:
+        pass
     driver.get("https://magmanode.com/")
-    time.sleep(0.3)
+    readiness.wait_for("diag_cookie_root", lambda: readiness.document_ready(driver), timeout=3, baseline=0.3)
     added, err = 0, None
     for c in cookies:
         try:
@@ -123,10 +104,150 @@ def inject_cookies(driver, cookies):
             err = str(e)
     return added, err
 
+class DriverPool:
+    """چند Chrome ازپیش‌روشن و کوکی‌خورده؛ بررسی سلامت، حذف بی‌کارها و بازسازی بعد از max_uses."""
+
+    def __init__(self, size, max_uses, idle_seconds):
+        self.size = size
+        self.max_uses = max_uses
+        self.idle_seconds = idle_seconds
+        self._idle = []
+        self._leased = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        # بعد از تغییر کوکی‌ها، درایورهای نسل قبل دور ریخته می‌شوند
+        self._generation = 0
+        self.stats = {"launched": 0, "reused": 0, "recycled": 0, "evicted": 0, "unhealthy": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _launch(self):
+        # نسل قبل از خواندن کوکی‌ها گرفته می‌شود تا invalidate هم‌زمان درایور را کهنه علامت بزند
+        with self._lock:
+            gen = self._generation
+        with TRACER.span("driver_launch"):
+            driver = _new_driver()
+        with TRACER.span("cookie_inject") as s:
+            cnt, err = inject_cookies(driver, _load_cookies())
+            s.set(cookies=cnt)
+        self._count("launched")
+        return {"driver": driver, "uses": 0, "last_used": time.time(),
+                "gen": gen, "cookies_count": cnt, "cookies_error": err}
+
+    @staticmethod
+    def _quit(slot):
+        try:
+            slot["driver"].quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _healthy(slot):
+        try:
+            slot["driver"].switch_to.default_content()
+            return slot["driver"].execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                slot = self._idle.pop()
+                current = slot["gen"] == self._generation
+            if current and self._healthy(slot):
+                return slot
+            self._count("unhealthy")
+            self._quit(slot)
+
+    @contextmanager
+    def lease(self, timeout=POOL_LEASE_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            raise RuntimeError("driver pool busy")
+        with self._lock:
+            self._leased += 1
+        slot = None
+        try:
+            slot = self._take_idle()
+            if slot is None:
+                slot = self._launch()
+            else:
+                self._count("reused")
+            # لاگ شبکهٔ استفادهٔ قبلی را خالی کن
+            _read_perf_log(slot["driver"])
+            yield slot
+            slot["uses"] += 1
+            slot["last_used"] = time.time()
+            with self._lock:
+                recycle = slot["uses"] >= self.max_uses or slot["gen"] != self._generation
+                if recycle:
+                    self.stats["recycled"] += 1
+                else:
+                    self._idle.append(slot)
+            if recycle:
+                self._quit(slot)
+        except BaseException:
+            if slot is not None:
+                self._quit(slot)
+            raise
+        finally:
+            with self._lock:
+                self._leased -= 1
+            self._slots.release()
+
+    def warm(self):
+        """تا ظرفیت خالی، درایور گرم آماده کن"""
+        while True:
+            with self._lock:
+                if len(self._idle) + self._leased >= self.size:
+                    return
+            slot = self._launch()
+            with self._lock:
+                self._idle.append(slot)
+
+    def evict_idle(self):
+        now = time.time()
+        with self._lock:
+            stale = [s for s in self._idle if now - s["last_used"] > self.idle_seconds]
+            self._idle = [s for s in self._idle if s not in stale]
+            self.stats["evicted"] += len(stale)
+        for slot in stale:
+            self._quit(slot)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            old, self._idle = self._idle, []
+        for slot in old:
+            self._quit(slot)
+
+    def info(self):
+        with self._lock:
+            return {"size": self.size, "idle": len(self._idle), "leased": self._leased,
+                    "generation": self._generation, **self.stats}
+
+_pool = DriverPool(POOL_SIZE, POOL_MAX_USES, POOL_IDLE_SECONDS)
+
+def _pool_loop(interval=30):
+    # پیش‌راه‌اندازی، بعد فقط حذف درایورهای بی‌کار
+    try:
+        _pool.warm()
+    except Exception:
+        pass
+    while True:
+        time.sleep(interval)
+        try:
+            _pool.evict_idle()
+        except Exception:
+            pass
+
 def ensure_consent(driver):
     # تلاش برای بستن پنجره‌های consent/ads
+    # click_once قبل از این تا رندر پنل صبر کرده است
     try:
-        time.sleep(0.3)
         for iframe in driver.find_elements(By.TAG_NAME, "iframe"):
             try:
                 src = iframe.get_attribute("src") or ""
@@ -146,8 +267,20 @@ def ensure_consent(driver):
     except Exception:
         pass
 
+def _wait_panel(driver, label, baseline):
+    return readiness.wait_for(
+        label, lambda: readiness.page_ready(driver, DIAG_STATUS_SELECTORS, DIAG_BUTTON_SELECTORS),
+        timeout=8, baseline=baseline,
+    )
+
 def click_once(action):
     """یک بار اجرا: صفحه رو باز می‌کنه، کوکی می‌ذاره، کلیک می‌کنه، لاگ برمی‌گردونه."""
+    with TRACER.trace("diag_click", action=action or "none") as tr:
+        info = _click_once(action)
+        tr.set(ok=info["ok"], note=info["note"])
+        return info
+
+def _click_once(action):
     info = {
         "ok": True,
         "action": action,
@@ -165,15 +298,19 @@ def click_once(action):
         info["note"] = "SERVER_URL empty"
         return info
 
-    cookies = _load_cookies()
-    with make_driver() as driver:
-        cnt, err = inject_cookies(driver, cookies)
-        info["cookies_count"] = cnt
-        info["cookies_error"] = err
+    t_lease = time.monotonic()
+    with _pool.lease() as slot:
+        TRACER.annotate(lease_ms=round((time.monotonic() - t_lease) * 1000, 1))
+        driver = slot["driver"]
+        info["cookies_count"] = slot["cookies_count"]
+        info["cookies_error"] = slot["cookies_error"]
 
-        driver.get(SERVER_URL)
-        time.sleep(0.8)
-        ensure_consent(driver)
+        with TRACER.span("navigate"):
+            driver.get(SERVER_URL)
+        with TRACER.span("panel_wait", label="diag_open") as s:
+            s.set(ok=_wait_panel(driver, "diag_open", 0.8))
+        with TRACER.span("consent"):
+            ensure_consent(driver)
 
         try:
             info["has_start"] = len(driver.find_elements(By.CSS_SELECTOR, 'button[data-action="start"]')) > 0
@@ -186,30 +323,41 @@ def click_once(action):
         if action in ("start", "stop"):
             selector = f'button[data-action="{action}"]'
             clicked, via = False, "native"
-            try:
-                btn = WebDriverWait(driver, 12).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                )
+            btn = None
+            with TRACER.span("find_button", selector=selector, by="css selector") as s:
                 try:
-                    btn.click()
-                    clicked = True
+                    btn = WebDriverWait(driver, 12).until(
+                        EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
+                    )
                 except Exception:
-                    driver.execute_script("arguments[0].click();", btn)
-                    clicked, via = True, "js"
-            except Exception:
-                pass
+                    pass
+                s.set(found=btn is not None)
+            if btn is not None:
+                with TRACER.span("click") as s:
+                    try:
+                        btn.click()
+                        clicked = True
+                    except Exception:
+                        driver.execute_script("arguments[0].click();", btn)
+                        clicked, via = True, "js"
+                    s.set(via=via)
             info["selector"] = {"by": "css selector", "selector": selector}
             info["note"] = f"clicked={clicked} via={via}"
-            time.sleep(1.2)
+            # تا پایان درخواست(های) شبکهٔ ناشی از کلیک
+            with TRACER.span("wait_after_click", baseline_s=1.2) as s:
+                s.set(ok=readiness.wait_for("diag_after_click", lambda: readiness.network_quiet(driver, 400),
+                                            timeout=5, baseline=1.2))
 
         # رفرش کوتاه برای دیدن وضعیت نهایی
-        try:
-            driver.get(SERVER_URL)
-            time.sleep(0.7)
-        except Exception:
-            pass
+        with TRACER.span("refresh") as s:
+            try:
+                driver.get(SERVER_URL)
+                s.set(ok=_wait_panel(driver, "diag_refresh", 0.7))
+            except Exception as e:
+                s.set(error=str(e))
 
         info["network"].extend(_read_perf_log(driver))
+        _session.capture(driver, SERVER_URL)
 
     return info
 
@@ -246,8 +394,9 @@ def _arm_loop():
             _schedule["action"] = None
             _schedule["armed"] = False
 
-# استارت حلقه‌ی آرمینگ
+# استارت حلقه‌ی آرمینگ و استخر درایورها
 threading.Thread(target=_arm_loop, daemon=True).start()
+threading.Thread(target=_pool_loop, daemon=True).start()
 
 # ===== Routes =====
 @APP.get("/")
@@ -260,7 +409,7 @@ def home():
  <a href="/diag?action=start">start</a> | <a href="/diag?action=stop">stop</a></p>
 <p><b>۳) زمان‌بندی خودکار:</b> مثال:
  <code>/arm?action=start&after=60</code> (۶۰ ثانیه بعد کلیک)</p>
-<p>وضعیت زمان‌بندی/آخرین اجرا: <a href="/watch">/watch</a></p>
+<p>وضعیت زمان‌بندی/آخرین اجرا: <a href="/watch">/watch</a> | زمان‌بندی مراحل: <a href="/trace">/trace</a></p>
 <p>JSON دیباگ: <a href="/diag?format=json">/diag?format=json</a> |
  وضعیت سرویس: <a href="/api/status">/api/status</a></p>
 </body></html>""",
@@ -290,6 +439,14 @@ def diag():
     ] + data.get("network", [])
     return Response("\n".join(lines) + "\n\nJSON | /api/status", mimetype="text/plain")
 
+@APP.get("/trace")
+def trace():
+    """آخرین اجراهای click_once به‌صورت waterfall متنی (?format=json برای JSON)"""
+    traces = TRACER.recent(request.args.get("last", 10, type=int))
+    if (request.args.get("format") or "").strip().lower() == "json":
+        return jsonify(traces)
+    return Response("\n\n".join(waterfall(t) for t in traces) + "\n", mimetype="text/plain")
+
 @APP.get("/api/status")
 def api_status():
     self_url = request.host_url.rstrip("/")
@@ -332,12 +489,11 @@ def cookie():
                 data = [data]
         except Exception:
             return Response("❌ JSON نامعتبر است.", mimetype="text/plain", status=400)
-        try:
-            with open(COOKIE_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False)
-            return redirect("/cookie?saved=1")
-        except Exception as e:
-            return Response(f"❌ ذخیره نشد: {e}", mimetype="text/plain", status=500)
+        if not _session.reset(data):
+            return Response("❌ ذخیره نشد.", mimetype="text/plain", status=500)
+        # درایورهای گرم کوکی قبلی را دارند
+        _pool.invalidate()
+        return redirect("/cookie?saved=1")
 
     existing = ""
     if os.path.exists(COOKIE_FILE):
@@ -400,6 +556,11 @@ def keepalive_stop():
     _stop_keepalive.set()
     return Response("KeepAlive stopped.", mimetype="text/plain")
 
+@APP.get("/pool")
+def pool():
+    return jsonify({**_pool.info(), "blocking": block_profile.STATS.info(),
+                    "readiness": readiness.STATS.info()})
+
 @APP.get("/whoami")
 def whoami():
     return jsonify({
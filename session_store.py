@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger("session_store")
+
+# کوکی‌های جلسه روی دیسک؛ کوکی‌هایی که سایت می‌چرخاند اینجا بازنویسی می‌شوند و بر ENV مقدم‌اند
+SESSION_FILE = os.environ.get("MAGMANODE_SESSION_FILE", "session_cookies.json")
+# پروفایل پایدار Chromium (اختیاری)؛ هر مصرف‌کننده زیرپوشهٔ خودش را می‌گیرد
+CHROME_PROFILE_DIR = os.environ.get("CHROME_PROFILE_DIR", "").strip()
+CAPTURE_MIN_INTERVAL = float(os.environ.get("SESSION_CAPTURE_MIN_INTERVAL", "60"))
+
+_SAME_SITE = {"strict": "Strict", "lax": "Lax", "none": "None", "no_restriction": "None"}
+
+
+def _expires(c):
+    for k in ("expires", "expiry", "expirationDate"):
+        v = c.get(k)
+        if v not in (None, "", -1):
+            try:
+                return float(v)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def to_cdp_cookie(c: dict, url: str) -> dict:
+    """کوکی با فرمت export مرورگر/Selenium → پارامتر Network.setCookies"""
+    out = {"name": c["name"], "value": str(c["value"]), "path": c.get("path") or "/",
+           "secure": bool(c.get("secure", True)), "httpOnly": bool(c.get("httpOnly", False))}
+    if c.get("domain"):
+        out["domain"] = c["domain"]
+    else:
+        out["url"] = url
+    exp = _expires(c)
+    if exp and exp > 0:
+        out["expires"] = exp
+    same_site = _SAME_SITE.get(str(c.get("sameSite") or "").lower())
+    if same_site:
+        out["sameSite"] = same_site
+    return out
+
+
+def _domain(c):
+    # ".host" (export مرورگر/jar) و "host" (کوکی seed) یک کوکی‌اند
+    return (c.get("domain") or "").lstrip(".").lower()
+
+
+def _key(c):
+    return (c.get("name"), _domain(c), c.get("path") or "/")
+
+
+def _lock_in_use(path) -> bool:
+    """SingletonLock یک symlink به «host-pid» است؛ بعد از crash/OOM/ری‌استارت کانتینر جا می‌ماند"""
+    lock = os.path.join(path, "SingletonLock")
+    try:
+        target = os.readlink(lock)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+    host, _, pid = target.rpartition("-")
+    alive = host == socket.gethostname() and pid.isdigit()
+    if alive:
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            alive = False
+        except PermissionError:
+            pass
+    if alive:
+        return True
+    for name in ("SingletonLock", "SingletonSocket", "SingletonCookie"):
+        try:
+            os.unlink(os.path.join(path, name))
+        except OSError:
+            pass
+    logger.info(f"🧹 قفل جامانده ({target}) از پروفایل {path} پاک شد.")
+    return False
+
+
+def profile_dir(name: str):
+    """مسیر پروفایل برای این مصرف‌کننده، یا None اگر پیکربندی نشده یا هر دو نسخه‌اش در حال استفاده‌اند"""
+    if not CHROME_PROFILE_DIR:
+        return None
+    # Chromium هنگام استفاده از یک پروفایل SingletonLock می‌سازد؛ دو مرورگر هم‌زمان روی یک پروفایل ممکن نیست.
+    # نسخهٔ دوم برای تعویض گرم نگهبان است که درایور تازه تا بسته شدن قبلی هم‌زمان زنده است
+    for candidate in (name, f"{name}-b"):
+        path = os.path.join(CHROME_PROFILE_DIR, candidate)
+        if not _lock_in_use(path):
+            os.makedirs(path, exist_ok=True)
+            return path
+    logger.info(f"پروفایل‌های {name} در حال استفاده‌اند؛ بدون پروفایل پایدار ادامه می‌دهم.")
+    return None
+
+
+def apply_profile(opts, name: str):
+    path = profile_dir(name)
+    if path:
+        opts.add_argument(f"--user-data-dir={path}")
+    return path
+
+
+class SessionStore:
+    """منبع واحد کوکی‌ها: فایل جلسه (اگر هست) وگرنه JSON اولیهٔ ENV؛ بارگذاری یک‌جا با CDP و بازنویسی چرخش‌ها"""
+
+    def __init__(self, path=SESSION_FILE, seed_json=""):
+        self.path = path
+        self.seed_json = seed_json
+        # هش seed کنار فایل جلسه نوشته می‌شود؛ seed عوض‌شده در ENV بر فایل قدیمی مقدم است
+        self.seed_hash = hashlib.sha256(seed_json.encode("utf-8")).hexdigest() if seed_json else ""
+        self._lock = threading.Lock()
+        self._cookies = None
+        self._last_capture = 0.0
+        self.rotations = 0
+
+    def load(self) -> list:
+        with self._lock:
+            if self._cookies is None:
+                self._cookies = self._read()
+            return [dict(c) for c in self._cookies]
+
+    def _seed_path(self):
+        return self.path + ".seed"
+
+    def _file_seed(self):
+        try:
+            with open(self._seed_path(), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _read(self):
+        file_seed = self._file_seed() if self.path else None
+        # فایل بدون .seed (قدیمی) همچنان معتبر است؛ اولین نوشتن هش فعلی را ثبت می‌کند
+        if self.seed_hash and file_seed is not None and file_seed != self.seed_hash:
+            logger.info("🔑 کوکی‌های ENV عوض شده‌اند؛ فایل جلسهٔ قبلی کنار گذاشته شد.")
+        elif self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, list) and data:
+                    return data
+            except Exception as e:
+                logger.warning(f"⚠️ فایل جلسه خوانده نشد ({e}); از کوکی‌های ENV استفاده می‌کنم.")
+        try:
+            data = json.loads(self.seed_json) if self.seed_json else []
+        except Exception as e:
+            logger.error(f"فرمت کوکی‌ها نامعتبر است: {e}")
+            return []
+        if isinstance(data, dict):
+            data = [data]
+        return [c for c in data if isinstance(c, dict) and c.get("name") and c.get("value") is not None]
+
+    def reset(self, cookies):
+        """جایگزینی کامل (مثلاً کوکی جدیدی که کاربر چسبانده)"""
+        with self._lock:
+            self._cookies = [c for c in cookies if isinstance(c, dict) and c.get("name")]
+            return self._write()
+
+    def apply(self, driver, url: str, cookies=None) -> int:
+        """همهٔ کوکی‌ها با یک Network.setCookies، قبل از اولین ناوبری؛ 0 یعنی چیزی اعمال نشد"""
+        cookies = self.load() if cookies is None else cookies
+        if not cookies:
+            return 0
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": [to_cdp_cookie(c, url) for c in cookies]})
+        return len(cookies)
+
+    def update(self, cookies) -> bool:
+        """کوکی‌های تازه را ادغام می‌کند؛ اگر مقدار/انقضای چیزی عوض شده باشد روی دیسک می‌نویسد"""
+        with self._lock:
+            if self._cookies is None:
+                self._cookies = self._read()
+            current = {_key(c): c for c in self._cookies}
+            changed = False
+            for c in cookies:
+                if not c.get("name") or c.get("value") is None:
+                    continue
+                k = _key(c)
+                old = current.get(k)
+                if old is None:
+                    # seed بدون domain همان کوکی host است که jar/مرورگر با domain برمی‌گرداند
+                    k = next((ck for ck in current if ck[0] == k[0] and ck[2] == k[2] and (not ck[1] or not k[1])), k)
+                    old = current.get(k)
+                # انقضای نامعلوم (کوکی جلسه یا jar پروب HTTP) انقضای قبلی را پاک نمی‌کند
+                new_exp = _expires(c)
+                if old is None or old.get("value") != c.get("value") \
+                        or (new_exp is not None and new_exp != _expires(old)):
+                    merged = dict(old or {})
+                    merged.update({n: v for n, v in c.items() if v is not None})
+                    if old and old.get("domain"):
+                        # قالب domain ذخیره‌شده حفظ می‌شود (host-only در برابر .host)
+                        merged["domain"] = old["domain"]
+                    current[k] = merged
+                    changed = True
+            if changed:
+                self._cookies = list(current.values())
+                self.rotations += 1
+                self._write()
+            return changed
+
+    def capture(self, driver, url: str, force=False) -> bool:
+        """کوکی‌های زندهٔ مرورگر برای این URL را برمی‌دارد (حداکثر هر CAPTURE_MIN_INTERVAL ثانیه)"""
+        now = time.monotonic()
+        if not force and now - self._last_capture < CAPTURE_MIN_INTERVAL:
+            return False
+        self._last_capture = now
+        try:
+            got = driver.execute_cdp_cmd("Network.getCookies", {"urls": [url]}).get("cookies", [])
+        except Exception as e:
+            logger.debug(f"Network.getCookies error: {e}")
+            return False
+        return self.update([
+            {"name": c["name"], "value": c["value"], "domain": c.get("domain"), "path": c.get("path", "/"),
+             "secure": c.get("secure", True), "httpOnly": c.get("httpOnly", False),
+             "expires": c.get("expires") if not c.get("session") else None,
+             "sameSite": c.get("sameSite")}
+            for c in got
+        ])
+
+    def capture_jar(self, jar) -> bool:
+        """کوکی‌های یک requests CookieJar (پروب HTTP) را ادغام می‌کند"""
+        # jar از httpOnly/sameSite خبر ندارد؛ فقط مقدار و انقضا ادغام می‌شود
+        return self.update([
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path or "/", "expires": c.expires}
+            for c in jar
+        ])
+
+    def _write(self) -> bool:
+        if not self.path:
+            return True
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._cookies, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            if self.seed_hash:
+                with open(self._seed_path(), "w", encoding="utf-8") as f:
+                    f.write(self.seed_hash)
+            return True
+        except Exception as e:
+            logger.error(f"❌ خطا در ذخیرهٔ کوکی‌های جلسه: {e}")
+            return False
@@ -0,0 +1,255 @@
+import os
+import json
+import mmap
+import time
+import stat
+import struct
+import logging
+import secrets
+import threading
+from multiprocessing.connection import Listener, Client
+
+logger = logging.getLogger("shared_status")
+
+# پوشهٔ segmentها و سوکت کنترل؛ خالی یعنی حالت تک‌پردازه‌ای (بدون حافظهٔ مشترک)
+SHARED_STATUS_DIR = os.environ.get("SHARED_STATUS_DIR", "").strip()
+SEGMENT_SIZE = int(os.environ.get("SHARED_STATUS_SEGMENT_KB", "64")) * 1024
+# کلید ثابت فقط اگر صریحاً داده شود؛ وگرنه مالک در هر اجرا کلید تصادفی می‌سازد و در فایل 0600 پوشهٔ مشترک می‌گذارد
+CONTROL_AUTHKEY = os.environ.get("CONTROL_AUTHKEY", "").encode() or None
+CONTROL_TIMEOUT = float(os.environ.get("CONTROL_TIMEOUT", "150"))
+# ضربان مالک در هر segment؛ قدیمی‌تر از OWNER_STALE_SECONDS یعنی مالک مرده یا گیر کرده است
+OWNER_HEARTBEAT_SECONDS = float(os.environ.get("OWNER_HEARTBEAT_SECONDS", "5"))
+OWNER_STALE_SECONDS = float(os.environ.get("OWNER_STALE_SECONDS", "30"))
+
+# سرآیند segment: seq (فرد = در حال نوشتن)، version، taken_at (monotonic؛ در یک ماشین بین پردازه‌ها مشترک است)، طول JSON
+HEADER = struct.Struct("<QQdI")
+# بعد از سرآیند و بیرون از seqlock: pid مالک و آخرین ضربانش (monotonic)
+OWNER = struct.Struct("<Id")
+DATA_OFFSET = HEADER.size + OWNER.size
+
+
+def segment_path(base_dir: str, server_id: str) -> str:
+    return os.path.join(base_dir, f"status-{server_id}.seg")
+
+
+def control_address(base_dir: str) -> str:
+    return os.path.join(base_dir, "control.sock")
+
+
+def authkey_path(base_dir: str) -> str:
+    return os.path.join(base_dir, "control.key")
+
+
+def ensure_private_dir(path: str):
+    """پوشهٔ segmentها/سوکت/کلید: فقط برای کاربر فعلی (0700)؛ پوشهٔ موجودِ دیگران یا symlink پذیرفته نمی‌شود"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"{path} پوشه نیست (symlink؟)")
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"پوشهٔ {path} مال کاربر دیگری است (uid {st.st_uid})")
+    if st.st_mode & 0o077:
+        # makedirs مجوز پوشهٔ موجود را تنگ نمی‌کند
+        os.chmod(path, 0o700)
+        logger.warning(f"⚠️ مجوز {path} از {oct(st.st_mode & 0o777)} به 0700 تنگ شد")
+
+
+def new_authkey(base_dir: str) -> bytes:
+    """کلید تصادفی این اجرای مالک؛ با rename اتمیک جایگزین کلید قبلی می‌شود"""
+    key = CONTROL_AUTHKEY or secrets.token_bytes(32)
+    path = authkey_path(base_dir)
+    tmp = f"{path}.{os.getpid()}"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    os.replace(tmp, path)
+    return key
+
+
+def load_authkey(base_dir: str) -> bytes:
+    if CONTROL_AUTHKEY:
+        return CONTROL_AUTHKEY
+    with open(authkey_path(base_dir), "rb") as f:
+        return f.read()
+
+
+class StatusSegment:
+    """snapshot وضعیت در یک فایل mmap با seqlock: یک نویسنده (پردازهٔ مرورگر)، هر تعداد خواننده، بدون قفل بین پردازه‌ای"""
+
+    def __init__(self, path: str, size: int = SEGMENT_SIZE, create: bool = False):
+        self.path = path
+        self.size = size
+        self._mm = None
+        self._cache = (0, 0.0, None)
+        if create:
+            with open(path, "wb") as f:
+                f.truncate(size)
+            self._open()
+
+    def _open(self) -> bool:
+        if self._mm is None:
+            try:
+                with open(self.path, "r+b") as f:
+                    self._mm = mmap.mmap(f.fileno(), 0)
+                self.size = len(self._mm)
+            except (FileNotFoundError, ValueError):
+                return False
+        return True
+
+    def publish(self, version: int, taken_at: float, data: dict) -> bool:
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if DATA_OFFSET + len(payload) > self.size:
+            logger.error(f"❌ snapshot ({len(payload)} بایت) در segment {self.path} جا نمی‌شود")
+            return False
+        mm = self._mm
+        seq = HEADER.unpack_from(mm, 0)[0]
+        # seq فرد: خواننده‌ها تا پایان نوشتن دوباره تلاش می‌کنند
+        struct.pack_into("<Q", mm, 0, seq + 1)
+        mm[DATA_OFFSET:DATA_OFFSET + len(payload)] = payload
+        HEADER.pack_into(mm, 0, seq + 1, version, taken_at, len(payload))
+        struct.pack_into("<Q", mm, 0, seq + 2)
+        return True
+
+    def read(self, retries: int = 100):
+        """(version, taken_at, data)؛ version صفر یعنی هنوز چیزی منتشر نشده"""
+        if not self._open():
+            return 0, 0.0, None
+        mm = self._mm
+        for _ in range(retries):
+            seq, version, taken_at, length = HEADER.unpack_from(mm, 0)
+            if seq % 2:
+                time.sleep(0)
+                continue
+            if version == self._cache[0]:
+                # همان نسخهٔ قبلی: JSON دوباره parse نمی‌شود
+                if HEADER.unpack_from(mm, 0)[0] == seq:
+                    return self._cache
+                continue
+            raw = bytes(mm[DATA_OFFSET:DATA_OFFSET + length])
+            if HEADER.unpack_from(mm, 0)[0] != seq:
+                continue
+            if not version:
+                return 0, 0.0, None
+            self._cache = (version, taken_at, json.loads(raw))
+            return self._cache
+        raise RuntimeError(f"segment {self.path}: نویسنده بیش از حد مشغول است")
+
+    def beat(self, pid: int = None):
+        """ضربان مالک (ترد OwnerHeartbeat)"""
+        OWNER.pack_into(self._mm, HEADER.size, pid or os.getpid(), time.monotonic())
+
+    def owner(self):
+        """(pid, ثانیه از آخرین ضربان)؛ (0, None) اگر segment هنوز ساخته نشده یا مالکی ضربان نزده"""
+        if not self._open():
+            return 0, None
+        pid, beat = OWNER.unpack_from(self._mm, HEADER.size)
+        return pid, (time.monotonic() - beat if beat else None)
+
+    def owner_alive(self, max_age: float = OWNER_STALE_SECONDS) -> bool:
+        pid, age = self.owner()
+        if not pid or age is None or age > max_age:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def wait_for(self, predicate, timeout: float, poll: float = 0.05):
+        """تا برقرار شدن predicate روی (version, taken_at, data) یا پایان timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            snap = self.read()
+            if predicate(snap) or time.monotonic() >= deadline:
+                return snap
+            time.sleep(poll)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class OwnerHeartbeat:
+    """در پردازهٔ مالک: هر OWNER_HEARTBEAT_SECONDS روی همهٔ segmentها ضربان می‌زند"""
+
+    def __init__(self, segments, interval: float = OWNER_HEARTBEAT_SECONDS):
+        self.segments = list(segments)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._beat()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="owner-heartbeat")
+        self._thread.start()
+
+    def _beat(self):
+        for seg in self.segments:
+            seg.beat()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._beat()
+            except Exception as e:
+                logger.error(f"❌ خطا در ضربان مالک: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+class ControlServer:
+    """کانال کنترل محلی (سوکت یونیکس) در پردازهٔ مالک مرورگر؛ هر اتصال یک درخواست و یک پاسخ"""
+
+    def __init__(self, address: str, handler, authkey: bytes):
+        self.address = address
+        self.handler = handler
+        # سوکت داخل پوشهٔ 0700 ساخته می‌شود؛ chmod بعد از bind فقط لایهٔ دوم است
+        ensure_private_dir(os.path.dirname(address))
+        if os.path.exists(address):
+            os.unlink(address)
+        self._listener = Listener(address, family="AF_UNIX", authkey=authkey)
+        os.chmod(address, 0o600)
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="control-server")
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ اتصال کنترل رد شد: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                msg = conn.recv()
+                result = self.handler(msg.get("action"), msg.get("server"), msg.get("args") or {})
+                conn.send({"ok": True, "result": result})
+            except Exception as e:
+                try:
+                    conn.send({"ok": False, "error": str(e)})
+                except Exception:
+                    pass
+
+    def close(self):
+        self._listener.close()
+
+
+def control_call(address: str, action: str, server=None, timeout: float = CONTROL_TIMEOUT,
+                 authkey: bytes = None, **args):
+    """یک درخواست به پردازهٔ مالک؛ خطای سمت مالک به RuntimeError تبدیل می‌شود"""
+    # کلید در هر فراخوانی از پوشه خوانده می‌شود: مالک تازه (ری‌استارت) کلید تازه دارد
+    authkey = authkey or load_authkey(os.path.dirname(address))
+    with Client(address, family="AF_UNIX", authkey=authkey) as conn:
+        conn.send({"action": action, "server": server, "args": args})
+        if not conn.poll(timeout):
+            raise TimeoutError(f"پاسخ کنترل «{action}» در {timeout}s نرسید")
+        reply = conn.recv()
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error"))
+    return reply["result"]
@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+from collections import deque
+
+# هر کلیک START تا نتیجهٔ واقعی دنبال می‌شود: running، برگشت به offline، یا پایان مهلت
+START_VERIFY_TIMEOUT = float(os.environ.get("START_VERIFY_TIMEOUT", "600"))
+# اگر تا این مدت بعد از کلیک نه starting دیده شد نه running، کلیک بی‌اثر بوده (شکست خاموش)
+START_VERIFY_GRACE_SECONDS = float(os.environ.get("START_VERIFY_GRACE_SECONDS", "45"))
+START_VERIFY_RETRIES = int(os.environ.get("START_VERIFY_RETRIES", "2"))
+# پروب تنگ هنگام تأیید: از این فاصله شروع و هر بار ×۱.۵ تا سقف poll_max
+START_VERIFY_POLL_MIN = float(os.environ.get("START_VERIFY_POLL_MIN", "2"))
+START_LATENCY_SAMPLES = int(os.environ.get("START_LATENCY_SAMPLES", "200"))
+
+RUNNING = 'running'
+REVERTED = 'reverted'
+SILENT = 'silent'
+TIMEOUT = 'timeout'
+OUTCOMES = (RUNNING, REVERTED, SILENT, TIMEOUT)
+# نتیجه‌هایی که کلیک دوباره را توجیه می‌کنند
+RETRYABLE = (REVERTED, SILENT)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    idx = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[idx]
+
+
+class StartVerifier:
+    """مسیر یک START از کلیک تا نتیجه؛ زمان تا running (از اولین کلیک، با احتساب تلاش‌های مجدد) نمونه‌برداری می‌شود"""
+
+    def __init__(self, timeout=START_VERIFY_TIMEOUT, grace=START_VERIFY_GRACE_SECONDS, retries=START_VERIFY_RETRIES,
+                 poll_min=START_VERIFY_POLL_MIN, poll_max=5.0, samples=START_LATENCY_SAMPLES):
+        self.timeout = timeout
+        self.grace = grace
+        self.max_retries = retries
+        self.poll_min = poll_min
+        self.poll_max = max(poll_min, poll_max)
+        self._lock = threading.Lock()
+        self.attempt = None
+        self.latencies = deque(maxlen=samples)
+        self.outcomes = {o: 0 for o in OUTCOMES}
+        self.retries = 0
+        self.last = None
+        self._retry = None
+        self._delay = poll_min
+
+    @property
+    def pending(self) -> bool:
+        return self.attempt is not None
+
+    @property
+    def retry_due(self) -> bool:
+        return self._retry is not None
+
+    def seed(self, events):
+        """نمونه‌های قبلی از رویدادهای 'start' تاریخچه (بعد از ری‌استارت)"""
+        for ev in events:
+            outcome = ev.get('outcome')
+            if outcome in self.outcomes:
+                self.outcomes[outcome] += 1
+            if outcome == RUNNING and ev.get('s') is not None:
+                self.latencies.append(float(ev['s']))
+
+    def begin(self, source: str):
+        """بعد از کلیک موفق START؛ اگر تلاش مجدد است، زنجیره و زمان اولین کلیک حفظ می‌شود"""
+        now = time.monotonic()
+        with self._lock:
+            prev, self._retry = self._retry, None
+            if prev is not None:
+                prev.update(clicked_at=now, retries=prev['retries'] + 1, saw_starting=False)
+                self.attempt = prev
+                self.retries += 1
+            else:
+                self.attempt = {'source': source, 'first_click_at': now, 'clicked_at': now,
+                                'started_wall': time.time(), 'retries': 0, 'saw_starting': False,
+                                'starting_s': None}
+            self._delay = self.poll_min
+
+    def abandon(self):
+        """تلاش مجدد انجام نشد (کلیک ناموفق)"""
+        with self._lock:
+            self._retry = None
+
+    def cancel(self):
+        """STOP در میانهٔ تأیید: دیگر انتظار running نداریم"""
+        with self._lock:
+            self.attempt = None
+            self._retry = None
+
+    def observe(self, status: str):
+        """نتیجهٔ هر پروب؛ اگر تلاش جاری به نتیجه رسید (outcome، ثانیه از اولین کلیک، رکورد تلاش) وگرنه None"""
+        with self._lock:
+            a = self.attempt
+            if a is None:
+                return None
+            now = time.monotonic()
+            elapsed = now - a['first_click_at']
+            outcome = None
+            if status == 'running':
+                outcome = RUNNING
+            elif status == 'starting':
+                if not a['saw_starting']:
+                    a['saw_starting'] = True
+                    a['starting_s'] = round(now - a['clicked_at'], 1)
+            elif status == 'offline':
+                if a['saw_starting']:
+                    outcome = REVERTED
+                elif now - a['clicked_at'] >= self.grace:
+                    outcome = SILENT
+            if outcome is None and elapsed >= self.timeout:
+                outcome = TIMEOUT
+            if outcome is None:
+                return None
+            self.attempt = None
+            self.outcomes[outcome] += 1
+            if outcome == RUNNING:
+                self.latencies.append(elapsed)
+            elif outcome in RETRYABLE and a['retries'] < self.max_retries:
+                self._retry = a
+            self.last = {'outcome': outcome, 'seconds': round(elapsed, 1), 'retries': a['retries'],
+                         'source': a['source'], 'at': time.time()}
+            return outcome, elapsed, a
+
+    def next_delay(self) -> float:
+        """فاصلهٔ پروب بعدی هنگام تأیید: کوتاه بعد از کلیک، کم‌کم بازتر"""
+        with self._lock:
+            delay = self._delay
+            self._delay = min(self.poll_max, self._delay * 1.5)
+            return delay
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = list(self.latencies)
+            a = self.attempt
+            out = {
+                'state': 'verifying' if a else ('retry_pending' if self._retry else 'idle'),
+                'attempt': None,
+                'samples': len(samples),
+                'p50_s': None, 'p90_s': None, 'p95_s': None, 'max_s': None,
+                'outcomes': dict(self.outcomes),
+                'retries': self.retries,
+                'last': dict(self.last) if self.last else None,
+            }
+            if a:
+                out['attempt'] = {'source': a['source'], 'retries': a['retries'],
+                                  'elapsed_s': round(time.monotonic() - a['first_click_at'], 1),
+                                  'saw_starting': a['saw_starting'], 'starting_s': a['starting_s']}
+        if samples:
+            out.update({f'p{q}_s': round(percentile(samples, q), 1) for q in (50, 90, 95)})
+            out['max_s'] = round(max(samples), 1)
+        return out
@@ -2,10 +2,9 @@ import os
 import time
 import logging
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+
+import driver_engine
 
 logging.basicConfig(
     level=os.environ.get("LOG_LEVEL", "INFO"),
@@ -14,27 +13,10 @@ logging.basicConfig(
 logger = logging.getLogger("status_checker")
 
 MAGMA_SERVER_URL = os.environ.get("MAGMANODE_SERVER_URL", "https://magmanode.com/server?id=770999")
-CHROME_BIN = os.environ.get("CHROME_BIN", "/usr/bin/chromium")
-CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver")
-
-def _opts():
-    o = Options()
-    o.add_argument("--headless=new")
-    o.add_argument("--no-sandbox")
-    o.add_argument("--disable-dev-shm-usage")
-    o.add_argument("--disable-gpu")
-    o.add_argument("--window-size=1366,768")
-    if CHROME_BIN and os.path.exists(CHROME_BIN):
-        o.binary_location = CHROME_BIN
-    o.add_experimental_option("excludeSwitches", ["enable-automation"])
-    o.add_experimental_option("useAutomationExtension", False)
-    o.add_argument("--disable-blink-features=AutomationControlled")
-    return o
 
 def main():
     print("🔍 ابزار تحلیل وضعیت (Render/Headless)")
-    service = Service(CHROMEDRIVER_PATH)
-    driver = webdriver.Chrome(service=service, options=_opts())
+    driver = driver_engine.launch(block=False)
     try:
         driver.get(MAGMA_SERVER_URL)
         time.sleep(3)
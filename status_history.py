@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("status_history")
+
+# نوع رویدادها: probe (هر پروب)، status (تغییر وضعیت)، click (کلیک خودکار/دستی)
+SEGMENT_PREFIX = "history-"
+COMPACT_BUCKET_SECONDS = 60
+
+
+def _segment_name(ts: float, compacted=False) -> str:
+    return f"{SEGMENT_PREFIX}{int(ts * 1000)}{'.c' if compacted else ''}.jsonl"
+
+
+def _segment_start(name: str) -> float:
+    return int(name[len(SEGMENT_PREFIX):].split(".")[0]) / 1000.0
+
+
+def _compact_events(events, bucket=COMPACT_BUCKET_SECONDS):
+    """رویدادهای probe هر bucket را در یک رکورد تجمیعی ادغام می‌کند؛ status و click دست‌نخورده می‌مانند."""
+    out, agg = [], None
+    for ev in events:
+        if ev.get("k") != "probe":
+            out.append(ev)
+            continue
+        b = int(ev["t"] // bucket) * bucket
+        n = ev.get("n", 1)
+        if agg is None or agg["t"] != b:
+            agg = {"t": b, "k": "probe", "n": 0, "ms": 0.0, "running": 0, "status": None}
+            out.append(agg)
+        agg["ms"] = (agg["ms"] * agg["n"] + ev.get("ms", 0.0) * n) / (agg["n"] + n)
+        agg["running"] += ev.get("running", 1 if ev.get("status") == "running" else 0)
+        agg["n"] += n
+        agg["status"] = ev.get("status")
+    for ev in out:
+        if ev.get("k") == "probe" and "n" in ev:
+            ev["ms"] = round(ev["ms"], 1)
+    return out
+
+
+class StatusHistory:
+    """لاگ append-only رویدادها: بافر حلقوی در حافظه + سگمنت‌های JSONL چرخشی و فشرده‌شونده روی دیسک"""
+
+    def __init__(self, directory, ring_size=2000, segment_bytes=256 * 1024, max_segments=16):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.ring = deque(maxlen=ring_size)
+        self._lock = threading.Lock()
+        self._fh = None
+        self._active = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _segments(self):
+        names = [n for n in os.listdir(self.directory) if n.startswith(SEGMENT_PREFIX) and n.endswith(".jsonl")]
+        return sorted(names, key=_segment_start)
+
+    def _open_active(self, ts):
+        self._active = _segment_name(ts)
+        self._fh = open(os.path.join(self.directory, self._active), "a", encoding="utf-8")
+
+    def append(self, kind: str, **fields):
+        ev = {"t": round(time.time(), 3), "k": kind, **fields}
+        line = json.dumps(ev, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.ring.append(ev)
+            try:
+                if self._fh is None:
+                    self._open_active(ev["t"])
+                self._fh.write(line)
+                self._fh.flush()
+                if self._fh.tell() >= self.segment_bytes:
+                    self._roll()
+            except Exception as e:
+                logger.error(f"❌ خطا در نوشتن تاریخچه: {e}")
+
+    def _roll(self):
+        self._fh.close()
+        self._fh = None
+        self._active = None
+        self._compact()
+
+    def _compact(self):
+        segments = self._segments()
+        # قدیمی‌ترین سگمنت فشرده‌نشده، فشرده می‌شود
+        for name in segments:
+            if ".c." in name:
+                continue
+            path = os.path.join(self.directory, name)
+            with open(path, "r", encoding="utf-8") as f:
+                events = [json.loads(l) for l in f if l.strip()]
+            tmp = os.path.join(self.directory, _segment_name(_segment_start(name), compacted=True))
+            with open(tmp, "w", encoding="utf-8") as f:
+                for ev in _compact_events(events):
+                    f.write(json.dumps(ev, ensure_ascii=False, separators=(",", ":")) + "\n")
+            os.remove(path)
+            break
+        segments = self._segments()
+        for name in segments[:max(0, len(segments) - self.max_segments)]:
+            os.remove(os.path.join(self.directory, name))
+
+    def _read_range(self, t_from, t_to):
+        # اگر بازه در بافر حافظه جا می‌شود، سراغ دیسک نمی‌رویم
+        with self._lock:
+            if self.ring and self.ring[0]["t"] <= t_from:
+                return [ev for ev in self.ring if ev["t"] <= t_to]
+            segments = self._segments()
+        events = []
+        for i, name in enumerate(segments):
+            start = _segment_start(name)
+            end = _segment_start(segments[i + 1]) if i + 1 < len(segments) else float("inf")
+            if end < t_from or start > t_to:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    events.extend(json.loads(l) for l in f if l.strip())
+            except Exception:
+                continue
+        return [ev for ev in events if ev["t"] <= t_to]
+
+    def events(self, kind: str, t_from: float = 0.0, t_to: float = None) -> list:
+        """رویدادهای خام یک نوع (مثلاً 'start') در بازه؛ رویدادهای غیر probe در فشرده‌سازی حفظ می‌شوند"""
+        t_to = time.time() if t_to is None else t_to
+        return [ev for ev in self._read_range(t_from, t_to) if ev["k"] == kind and ev["t"] >= t_from]
+
+    def query(self, t_from: float, t_to: float, resolution: float) -> dict:
+        """سری نمونه‌کاهی‌شده: برای هر بازهٔ resolution ثانیه‌ای تعداد پروب، تأخیر میانگین، نسبت running و کلیک‌ها"""
+        resolution = max(1.0, float(resolution))
+        events = self._read_range(t_from, t_to)
+        buckets = {}
+        transitions = []
+        last_status = None
+        for ev in events:
+            if ev["t"] < t_from:
+                if ev["k"] == "probe":
+                    last_status = ev.get("status")
+                continue
+            b = int((ev["t"] - t_from) // resolution)
+            row = buckets.setdefault(b, {"probes": 0, "ms_sum": 0.0, "running": 0, "clicks": 0, "status": None})
+            if ev["k"] == "probe":
+                n = ev.get("n", 1)
+                row["probes"] += n
+                row["ms_sum"] += ev.get("ms", 0.0) * n
+                row["running"] += ev.get("running", 1 if ev.get("status") == "running" else 0)
+                row["status"] = ev.get("status")
+            elif ev["k"] == "click":
+                row["clicks"] += 1
+                transitions.append(ev)
+            elif ev["k"] == "status":
+                transitions.append(ev)
+
+        series = []
+        for b in range(int((t_to - t_from) // resolution) + 1):
+            row = buckets.get(b)
+            if row and row["status"]:
+                last_status = row["status"]
+            probes = row["probes"] if row else 0
+            series.append({
+                "t": round(t_from + b * resolution, 3),
+                "status": last_status,
+                "probes": probes,
+                "probe_ms": round(row["ms_sum"] / probes, 1) if probes else None,
+                "uptime": round(row["running"] / probes, 3) if probes else None,
+                "clicks": row["clicks"] if row else 0,
+            })
+        return {"from": t_from, "to": t_to, "resolution": resolution, "series": series, "events": transitions}
+
+    def close(self):
+        with self._lock:
+            if self._fh:
+                self._fh.close()
+                self._fh = None
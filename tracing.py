@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger("tracing")
+
+# هر چرخه (پروب/کلیک) یک trace است و هر مرحله یک span؛ traceهای تمام‌شده در JSONL چرخشی نوشته می‌شوند
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+TRACE_MAX_KB = int(os.environ.get("TRACE_MAX_KB", "1024"))
+TRACE_BACKUPS = int(os.environ.get("TRACE_BACKUPS", "3"))
+TRACE_RING_SIZE = int(os.environ.get("TRACE_RING_SIZE", "200"))
+
+# span فعال؛ contextvar تا BrowserWorker بتواند آن را همراه دستور به ترد ورکر ببرد
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attrs", "error")
+
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.monotonic()
+        self.end = None
+        self.attrs = dict(attrs)
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, t0) -> dict:
+        end = self.end if self.end is not None else time.monotonic()
+        out = {"id": self.span_id, "parent": self.parent_id, "name": self.name,
+               "offset_ms": round((self.start - t0) * 1000, 1), "duration_ms": round((end - self.start) * 1000, 1)}
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class _NoopSpan:
+    """وقتی traceی فعال نیست؛ span.set بدون اثر"""
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, name, attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_wall = time.time()
+        self._lock = threading.Lock()
+        self.spans = []
+        self.root = Span(self, name, None, attrs)
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        t0 = self.root.start
+        root = self.root.to_dict(t0)
+        with self._lock:
+            spans = [s.to_dict(t0) for s in self.spans]
+        return {"trace_id": self.trace_id, "name": root["name"],
+                "started_at": datetime.fromtimestamp(self.started_wall).isoformat(timespec="milliseconds"),
+                "duration_ms": root["duration_ms"], "attrs": root.get("attrs", {}), "error": root.get("error"),
+                "spans": sorted(spans, key=lambda s: s["offset_ms"])}
+
+
+class Tracer:
+    def __init__(self, path=TRACE_FILE, max_bytes=TRACE_MAX_KB * 1024, backups=TRACE_BACKUPS,
+                 ring_size=TRACE_RING_SIZE):
+        self.path = path
+        self._recent = deque(maxlen=ring_size)
+        self._lock = threading.Lock()
+        self._out = None
+        if path:
+            self._load_tail()
+            # همان چرخش اندازه‌محور logging؛ فقط پیام خام (یک خط JSON)
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8",
+                                          delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._out = logging.getLogger(f"tracing.file.{os.path.abspath(path)}")
+            self._out.propagate = False
+            self._out.setLevel(logging.INFO)
+            if not self._out.handlers:
+                self._out.addHandler(handler)
+
+    def _load_tail(self):
+        """traceهای آخر فایل فعلی بعد از ری‌استارت هم در /api/trace دیده شوند"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._recent.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug(f"trace tail: {e}")
+
+    @contextmanager
+    def trace(self, name, **attrs):
+        """یک trace تازه؛ داخل trace دیگری فقط یک span است"""
+        if _current.get() is not None:
+            with self.span(name, **attrs) as s:
+                yield s
+            return
+        tr = Trace(name, attrs)
+        token = _current.set(tr.root)
+        try:
+            yield tr.root
+        except BaseException as e:
+            tr.root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            tr.root.end = time.monotonic()
+            _current.reset(token)
+            self._finish(tr)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        parent = _current.get()
+        if parent is None:
+            yield NOOP
+            return
+        s = Span(parent.trace, name, parent.span_id, attrs)
+        parent.trace.add(s)
+        token = _current.set(s)
+        try:
+            yield s
+        except BaseException as e:
+            s.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            s.end = time.monotonic()
+            _current.reset(token)
+
+    @staticmethod
+    def annotate(**attrs):
+        """ویژگی روی span فعال (مثلاً سلکتور یا روش کلیک)"""
+        s = _current.get()
+        if s is not None:
+            s.set(**attrs)
+
+    def _finish(self, tr):
+        data = tr.to_dict()
+        with self._lock:
+            self._recent.append(data)
+        if self._out is not None:
+            try:
+                self._out.info(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+            except Exception as e:
+                logger.debug(f"trace write: {e}")
+
+    def recent(self, last=20, name=None) -> list:
+        with self._lock:
+            items = list(self._recent)
+        if name:
+            items = [t for t in items if t["name"] == name]
+        return items[-last:] if last > 0 else []
+
+
+def copy_context():
+    """برای اجرای یک تابع در ترد دیگر زیر همان span فعلی: ctx.run(fn, ...)"""
+    return contextvars.copy_context()
+
+
+def waterfall(trace: dict, width=60) -> str:
+    """نمایش متنی یک trace: هر span یک خط با نوار زمانی نسبت به کل trace"""
+    total = max(trace["duration_ms"], 0.1)
+    depth = {}
+    lines = [f"{trace['started_at']}  {trace['name']}  {trace['duration_ms']:.0f}ms  {trace['trace_id']}"
+             + (f"  ! {trace['error']}" if trace.get("error") else "")]
+    for s in trace["spans"]:
+        d = depth.get(s["parent"], 0) + 1
+        depth[s["id"]] = d
+        start = int(s["offset_ms"] / total * width)
+        length = max(1, int(s["duration_ms"] / total * width))
+        bar = " " * start + "█" * min(length, width - start)
+        attrs = " ".join(f"{k}={v}" for k, v in (s.get("attrs") or {}).items())
+        label = ("  " * d + s["name"])[:28]
+        lines.append(f"{label:28} |{bar:{width}}| {s['duration_ms']:8.1f}ms {attrs}"
+                     + (f" ! {s['error']}" if s.get("error") else ""))
+    return "\n".join(lines)